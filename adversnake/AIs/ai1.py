@@ -1,73 +1,19 @@
 """Dmitriy's first attempt at an adversnake ai
 """
-from adversnake import adversnake
+from adversnake import engine
+from grid import grid_of, DIR_CODES, DistanceFields
 
-def distance(dims, p1, p2):
-    """determines the distance between two points on a wrapping field dimensions
-    dims. Distance is defined as the minimum number of steps between p1 and p2
-    if only vertical or horizontal steps are allowed.
-    """
-    hdx = dims[0]/2
-    hdy = dims[1]/2
-    xd = abs(p1[0] - p2[0])#%hdx
-    yd = abs(p1[1] - p2[1])#%hdy
-    #wrapping around produces cyclical behavior. Ideally, some method should be
-    #developped to avoid this while still having the snake be smart enough to 
-    #go through walls when it needs to, but for now just don't wrap distance
-    # if xd > hdx:
-    #     xd = xd - hdx
-    # if yd > hdy:
-    #     yd = yd - hdy
-    return xd + yd
-
-def move_to(dims, p, direc):
-    """helper function to compute the location of a move in direc from p
-    """
-    hx, hy = p
-    if direc == 'left':
-        return ((hx - 1 + dims[0])%dims[0], hy)
-    elif direc == 'right':
-        return ((hx + 1)%dims[0], hy)
-    elif direc == 'up':
-        return (hx, (hy - 1 + dims[1])%dims[1])
-    elif direc == 'down':
-        return (hx,(hy + 1)%dims[1])
-    return None 
-
-def direction_distance(dims, head, pip, direc):
-    """ computes distance between head and pip if the head is to move along
-    direction direc
-    """
-    hx, hy = head
-    if direc == 'left':
-        return distance(dims, ((hx - 1 + dims[0])%dims[0], hy), pip)
-    elif direc == 'right':
-        return distance(dims, ((hx + 1)%dims[0], hy), pip)
-    elif direc == 'up':
-        return distance(dims, (hx, (hy - 1 + dims[1])%dims[1]), pip)
-    elif direc == 'down':
-        return distance(dims, (hx,(hy + 1)%dims[1]), pip)
-    return None
+# distance counted for a move from which no pip can be reached around the
+# snakes at all, see snaketron.AIs.ai1.FAR
+FAR = 500
 
-def dd_nearest(dims, head, pips, direc):
-    """returns the distance to the nearest pip of a move in direction d. 
-    pips is an array of position tuples, not Pip objects"""
-    hx, hy = head
-    if len(pips)==0:
-        return 0
-    if direc == 'left':
-        return min([distance(dims, ((hx - 1 + dims[0])%dims[0], hy), pip)
-                    for pip in pips])
-    elif direc == 'right':
-        return min([distance(dims, ((hx + 1)%dims[0], hy), pip)
-                    for pip in pips])
-    elif direc == 'up':
-        return min([distance(dims, (hx, (hy - 1 + dims[1])%dims[1]), pip)
-                    for pip in pips])
-    elif direc == 'down':
-        return min([distance(dims, (hx,(hy + 1)%dims[1]), pip)
-                    for pip in pips])
-    return None    
+def snake_fields(dims, mysnake, opsnake):
+    """The distance fields of the position, those of the live gamestate if
+    the snakes are views of one (as engine.ai_move hands out), so that they
+    are searched once a tick for both AIs"""
+    if hasattr(mysnake, 'gamestate'):
+        return engine.distance_fields(mysnake.gamestate)
+    return DistanceFields(dims, list(mysnake.body) + list(opsnake.body))
 
 class AdverSnakeAI1():
     """ An object of this class is to be passed to a AdverSnake contstructor.
@@ -76,6 +22,8 @@ class AdverSnakeAI1():
     This is a basic ai which follows two rules: go to the nearest pip and avoid the 
     other snake. It will always make the move that will bring it closest to a 
     pip as long as that move doesn't cause it collide with the enemy or itself. 
+    Distances are counted the way around both snakes (see
+    engine.distance_fields).
     """
     def __init__(self):
         pass
@@ -93,7 +41,6 @@ class AdverSnakeAI1():
         myhead = mysnake.body[0]
         pl = [pip.location() for pip in pips]
         mydir = mysnake.direc
-        outcom = mydir
         if mydir == 'left':
             dirs = ['left', 'up', 'down']
         if mydir == 'right':
@@ -105,12 +52,19 @@ class AdverSnakeAI1():
         
         #a penalty for each direction is computed, and the one with the lowest
         #penalty wins
-        d = [dd_nearest(dims, myhead, pl, x) for x in dirs]
-        hit_self = [mysnake.is_present(move_to(dims, myhead, x)) for x in dirs]
-        hit_op = [opsnake.is_present(move_to(dims, myhead, x)) for x in dirs]
-        doh = [not last_pip
-               and dd_nearest(dims, myhead, [opsnake.body[0]], x) <3
-               for x in dirs]
+        grid = grid_of(dims)
+        fields = snake_fields(dims, mysnake, opsnake)
+        neighbors = grid.neighbors[grid.cell(myhead)]
+        to_pips = [fields.from_loc(p) for p in pl]
+        to_op = fields.from_loc(opsnake.body[0])
+        moves = [neighbors[DIR_CODES[x]] for x in dirs]
+        if to_pips:
+            d = [min(FAR, min(row[c] for row in to_pips)) for c in moves]
+        else:
+            d = [0]*len(moves)
+        hit_self = [mysnake.is_present(grid.locs[c]) for c in moves]
+        hit_op = [opsnake.is_present(grid.locs[c]) for c in moves]
+        doh = [not last_pip and to_op[c] < 3 for c in moves]
 
 
         k_d = 1
@@ -122,11 +76,11 @@ class AdverSnakeAI1():
         return min(zip(cost, dirs))[1]
 
 def play():
+    from adversnake import adversnake
     ai1 = AdverSnakeAI1()
-    ai2 = AdverSnakeAI1()
     adversnake.play_ai(ai1)
 
 if __name__ == '__main__':
-    print "play adversnake against ai"
+    print("play adversnake against ai")
     play()
 
@@ -1,224 +1,266 @@
-"""First attempt an ai that looks ahead. Only intended to work with one pip at a time.
+"""An adversnake ai that looks ahead. It plays both snakes forward on the
+engine (adversnake.engine) and scores where they end up.
 """
-from adversnake import adversnake
+from collections import deque
+from timeit import default_timer
+from adversnake import engine
+from adversnake.engine import GameStep, OPPOSITE
+from adversnake.AIs.ai1 import FAR, snake_fields
+from grid import grid_of, DIR_CODES
 
-def distance(dims, p1, p2):
-    """determines the distance between two points on a wrapping field dimensions
-    dims. Distance is defined as the minimum number of steps between p1 and p2
-    if only vertical or horizontal steps are allowed.
-    """
-    hdx = dims[0]/2
-    hdy = dims[1]/2
-    xd = abs(p1[0] - p2[0])#%hdx
-    yd = abs(p1[1] - p2[1])#%hdy
-    #wrapping around produces cyclical behavior. Ideally, some method should be
-    #developped to avoid this while still having the snake be smart enough to 
-    #go through walls when it needs to, but for now just don't wrap distance
-    # if xd > hdx:
-    #     xd = xd - hdx
-    # if yd > hdy:
-    #     yd = yd - hdy
-    return xd + yd
-
-def move_to(p, direc):
-    """helper function to compute the location of a move in direc from p
-    """
-    hx, hy = p
-    if direc == 'left':
-        return ((hx - 1 + dims[0])%dims[0], hy)
-    elif direc == 'right':
-        return ((hx + 1)%dims[0], hy)
-    elif direc == 'up':
-        return (hx, (hy - 1 + dims[1])%dims[1])
-    elif direc == 'down':
-        return (hx,(hy + 1)%dims[1])
-    return None 
-
-def direction_distance(dims, head, pip, direc):
-    """ computes distance between head and pip if the head is to move along
-    direction direc
-    """
-    hx, hy = head
-    if direc == 'left':
-        return distance(dims, ((hx - 1 + dims[0])%dims[0], hy), pip)
-    elif direc == 'right':
-        return distance(dims, ((hx + 1)%dims[0], hy), pip)
-    elif direc == 'up':
-        return distance(dims, (hx, (hy - 1 + dims[1])%dims[1]), pip)
-    elif direc == 'down':
-        return distance(dims, (hx,(hy + 1)%dims[1]), pip)
-    return None
-
-def dd_nearest(dims, head, pips, direc):
-    """returns the distance to the nearest pip of a move in direction d. 
-    pips is an array of position tuples, not Pip objects"""
-    hx, hy = head
-    if len(pips)==0:
-        return 0
-    if direc == 'left':
-        return min([distance(dims, ((hx - 1 + dims[0])%dims[0], hy), pip)
-                    for pip in pips])
-    elif direc == 'right':
-        return min([distance(dims, ((hx + 1)%dims[0], hy), pip)
-                    for pip in pips])
-    elif direc == 'up':
-        return min([distance(dims, (hx, (hy - 1 + dims[1])%dims[1]), pip)
-                    for pip in pips])
-    elif direc == 'down':
-        return min([distance(dims, (hx,(hy + 1)%dims[1]), pip)
-                    for pip in pips])
-    return None    
+# value of a won game, less the number of moves it takes
+WIN = 10**6
+
+# weights of the terms AdverSnakeAI2 scores a searched position by: tail
+# length over the opponent's, pips taken and blocks lost to truncation on
+# the way there (each counted on top of what they did to the length),
+# having had the last pip, and the distance to the nearest pip against the
+# opponent's
+K_LEN = 10
+K_PIP = 5
+K_LOSS = 5
+K_LAST = 3
+K_DIST = 1
+
+# stands in for pips_remaining when an AI is not told how many are left
+MANY_PIPS = 10**6
+
+class SearchTimeout(Exception):
+    """Raised inside a search once its deadline has passed"""
+
+def search_state(dims, mysnake, opsnake, pips, last_pip):
+    """A gamestate of the position with the AI's snake as snake 1 (the rules
+    do not favor either id) and no new pips: where those land is up to the
+    game, so the search only plays for the pips already on the board."""
+    remaining = MANY_PIPS
+    if hasattr(mysnake, 'gamestate'):
+        remaining = mysnake.gamestate['pips_remaining'][0][0]
+    gamestate = {
+        'dims': [tuple(dims)],
+        'pips': [p.location() for p in pips],
+        'pips_disp': [(0,)],
+        'pips_remaining': [(remaining,)],
+        'last_pip': [(1,)] if last_pip else [(2,)],
+    }
+    for sid, snake in ((1, mysnake), (2, opsnake)):
+        gamestate[(sid, 'body')] = deque(snake.body)
+        gamestate[(sid, 'direction')] = [(snake.direc,)]
+        gamestate[(sid, 'next_direction')] = [(snake.direc,)]
+    engine.free_cells(gamestate)
+    return gamestate
 
 class AdverSnakeAI2():
     """ An object of this class is to be passed to a AdverSnake contstructor.
     The AdverSnake object will call the update method of this class after every
     frame update.
+    Each of its moves is scored by the worst position the opponent can
+    answer it with, lookahead moves of both snakes ahead, the way minimax
+    does with alternating moves, and alpha-beta skips replies that cannot
+    matter. Positions are scored by tail length, pips taken, tail lost to
+    truncation, the last pip and distance to the pips, measured around the
+    snakes as they are when the search starts (see K_LEN and the other
+    weights). Ties go to the move AdverSnakeAI1 would prefer.
+
+    If the game passes a deadline to update (it does for AIs whose anytime
+    attribute is true), the search deepens one move at a time until the
+    deadline and the move from the deepest finished search is played.
     """
-    def __init__(self, lookahead=4, max_snake_len=50):
-        """lookahead is how many steps to look ahead"""
+    anytime = True
+
+    def __init__(self, lookahead=2, max_lookahead=20, anytime=True):
+        """lookahead is how many moves ahead to look without a deadline.
+        With a deadline, the search goes no deeper than max_lookahead. With
+        anytime false the game gives no deadline and every search goes
+        lookahead moves deep.
+
+        Every decision appends (lookahead reached, seconds taken, nodes) to
+        self.decisions. A lookahead of 0 means not even the shallowest
+        search finished and the move is the one AI1's heuristic puts first.
+        """
         self.lookahead = lookahead
-        self.max_snake_len = max_snake_len 
+        self.max_lookahead = max_lookahead
+        self.anytime = anytime
+        self.nodes = 0
+        self.deadline = None
+        self.pip_fields = {}
+        self.decisions = []
+
+    def update(self, dims, mysnake, opsnake, pips, last_pip, deadline=None):
+        """output 'left', 'right', 'up', or 'down' command to snake.
 
-    def update(self, fdims, mysnake, opsnake, pips, last_pip):
-        """output 'left', 'right', 'up', or 'down' command to snake. 
-                
         Inputs:
         dims - (x,y) field dimensions
         mysnake - own Snake object (Snake class defined in AdverSnake module)
         opnake - opposing Snake object
         pips - lisf of Pip objects (Pip class defined in AdverSnake module)
         last_pip - True if your snake had the last pip, False otherwise
+        deadline - timeit.default_timer() time to answer by, or None
         """
-        global dims
-        dims = fdims
-        myhead = mysnake.body[0]
-        pl = [pip.location() for pip in pips]
-        mydir = mysnake.direc
-        outcom = mydir
-        if mydir == 'left':
-            dirs = ['left', 'up', 'down']
-        if mydir == 'right':
-            dirs = ['right', 'down', 'up']
-        if mydir == 'up':
-            dirs = ['up', 'left', 'right']
-        if mydir == 'down':
-            dirs = ['down', 'right', 'left']
-        
-        #a penalty for each direction is computed, and the one with the lowest
-        #penalty wins
-        d = [dd_nearest(dims, myhead, pl, x) for x in dirs]
-        hit_self = [mysnake.is_present(move_to(dims, myhead, x)) for x in dirs]
-        hit_op = [opsnake.is_present(move_to(dims, myhead, x)) for x in dirs]
-        doh = [not last_pip
-               and dd_nearest(dims, myhead, [opsnake.body[0]], x) <3
-               for x in dirs]
-
-
-        k_d = 1
-        k_hit_self = 10
-        k_hit_op = 1000
-        k_doh = 100
-        cost = [k_d*w + k_hit_self*x + k_hit_op*y + k_doh*z for w, x, y, z
-                in zip(d, hit_self, hit_op, doh)]
-        return min(zip(cost, dirs))[1]
-
-def index(v, l):
-    """returns index of first occurance of v in l, or -1 none found
-    """
-    try:
-        return l.index(v)
-    except ValueError:
-        return -1
+        start = default_timer()
+        state = search_state(dims, mysnake, opsnake, pips, last_pip)
+        # distances from every pip around the snakes as they are now, which
+        # the whole search measures by
+        fields = snake_fields(dims, mysnake, opsnake)
+        self.pip_fields = dict((loc, fields.from_loc(loc))
+                               for loc in state['pips'])
+        self.nodes = 0
+        if deadline is None:
+            move, reached = self._search(state, self.lookahead), self.lookahead
+        else:
+            move, reached = self._deepen(state, deadline)
+        self.decisions.append((reached, default_timer() - start, self.nodes))
+        return move
 
-class State():
-    """class containing the two snakes and the pip locations. Everything is a list of tuples. Upon creation, collisions should not have been resolved (this will be done by the workhorse reward() method).
-    """
-    def __init__(self, mysnake, opsnake, pips, last_pip):
-        self.mysnake = mysnake
-        self.opsnake = opsnake
-        self.pips = pips
-        self.last_pip = last_pip
-    
-    def reward(self):
-        """computes the reward associated with being in the current state. 
-        In the process of doing so, also handles collisions by appropriately
-        modifying the snakes.
+    def _deepen(self, state, deadline):
         """
-        k_dpip = -1 #reward per distance to pip
-        k_opdpip = 1 # reward for opponent distance to pip
-        k_gotpip = 100 #reward for getting a pip
-        k_opgotpip = -100 #reward for opponent getting pip
-        #rewards for crashing or making opponent crash are based on how many 
-        #pips you or they lose
-
-        dist = min([distance(self.mysnake[0], p) for p in self.pips])
-        opdist = min([distance(self.opsnake[0], p) for p in self.pips])
-        gotpip = False
-        opgotpip = False
-        myloss = 0
-        oploss = 0
-        eval_done = False #used to signify to skip rest of collision checking
-        if self.last_pip:
-            gotpip = self.mysnake[0] in pips
-            if self.mysnake[0] != self.opsnake[0]:
-                opgotpip = self.opsnake[0] in pips
-            else:
-                oploss = len(self.opsnake) - 1
-                self.opsnake = self.opsnake[0]
-                eval_done = True
-        else:
-            opgotpip = self.opsnake[0] in pips
-            if self.mysnake[0] != self.opsnake[0]:
-                gotpip = self.mysnake[0] in pips
-            else:
-                myloss = len(self.mysnake) - 1
-                self.mysnake = self.mysnake[0]
-                eval_done = True
-
-        if not eval_done: #no head collisions
-            idmy = index(self.mysnake[0], self.mysnake[1:])           
-            if idmy != -1:
-                myloss = len(self.mysnake) - idmy
-            else:
-                idmy = index(self.mysnake[0], self.opsnake) 
-                if idmy != -1:
-                    myloss = len(self.mysnake) - 1
-            
-            idop = index(self.opsnake[0], self.opsnake[1:])
-            if idop != -1:
-                oploss = len(self.opsnake) - idop
-            else:
-                idop = index(self.opsnake[0], self.mysnake[1:])
-                if idop != -1:
-                    oploss = l
-            
+        Iterative deepening: search one move further each time until the
+        deadline passes or the next search is not expected to finish before
+        it. Returns (move, lookahead) of the deepest finished search.
+        """
+        move = self._ordered_moves(state, 1)[0]
+        reached = 0
+        prev_took = None
+        self.deadline = deadline
+        try:
+            for lookahead in range(1, self.max_lookahead + 1):
+                begin = default_timer()
+                move = self._search(state, lookahead)
+                reached = lookahead
+                now = default_timer()
+                took = now - begin
+                growth = took/prev_took if prev_took else 1
+                prev_took = took
+                if now + took*growth > deadline:
+                    break
+        except SearchTimeout:
+            # the unfinished search left moves made on state, which is
+            # thrown away
+            pass
+        finally:
+            self.deadline = None
+        return move, reached
 
+    def _search(self, state, lookahead):
+        """best move for snake 1 searched lookahead moves ahead"""
+        best = -2*WIN
+        best_move = None
+        for move in self._ordered_moves(state, 1):
+            value = self._min_value(state, move, 1, lookahead, 0, best,
+                                    2*WIN)
+            if value > best:
+                best = value
+                best_move = move
+        return best_move
 
-        #head to head collision. Igoring the skip condition for now
-        if self.mysnake[0] == self.opsnake[0]:
-            if self.last_pip:
-                oploss = len(self.opsnake) - 1
-            else:
-                myloss = len(self.mysnake) - 1
-        elif self.last_pip:
-            if self.opsnake[0] in self.mysnake:
-                oploss = len(self.opsnake) - 1
-                self.opsnake = self.opsnake[0] 
+    def _max_value(self, state, depth, lookahead, score, alpha, beta):
+        best = -2*WIN
+        for move in self._ordered_moves(state, 1):
+            value = self._min_value(state, move, depth, lookahead, score,
+                                    max(alpha, best), beta)
+            if value > best:
+                best = value
+                if best >= beta:
+                    break
+        return best
+
+    def _min_value(self, state, move, depth, lookahead, score, alpha, beta):
+        """
+        Worst value for snake 1 over snake 2's replies to move, depth moves
+        into the search. score is what the pips taken and tails lost on the
+        way there are worth.
+        """
+        if self.deadline is not None and default_timer() > self.deadline:
+            raise SearchTimeout()
+        worst = 2*WIN
+        for op_move in self._ordered_moves(state, 2):
+            win, undo = GameStep.make_move(state, move, op_move)
+            self.nodes += 1
+            if win is not None:
+                value = WIN - depth if win == 1 else depth - WIN
             else:
-                try:
-                    idx = self.opsnake[1:].index(self.opsnake[0])
-                    oploss = len(self.opsnake) - idx
-                    self.opsnake = self.opsnake[:idx]
-                except ValueError:
-                    pass
+                gained = score + self._gain(undo[-1])
+                if depth == lookahead:
+                    value = gained + self._evaluate(state)
+                else:
+                    value = self._max_value(state, depth + 1, lookahead,
+                                            gained, alpha, min(beta, worst))
+            GameStep.unmake_move(state, undo)
+            if value < worst:
+                worst = value
+                if worst <= alpha:
+                    break
+        return worst
+
+    def _gain(self, record):
+        """what the pips taken and blocks lost in one move are worth to
+        snake 1"""
+        # the tail end popped as usual is no loss
+        took1 = 1 in record.taken
+        took2 = 2 in record.taken
+        loss1 = len(record.popped[1]) - (1 in record.trimmed)
+        loss2 = len(record.popped[2]) - (2 in record.trimmed)
+        return K_PIP*(took1 - took2) - K_LOSS*(loss1 - loss2)
 
+    def _evaluate(self, state):
+        """static value of state for snake 1"""
+        grid = grid_of(state['dims'][0])
+        body1 = state[(1, 'body')]
+        body2 = state[(2, 'body')]
+        value = K_LEN*(len(body1) - len(body2))
+        value += K_LAST if state['last_pip'][0][0] == 1 else -K_LAST
+        pips = state['pips']
+        if pips:
+            h1 = grid.cell(body1[0])
+            h2 = grid.cell(body2[0])
+            rows = [self._pip_field(grid, p) for p in pips]
+            d1 = min(FAR, min(row[h1] for row in rows))
+            d2 = min(FAR, min(row[h2] for row in rows))
+            value -= K_DIST*(d1 - d2)
+        return value
+
+    def _pip_field(self, grid, loc):
+        """distances from the pip at loc, as measured at the root of the
+        search (plain ones for pips the search did not start with)"""
+        field = self.pip_fields.get(loc)
+        if field is None:
+            return grid.plain_distances(grid.cell(loc))
+        return field
+
+    def _ordered_moves(self, state, sid):
+        """
+        Moves snake sid is allowed to make, best first by AdverSnakeAI1's
+        penalties, so that alpha-beta tries the likely best replies first.
+        """
+        grid = grid_of(state['dims'][0])
+        neighbors = grid.neighbors[grid.cell(state[(sid, 'body')][0])]
+        to_op = grid.plain_distances(grid.cell(state[(3 - sid, 'body')][0]))
+        to_pips = [self._pip_field(grid, p) for p in state['pips']]
+        reverse = OPPOSITE[engine.Snake.get_direction(state, sid)]
+        had_last = state['last_pip'][0][0] == sid
+        costs = []
+        for direc in ('left', 'right', 'up', 'down'):
+            if direc == reverse:
+                continue
+            c = neighbors[DIR_CODES[direc]]
+            loc = grid.locs[c]
+            cost = 0
+            if to_pips:
+                cost += min(FAR, min(row[c] for row in to_pips))
+            if engine.Snake.is_present(state, sid, loc):
+                cost += 10
+            if engine.Snake.is_present(state, 3 - sid, loc):
+                cost += 1000
+            if not had_last and to_op[c] < 3:
+                cost += 100
+            costs.append((cost, direc))
+        costs.sort()
+        return [direc for cost, direc in costs]
 
 def play():
+    from adversnake import adversnake
     ai1 = AdverSnakeAI2()
-    ai2 = AdverSnakeAI2()
-    adversnake.play_ai(ai1, ai2)
+    adversnake.play_ai(ai1)
 
 if __name__ == '__main__':
-    print "play adversnake against ai"
+    print("play adversnake against ai")
     play()
-
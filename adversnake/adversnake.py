@@ -2,16 +2,17 @@
 """
 import sys
 import pygame
-from collections import deque
 from pygame.locals import *
-from random import randint
+from adversnake import engine
+from adversnake.engine import blocksx, blocksy, SnakeView, PipView
+from adversnake.replay import Recorder
+from ticklog import TickLog, NO_LOG, numbered
+from dirtyrects import DirtyRects, BodyTrack
 pygame.init()
 
 LOSE = -1
 GOTPIP = 1
 block_size = 20
-blocksx = 31
-blocksy = 31
 screen_size = (blocksx*block_size, blocksy*block_size)
 pch = 50 #height of pip counter
 backround = (0, 0, 0, 1)
@@ -31,10 +32,19 @@ class AdverSnake():
     because that would be cheating.
 
     note that in this variation, there may be more than one pip at a time.  
+
+    The game itself is played by adversnake.engine on the gamestate dict in
+    self.gamestate; the Snake and Pip objects are views of it that know how
+    to draw themselves.
+
+    Every game is recorded as it is played (see adversnake.replay);
+    recorder holds the recording.
     """
 
-    def __init__(self, p1='human', p2='human', pips_disp=1, pips_total=20, snake_len=3):
-        """Initializes 2 Snakes, 1 pip, and the field and screen.
+    def __init__(self, p1='human', p2='human', pips_disp=1, pips_total=20, snake_len=3,
+                 seed=None):
+        """Initializes 2 Snakes, 1 pip, and the field and screen. Pips are
+        drawn from a generator seeded with seed, a random one if None.
         """
         self.p1 = p1
         self.p2 = p2
@@ -47,165 +57,127 @@ class AdverSnake():
         self.font = pygame.font.Font(None, 30)
         pygame.display.set_caption("SnakeTron") 
         self.dims = (blocksx, blocksy)
-        self.pips_disp = pips_disp
-        self.s1 = Snake(init_loc=(10, 10), init_dir="right", 
-            body_color=pygame.Color(255, 0, 0, 1), init_len=snake_len)
-        self.s2 = Snake(init_loc=(20, 20), init_dir="left",
-            body_color=pygame.Color(0, 255, 0, 1), init_len=snake_len)
-        self.pips = []
-        for p in range(pips_disp):
-            self.pips.append(Pip(self))
-        self.pips_remaining = pips_total
-        self.last_pip = 1
-
-    def play(self, per=100):
+        self.gamestate = engine.reset(seed, pips_disp, pips_total, snake_len)
+        self.recorder = Recorder(self.gamestate)
+        self.s1 = Snake(self.gamestate, 1, body_color=pygame.Color(255, 0, 0, 1))
+        self.s2 = Snake(self.gamestate, 2, body_color=pygame.Color(0, 255, 0, 1))
+        self.dirty = DirtyRects(self.screen, block_size, backround)
+        self.tracks = (BodyTrack(), BodyTrack())
+        self.pips_shown = None
+        self.pips_remaining_shown = None
+
+    @property
+    def pips(self):
+        return [Pip(loc) for loc in self.gamestate['pips']]
+
+    @property
+    def pips_remaining(self):
+        return self.gamestate['pips_remaining'][0][0]
+
+    @property
+    def last_pip(self):
+        return self.gamestate['last_pip'][0][0]
+
+    @property
+    def free(self):
+        return engine.free_cells(self.gamestate)
+
+    def play(self, per=100, ticklog=None):
         """Basically the main method that runs the game. per is time between 
-        moves in ms. return 1 if snake 1 won, 2 if snake 2 won.
+        moves in ms. return 1 if snake 1 won, 2 if snake 2 won. If a TickLog
+        is given, the time every tick spends in the engine, rendering,
+        flipping the display and in each AI is recorded in it.
         """
-        pygame.time.set_timer(pygame.USEREVENT, 100)
+        log = ticklog or NO_LOG
+        if ticklog is not None:
+            ticklog.per = per
+        pygame.time.set_timer(pygame.USEREVENT, per)
         pygame.display.update()
         while True:
             event = pygame.event.poll()
             if event.type == pygame.QUIT: sys.exit()
             if event.type == pygame.KEYDOWN: self.human_input(event.key)
             if event.type == pygame.USEREVENT:
-                self.screen.fill(backround)
-                self.s1.extend()
-                self.s2.extend()
-                self.check_collisions()
-                self.s1.paint(self.screen)
-                self.s2.paint(self.screen)
-                for p in self.pips:
-                    p.paint(self.screen)
-                self.update_pip_display()
-                self.paint_display()
-                pygame.display.update()
+                log.start()
+                win = self.tick()
+                self.recorder.record(self.gamestate, win)
+                log.lap('engine')
+                rects = self.render()
+                log.lap('render')
+                pygame.display.update(rects)
+                log.lap('flip')
                 if self.pips_remaining <= 0:
-                    return (len(self.s1.body), len(self.s2.body), self.last_pip)
+                    log.end()
+                    return engine.score(self.gamestate)
                 if self.p1 != 'human':
-                    m1 = self.p1.update(self.dims, self.s1, self.s2, self.pips, 
-                        self.last_pip == 1)
+                    m1 = engine.ai_move(self.p1, self.gamestate, 1, per)
+                    log.lap('ai1')
                 if self.p2 != 'human':
-                    m2 = self.p2.update(self.dims, self.s2, self.s1, self.pips, 
-                        self.last_pip == 2)
+                    m2 = engine.ai_move(self.p2, self.gamestate, 2, per)
+                    log.lap('ai2')
                 if self.p1 != 'human':
                     self.s1.set_direction(m1)
                 if self.p2 != 'human':
                     self.s2.set_direction(m2)
+                log.end()
     
-    def snake_pip_collision(self, snake):
-        try:
-            pl = [p.location() for p in self.pips]
-            idx = pl.index(snake.body[0])
-            del self.pips[idx]
-            self.pips_remaining -= 1
-            return True
-        except ValueError:
-            return False
-
-    def check_collisions(self):
-        """This method, called after the snakes are extended, handles all 
-        possible collisions.
+    def render(self):
+        """Draws the snakes, pips and pip counter on the window, repainting
+        only the blocks that changed since the last render unless this is
+        the first one or a tail got cut. Returns the rects of the window that
+        changed.
         """
-        s1hitophead = False
-        s2hitophead = False
-        s1pip = False
-        s2pip = False
-        s1hitop = False
-        s2hitop = False
-        s1hitself = False
-        s2hitself = False
-        #head to head collision
-        if self.s1.body[0] == self.s2.body[0]:
-            if self.last_pip == 1:
-                s2hitop = True
-            else:
-                s1hitop = True
-
-        #pip getting
-        pl = [p.location() for p in self.pips]
-        if self.s1.body[0] in pl and not s1hitop:
-            s1pip = True
-        if self.s2.body[0] in pl and not s2hitop:
-            s2pip = True
-        if s1pip:
-            self.pips_remaining -= 1
-            del self.pips[pl.index(self.s1.body[0])]
-        elif not (s1hitop or s1hitself):
-            self.s1.cut(self.s1.body[-1])
-        if s2pip:
-            self.pips_remaining -= 1
-            del self.pips[pl.index(self.s2.body[0])]
-        elif not (s2hitop or s2hitself):
-            self.s2.cut(self.s2.body[-1])
-
-        if not (s1pip and s2pip):
-            if s1pip:
-                self.last_pip = 1
-            elif s2pip:
-                self.last_pip = 2
-        while (len(self.pips) < self.pips_disp 
-            and len(self.pips) < self.pips_remaining): 
-            self.pips.append(Pip(self))
-
-        #head colors
-        if self.last_pip == 1:
-            self.s1.set_head_color('yellow')
-            self.s2.set_head_color('white')
+        snakes = (self.s1, self.s2)
+        moved = [t.update(s.body) for t, s in zip(self.tracks, snakes)]
+        pips = set(p.location() for p in self.pips)
+        rects = []
+        if None in moved or self.pips_shown is None:
+            self.screen.fill(backround)
+            self.s1.paint(self.screen)
+            self.s2.paint(self.screen)
+            for p in self.pips:
+                p.paint(self.screen)
+            self.dirty.flush()
+            rects.append(self.sr)
         else:
-            self.s2.set_head_color('yellow')
-            self.s1.set_head_color('white')
-
-        #if the snakes come at each other head on, it is possible that the heads skip over each other. This case is handled here.
-        skip_condition = False
-        if self.s1.body[0][1] == self.s2.body[0][1]:
-            if self.s1.direc == 'left' and self.s2.direc == 'right':
-                if self.s1.body[0][0] == self.s2.body[0][0] - 1:
-                    skip_condition = True
-            elif self.s1.direc == 'right' and self.s2.direc == 'left':
-                if self.s1.body[0][0] == self.s2.body[0][0] + 1:
-                    skip_condition = True 
-        elif self.s1.body[0][0] == self.s2.body[0][0]:
-            if self.s1.direc == 'up' and self.s2.direc == 'down':
-                if self.s1.body[0][1] == self.s2.body[0][1] - 1:
-                    skip_condition == True
-            elif self.s1.direc == 'down' and self.s2.direc == 'up':
-                if self.s1.body[0][1] == self.s2.body[0][1] + 1:
-                    skip_condition == True
-        if skip_condition:
-            if self.last_pip == 1:
-                if len(self.s2.body) > 1:
-                    self.s2.cut(self.s2.body[1])
-                    return
-            else:
-                if len(self.s1.body) > 1:
-                    self.s1.cut(self.s1.body[1])
-                    return 
-
-        #self hits
-        if self.s1.body_present(self.s1.body[0]):
-            s1hitself = True
-        if self.s2.body_present(self.s2.body[0]):
-            s2hitself = True
-        #cut method only cuts at the first occurence of the location
-        if s1hitself: 
-            self.s1.cut(self.s1.body[0]) 
-        if s2hitself:
-            self.s2.cut(self.s2.body[0])
+            dirty = self.dirty
+            for old_head, freed in moved:
+                for loc in freed:
+                    dirty.clear(loc)
+            for loc in self.pips_shown - pips:
+                dirty.clear(loc)
+            for snake, (old_head, freed) in zip(snakes, moved):
+                dirty.paint(old_head, snake.body_color)
+                dirty.paint(snake.body[0], snake.head_color)
+            for p in self.pips:
+                if p.location() not in self.pips_shown:
+                    dirty.paint(p.location(), p.color)
+            rects.extend(dirty.flush())
+        self.pips_shown = pips
+        for r in rects:
+            self.window.blit(self.screen, r, r)
+        if self.pips_remaining != self.pips_remaining_shown:
+            self.update_pip_display()
+            self.window.blit(self.pc, self.pcr)
+            self.pips_remaining_shown = self.pips_remaining
+            rects.append(self.pcr)
+        return rects
+
+    def index_free_cells(self):
+        """Rebuilds the index of cells not covered by a snake or pip that
+        pips are placed from, and that of the cells of each snake. Has to be
+        called if the snakes or pips are changed by hand.
+        """
+        self.gamestate.pop('free', None)
+        self.gamestate.pop('cells', None)
+        engine.free_cells(self.gamestate)
 
-        #opponent body hits
-        if self.s1.body_present(self.s2.body[0]):
-            s2hitop = True
-        if self.s2.body_present(self.s1.body[0]):
-            s1hitop = True
-        if s1hitop:
-            if len(self.s1.body) > 1:
-                self.s1.cut(self.s1.body[1])
-        if s2hitop:
-            if len(self.s2.body) > 1:
-                self.s2.cut(self.s2.body[1])
+    def tick(self):
+        """Moves both snakes and handles all possible collisions (see
+        adversnake.engine.GameStep.check_collisions). Returns the winner if
+        that was the last pip, otherwise None."""
+        return engine.GameStep.tick(self.gamestate)
 
-        
     def update_pip_display(self):
         self.pc.fill((100, 100, 100))
         text = self.font.render("pips: " + str(self.pips_remaining), 1, 
@@ -213,10 +185,6 @@ class AdverSnake():
         tp = text.get_rect(centerx=screen_size[0]/2, centery=pch/2)
         self.pc.blit(text, tp)
 
-    def paint_display(self):
-        self.window.blit(self.screen, self.sr)
-        self.window.blit(self.pc, self.pcr)
-
     def human_input(self, key):
         """Takes a pressed key and updates snake direction"""
         if self.p1 == 'human':
@@ -245,76 +213,30 @@ def paint_block(screen, loc, color):
     block = pygame.Rect((x0, y0), (block_size, block_size))
     pygame.draw.rect(screen, color, block)   
 
-class Pip():
-    """Implements the pip"""
+class Pip(PipView):
+    """A pip of the game, as drawn"""
 
-    def __init__(self, game, c=pygame.Color(0, 0, 255, 1)):
-        """initializes color and position"""
-        self.relocate(game)
+    def __init__(self, loc, c=pygame.Color(0, 0, 255, 1)):
+        PipView.__init__(self, loc)
         self.color = c
 
-    def location(self):
-        return self.loc
-
     def paint(self, screen):
         """paints pip on the screen"""
         paint_block(screen, self.loc, self.color)
 
-    def relocate(self, game):
-        """Randomly places a pip at a location not occupied by either snake or
-        another pip. Takes an AdverSnake object so that it can have access to 
-        the snakes and the pips.
-        """
-        self.loc = (randint(0, blocksx-1), randint(0, blocksy-1))
-        other_pips = [p.location() for p in game.pips]
-        while (game.s1.is_present(self.loc) 
-               or game.s2.is_present(self.loc) 
-               or self.loc in other_pips):
-            self.loc = (randint(0, blocksx-1), randint(0, blocksy-1))
-        
-class Snake():
-    """Implements the snake by drawing rectangles on canvas"""
+class Snake(SnakeView):
+    """Snake sid of a gamestate, as drawn. The head of the snake that had
+    the last pip is yellow, the other one white."""
 
-    def __init__(self, 
-                 init_loc=(15, 15),
-                 init_dir= 'left', 
-                 init_len=50, 
-                 head_color=pygame.Color(255, 255, 255, 1),
-                 body_color=pygame.Color(0, 255, 0, 1)):
-        """Initialize snake object.
-
-        Inputs: 
-        init_loc - initial location of snake. Top left corner is (0,0)
-        init_dir - initial direction of snake motion
-        init_len - initial length of snake
-        head_color - color of snakes head
-        body_color - color of snakes body
-        """
-        self.direc = init_dir
-        self.length = init_len
-        self.head_color = head_color
+    def __init__(self, gamestate, sid, body_color=pygame.Color(0, 255, 0, 1)):
+        SnakeView.__init__(self, gamestate, sid)
         self.body_color = body_color
-        self.next_direc = init_dir
-        #queue containing all current locations of snake
-        if init_dir == 'left':
-            self.body = deque([(init_loc[0] + x, init_loc[1]) 
-                        for x in range(init_len)])
-        if init_dir == 'right':
-            self.body = deque([(init_loc[0] - x, init_loc[1]) 
-                        for x in range(init_len)])
-        if init_dir == 'up':
-            self.body = deque([(init_loc[0], init_loc[1] + x) 
-                        for x in range(init_len)])
-        if init_dir == 'down':
-            self.body = deque([(init_loc[0], init_loc[1] - x) 
-                        for x in range(init_len)])
-    
-    def set_head_color(self, c='white'):
-        """sets head color to "white" or "yellow" """
-        if c == 'white':
-            self.head_color = pygame.Color(255, 255, 255)
-        elif c == 'yellow':
-            self.head_color = pygame.Color(255, 255, 0)
+
+    @property
+    def head_color(self):
+        if self.gamestate['last_pip'][0][0] == self.sid:
+            return pygame.Color(255, 255, 0)
+        return pygame.Color(255, 255, 255)
 
     def paint(self, screen, bgr=pygame.Color(0, 0, 0, 1)):
         """Paint the snake object on the backround.
@@ -323,62 +245,15 @@ class Snake():
         screen - pygame display object
         bgr - background color, default black
         """
-
+        head_color = self.head_color
         for i, block in enumerate(self.body):
             if i == 0:
-                paint_block(screen, block, self.head_color)
+                paint_block(screen, block, head_color)
             else:        
                 paint_block(screen, block, self.body_color)
-    
-    def is_present(self, loc):
-        """checks if location loc is on top of the snake"""
-        if loc in self.body:
-            return True
-        else:
-            return False
-
-    def body_present(self, loc):
-        """checks if location loc is present in body of snake (head excluded)
-        """
-        if loc in list(self.body)[1:]:
-            return True
-        else:
-            return False
 
     def set_direction(self, direc):
-        if not direc in ['left', 'right', 'up', 'down']:
-            return
-        if (self.direc == 'left' and direc == 'right'
-        or  self.direc == 'right' and direc == 'left'
-        or  self.direc == 'up' and direc == 'down'
-        or  self.direc == 'down' and direc == 'up'):
-            return
-        self.next_direc = direc
-
-    def extend(self):
-        """Extends the snake by moving the head in the appropriate direction.
-        """  
-        self.direc = self.next_direc
-        if self.direc == 'left':
-            nhead = (self.body[0][0] - 1, self.body[0][1])
-        if self.direc == 'right':
-            nhead = (self.body[0][0] + 1, self.body[0][1])
-        if self.direc == 'up':
-            nhead = (self.body[0][0], self.body[0][1] - 1)
-        if self.direc == 'down':
-            nhead = (self.body[0][0], self.body[0][1] + 1)
-
-        nhead = ((nhead[0] + blocksx)%blocksx, (nhead[1] + blocksy)%blocksy)
-        self.body.appendleft(nhead)
-    
-    def cut(self, loc):
-        """Cuts of the tail at the given location. Note that loc is not the 
-        location of the cut in the array, but rather the (x,y) coordinates
-        of the cut point."""
-        
-        val = self.body.pop()
-        while val != loc:
-            val = self.body.pop()
+        engine.Snake.set_direction(self.gamestate, self.sid, direc)
 
 red_win_count = 0
 green_win_count = 0
@@ -412,10 +287,27 @@ def win_message(window, score):
     window.blit(text2, textpos2)
     pygame.display.update()
 
-def play_ai(ai1, ai2='human'):
+def play_game(game, metrics=None, n=0, replays=None):
+    """Plays game, timing its ticks if metrics is a path to save them to
+    (CSV, or JSON if it ends in .json), and saving its replay if replays is a
+    path. Returns the score."""
+    if metrics is None:
+        score = game.play()
+    else:
+        log = TickLog()
+        score = game.play(ticklog=log)
+        log.report()
+        log.save(numbered(metrics, n))
+    if replays is not None:
+        game.recorder.save(numbered(replays, n))
+    return score
+
+def play_ai(ai1, ai2='human', metrics=None, replays=None):
+    n = 0
     while True:
         game = AdverSnake(ai1, ai2, snake_len=3)
-        score = game.play()
+        score = play_game(game, metrics, n, replays)
+        n += 1
         win_message(game.window, score)        
         while True:
             event = pygame.event.poll()
@@ -423,10 +315,12 @@ def play_ai(ai1, ai2='human'):
                 break
             if event.type == pygame.QUIT: sys.exit()
 
-def play():
+def play(metrics=None, replays=None):
+    n = 0
     while True:
         game = AdverSnake()
-        score = game.play()
+        score = play_game(game, metrics, n, replays)
+        n += 1
         win_message(game.window, score)        
         while True:
             event = pygame.event.poll()
@@ -0,0 +1,521 @@
+"""Headless rules of adversnake.
+
+Like snaketron.engine, but for adversnake: the full state of a game is a
+single dict of plain lists and deques that is cheap to copy, and nothing
+here touches pygame, so AIs can look ahead at engine speed.
+adversnake.adversnake draws the game from it.
+
+    gamestate = reset(seed)
+    win = step(gamestate, 'up', 'left')
+
+step returns None while the game goes on. Once the last pip is taken it
+returns the id of the winner: the longer snake, or the last one to take a
+pip if they are the same length. The gamestate holds
+
+    'dims'              [(width, height)]
+    'pips'              [(x, y), ...] the pips on the board
+    'pips_disp'         [(n,)] most pips on the board at once
+    'pips_remaining'    [(n,)] pips still to be taken, on the board or not
+    'last_pip'          [(sid,)] snake that took the last pip
+    (sid, 'direction')  [(direction,)] snake sid moved in last tick
+    (sid, 'next_direction')  [(direction,)] it moves in next tick
+    (sid, 'body')       deque([(x, y), ...]) head first
+
+and for the engine itself 'seed' and 'rng', the random.Random pips are
+drawn from, 'free', a freecells.FreeCells of the cells no snake or pip
+is on, and 'cells', how many blocks of each snake are on each of its cells
+(see body_cells). Code that changes bodies or pips by hand has to drop
+'free' and 'cells'.
+'fields' holds the distance fields of the position, see distance_fields;
+every tick drops them, and so has code that changes a body by hand.
+
+Searches can step a gamestate with GameStep.make_move and put it back
+exactly with unmake_move instead of copying it for every move.
+"""
+import random
+from collections import deque
+from itertools import chain
+from timeit import default_timer
+from freecells import FreeCells
+from grid import grid_of, DIR_CODES, DistanceFields
+
+blocksx = 31
+blocksy = 31
+
+# share of each tick an anytime AI may spend on its move, see
+# snaketron.engine.ai_time_share
+ai_time_share = 0.4
+
+# entries of a gamestate the engine keeps for itself rather than the game
+ENGINE_KEYS = ('free', 'cells', 'rng', 'fields')
+# of those, the ones AI copies share with the game: they describe nothing but
+# the position as it is, and are dropped as soon as it changes
+SHARED_KEYS = ('fields',)
+
+OPPOSITE = {'left': 'right', 'right': 'left', 'up': 'down', 'down': 'up'}
+
+def copy_gamestate(gamestate, full=True):
+    """Copy of gamestate that can be changed without touching it. With full
+    false the indexes of free and snake cells and the random generator are
+    left out, see snaketron.engine.copy_gamestate."""
+    if not full:
+        return {k: gamestate[k].copy() for k in gamestate
+                if k not in ENGINE_KEYS or k in SHARED_KEYS}
+    copy = {k: gamestate[k].copy() for k in gamestate}
+    if 'free' in copy:
+        copy['free'][0] = copy['free'][0].copy()
+    if 'cells' in copy:
+        copy['cells'] = [None, copy['cells'][1].copy(),
+                         copy['cells'][2].copy()]
+    if 'rng' in copy:
+        rng = random.Random()
+        rng.setstate(copy['rng'][0].getstate())
+        copy['rng'][0] = rng
+    return copy
+
+def game_rng(gamestate):
+    """what gamestate draws pips from: its own generator or random"""
+    if 'rng' in gamestate:
+        return gamestate['rng'][0]
+    return random
+
+def free_cells(gamestate):
+    """The FreeCells of gamestate, built from the bodies and pips if it has
+    none yet"""
+    if 'free' not in gamestate:
+        gamestate['free'] = [FreeCells(gamestate['dims'][0],
+                                       chain(gamestate[(1, 'body')],
+                                             gamestate[(2, 'body')],
+                                             gamestate['pips']))]
+    return gamestate['free'][0]
+
+def body_cells(gamestate, sid):
+    """{(x, y): blocks of snake sid on it} for the cells of its body, built
+    from the bodies if gamestate has none yet. Moves keep it in step with
+    the body, so is_present and body_present are lookups rather than scans
+    of it."""
+    if 'cells' not in gamestate:
+        cells = [None, {}, {}]
+        for s in (1, 2):
+            counts = cells[s]
+            for loc in gamestate[(s, 'body')]:
+                counts[loc] = counts.get(loc, 0) + 1
+        gamestate['cells'] = cells
+    return gamestate['cells'][sid]
+
+def distance_fields(gamestate):
+    """The grid.DistanceFields of the position of gamestate, with the snake
+    bodies as walls (pips are not), made if it has none yet. AIs get views
+    of the live gamestate (see ai_move), so both AIs use the same ones
+    every tick."""
+    if 'fields' not in gamestate:
+        gamestate['fields'] = [DistanceFields(gamestate['dims'][0],
+                                              chain(gamestate[(1, 'body')],
+                                                    gamestate[(2, 'body')]))]
+    return gamestate['fields'][0]
+
+def reset(seed=None, pips_disp=1, pips_total=20, snake_len=3):
+    """Get a new gamestate with starting config, drawing pips from a generator
+    seeded with seed (a random one if None)."""
+    return GameStep.reset(seed, pips_disp, pips_total, snake_len)
+
+def step(gamestate, s1dir, s2dir):
+    """Advance gamestate by one tick in place. Returns the winning snake id
+    once all pips are taken, None before."""
+    return GameStep.update(gamestate, s1dir, s2dir)
+
+def score(gamestate):
+    """(length of snake 1, length of snake 2, last_pip)"""
+    return (len(gamestate[(1, 'body')]), len(gamestate[(2, 'body')]),
+            gamestate['last_pip'][0][0])
+
+def winner(gamestate):
+    """the snake that wins if the game ends now"""
+    len1, len2, last_pip = score(gamestate)
+    if len1 != len2:
+        return 1 if len1 > len2 else 2
+    return last_pip
+
+def ai_move(ai, gamestate, sid, per=None):
+    """Asks ai for the next direction of snake sid. AIs are handed views of
+    the live gamestate (see SnakeView), which they must not change. AIs with
+    a true anytime attribute are also given a deadline, ai_time_share of the
+    per ms tick from now, if per is given.
+    """
+    args = (gamestate['dims'][0], SnakeView(gamestate, sid),
+            SnakeView(gamestate, 3 - sid),
+            [PipView(loc) for loc in gamestate['pips']],
+            gamestate['last_pip'][0][0] == sid)
+    if per is not None and getattr(ai, 'anytime', False):
+        deadline = default_timer() + per*ai_time_share/1000.0
+        return ai.update(*args, deadline=deadline)
+    return ai.update(*args)
+
+class SnakeView():
+    """Snake sid of a gamestate as AIs see it: body (head first), direc and
+    the is_present and body_present tests"""
+
+    def __init__(self, gamestate, sid):
+        self.gamestate = gamestate
+        self.sid = sid
+
+    @property
+    def body(self):
+        return self.gamestate[(self.sid, 'body')]
+
+    @property
+    def direc(self):
+        return Snake.get_direction(self.gamestate, self.sid)
+
+    @property
+    def next_direc(self):
+        return self.gamestate[(self.sid, 'next_direction')][0][0]
+
+    def is_present(self, loc):
+        """checks if location loc is on top of the snake"""
+        return Snake.is_present(self.gamestate, self.sid, loc)
+
+    def body_present(self, loc):
+        """checks if location loc is present in body of snake (head
+        excluded)"""
+        return Snake.body_present(self.gamestate, self.sid, loc)
+
+class PipView():
+    """A pip as AIs see it"""
+
+    def __init__(self, loc):
+        self.loc = loc
+
+    def location(self):
+        return self.loc
+
+# Full state of the game should be represented in a single dict
+class GameStep():
+    """
+    Compute one step of the game (or reset to step 1).
+    """
+
+    @staticmethod
+    def reset(seed=None, pips_disp=1, pips_total=20, snake_len=3):
+        """
+        Get a new gamestate with starting config. Pips are drawn from a
+        random.Random seeded with seed, which is made up if None. Replays
+        store the seed in 64 bits, so it has to be an int from 0 to
+        2**64 - 1.
+        """
+        if seed is None:
+            seed = random.getrandbits(63)
+        elif not 0 <= seed < 2**64:
+            raise ValueError('seed must be from 0 to 2**64 - 1, got %d'
+                             % seed)
+        gamestate = {
+            'dims': [(blocksx, blocksy)],
+            'pips': [],
+            'pips_disp': [(pips_disp,)],
+            'pips_remaining': [(pips_total,)],
+            'last_pip': [(1,)],
+            'seed': [(seed,)],
+            'rng': [random.Random(seed)]
+        }
+        Snake.reset(gamestate, 1, (10, 10), 'right', snake_len)
+        Snake.reset(gamestate, 2, (20, 20), 'left', snake_len)
+        free_cells(gamestate)
+        body_cells(gamestate, 1)
+        Pip.refill(gamestate)
+        return gamestate
+
+    @staticmethod
+    def update(gamestate, s1dir, s2dir):
+        Snake.set_direction(gamestate, 1, s1dir)
+        Snake.set_direction(gamestate, 2, s2dir)
+        return GameStep.tick(gamestate)
+
+    @staticmethod
+    def tick(gamestate, record=None):
+        """update with the directions the snakes were already set to. If a
+        MoveRecord is given, what changed is written to it."""
+        gamestate.pop('fields', None)
+        Snake.move(gamestate, 1, record)
+        Snake.move(gamestate, 2, record)
+        GameStep.check_collisions(gamestate, record)
+        if gamestate['pips_remaining'][0][0] <= 0:
+            return winner(gamestate)
+        return None
+
+    @staticmethod
+    def make_move(gamestate, s1dir, s2dir):
+        """Same as update, but also returns what unmake_move needs to put
+        gamestate back exactly as it was: (win, undo). undo[-1] is the
+        MoveRecord of the move, which tells what it did to the snakes.
+        """
+        undo_dirs = (gamestate[(1, 'direction')],
+                     gamestate[(1, 'next_direction')],
+                     gamestate[(2, 'direction')],
+                     gamestate[(2, 'next_direction')])
+        pips = gamestate['pips'][:]
+        counts = (gamestate['pips_remaining'], gamestate['last_pip'])
+        record = MoveRecord()
+        free_cells(gamestate)
+        Snake.set_direction(gamestate, 1, s1dir)
+        Snake.set_direction(gamestate, 2, s2dir)
+        win = GameStep.tick(gamestate, record)
+        return win, (undo_dirs, pips, counts, record)
+
+    @staticmethod
+    def unmake_move(gamestate, undo):
+        """Reverts the make_move that returned undo. Moves have to be unmade
+        in the reverse order they were made in.
+        """
+        undo_dirs, pips, counts, record = undo
+        gamestate.pop('fields', None)
+        (gamestate[(1, 'direction')],
+         gamestate[(1, 'next_direction')],
+         gamestate[(2, 'direction')],
+         gamestate[(2, 'next_direction')]) = undo_dirs
+        for sid in (1, 2):
+            body = gamestate[(sid, 'body')]
+            cells = body_cells(gamestate, sid)
+            _release(cells, body.popleft())
+            popped = record.popped[sid]
+            for loc in popped:
+                cells[loc] = cells.get(loc, 0) + 1
+            body.extend(reversed(popped))
+        gamestate['free'][0].undo(record.journal)
+        gamestate['pips'] = pips
+        gamestate['pips_remaining'], gamestate['last_pip'] = counts
+        if record.rng_state is not None:
+            game_rng(gamestate).setstate(record.rng_state)
+
+    @staticmethod
+    def check_collisions(gamestate, record=None):
+        """Handles everything the heads ran into after both snakes moved.
+        A snake that takes a pip keeps its tail, the other one loses the end
+        of it. Running into your own body cuts your tail off there, running
+        into the other snake's body (or its head, if it had the pip last)
+        cuts off your whole tail, as does skipping over the head of a snake
+        that had the pip last.
+        """
+        free = free_cells(gamestate)
+        body1 = gamestate[(1, 'body')]
+        body2 = gamestate[(2, 'body')]
+        pips = gamestate['pips']
+        last_pip = gamestate['last_pip'][0][0]
+        s1hitop = False
+        s2hitop = False
+        #head to head collision
+        if body1[0] == body2[0]:
+            if last_pip == 1:
+                s2hitop = True
+            else:
+                s1hitop = True
+
+        #pip getting
+        s1pip = body1[0] in pips and not s1hitop
+        s2pip = body2[0] in pips and not s2hitop
+        if s1pip:
+            Pip.take(gamestate, body1[0], 1, record)
+        elif not s1hitop:
+            Snake.pop(gamestate, 1, record)
+            if record is not None:
+                record.trimmed.append(1)
+        if s2pip:
+            Pip.take(gamestate, body2[0], 2, record)
+        elif not s2hitop:
+            Snake.pop(gamestate, 2, record)
+            if record is not None:
+                record.trimmed.append(2)
+        if s1pip != s2pip:
+            gamestate['last_pip'] = [(1,)] if s1pip else [(2,)]
+            last_pip = 1 if s1pip else 2
+        #a full board gets its pips back once the snakes make room
+        Pip.refill(gamestate, record)
+
+        #coming at each other head on, the heads can skip over each other
+        if GameStep.skipped(gamestate):
+            loser = 2 if last_pip == 1 else 1
+            body = gamestate[(loser, 'body')]
+            if len(body) > 1:
+                Snake.cut(gamestate, loser, body[1], record)
+                return
+
+        #a head alone on its cell hit nothing, which spares the body scans
+        h1 = body1[0]
+        h2 = body2[0]
+        crowded1 = free.count_at(h1) > 1
+        crowded2 = free.count_at(h2) > 1
+        #self hits, cut where the head is
+        if crowded1 and Snake.body_present(gamestate, 1, h1):
+            Snake.cut(gamestate, 1, h1, record)
+        if crowded2 and Snake.body_present(gamestate, 2, h2):
+            Snake.cut(gamestate, 2, h2, record)
+
+        #opponent body hits
+        if crowded2 and Snake.body_present(gamestate, 1, h2):
+            s2hitop = True
+        if crowded1 and Snake.body_present(gamestate, 2, h1):
+            s1hitop = True
+        if s1hitop and len(body1) > 1:
+            Snake.cut(gamestate, 1, body1[1], record)
+        if s2hitop and len(body2) > 1:
+            Snake.cut(gamestate, 2, body2[1], record)
+
+    @staticmethod
+    def skipped(gamestate):
+        """True if the heads just swapped places, going opposite ways"""
+        x1, y1 = gamestate[(1, 'body')][0]
+        x2, y2 = gamestate[(2, 'body')][0]
+        d1 = Snake.get_direction(gamestate, 1)
+        d2 = Snake.get_direction(gamestate, 2)
+        bx, by = gamestate['dims'][0]
+        if y1 == y2:
+            if d1 == 'left' and d2 == 'right':
+                return (x2 - x1) % bx == 1
+            if d1 == 'right' and d2 == 'left':
+                return (x1 - x2) % bx == 1
+        elif x1 == x2:
+            if d1 == 'up' and d2 == 'down':
+                return (y2 - y1) % by == 1
+            if d1 == 'down' and d2 == 'up':
+                return (y1 - y2) % by == 1
+        return False
+
+class MoveRecord():
+    """What one tick did: popped, the blocks cut off each snake's tail,
+    last first, by sid; journal, the changes to the free cells (see
+    FreeCells.occupy); rng_state, the state of the generator before the
+    first new pip was drawn, or None; taken, the ids of the snakes that
+    took a pip; and trimmed, the ids of the snakes that lost the end of
+    their tail as usual, for taking no pip and not running head on into
+    the other one."""
+    __slots__ = ('popped', 'journal', 'rng_state', 'taken', 'trimmed')
+
+    def __init__(self):
+        self.popped = {1: [], 2: []}
+        self.journal = []
+        self.rng_state = None
+        self.taken = []
+        self.trimmed = []
+
+class Pip():
+    """Implements the pips"""
+
+    @staticmethod
+    def refill(gamestate, record=None):
+        """Places new pips until pips_disp are on the board, there are no
+        more to place or the board is full"""
+        pips = gamestate['pips']
+        free = free_cells(gamestate)
+        rng = game_rng(gamestate)
+        journal = None if record is None else record.journal
+        while (len(pips) < gamestate['pips_disp'][0][0]
+               and len(pips) < gamestate['pips_remaining'][0][0]
+               and not free.full()):
+            if record is not None and record.rng_state is None:
+                record.rng_state = rng.getstate()
+            loc = free.sample(rng.randrange)
+            free.occupy(loc, journal)
+            pips.append(loc)
+
+    @staticmethod
+    def take(gamestate, loc, sid, record=None):
+        """the pip at loc is eaten by snake sid"""
+        gamestate['pips'].remove(loc)
+        if record is None:
+            free_cells(gamestate).release(loc)
+        else:
+            free_cells(gamestate).release(loc, record.journal)
+            record.taken.append(sid)
+        gamestate['pips_remaining'] = [(gamestate['pips_remaining'][0][0]
+                                        - 1,)]
+
+class Snake():
+    """Implements the snake as a deque of (x, y) blocks, head first"""
+
+    @staticmethod
+    def reset(gamestate, sid, init_loc, init_dir, init_len):
+        x0, y0 = init_loc
+        if init_dir == 'left':
+            body = [(x0 + x, y0) for x in range(init_len)]
+        if init_dir == 'right':
+            body = [(x0 - x, y0) for x in range(init_len)]
+        if init_dir == 'up':
+            body = [(x0, y0 + y) for y in range(init_len)]
+        if init_dir == 'down':
+            body = [(x0, y0 - y) for y in range(init_len)]
+        #tails longer than the field wrap around it like moving snakes do
+        bx, by = gamestate['dims'][0]
+        gamestate[(sid, 'direction')] = [(init_dir,)]
+        gamestate[(sid, 'next_direction')] = [(init_dir,)]
+        gamestate[(sid, 'body')] = deque((x % bx, y % by) for x, y in body)
+        gamestate.pop('cells', None)
+
+    @staticmethod
+    def get_direction(gamestate, sid):
+        return gamestate[(sid, 'direction')][0][0]
+
+    @staticmethod
+    def set_direction(gamestate, sid, direc):
+        if direc not in OPPOSITE:
+            return
+        if OPPOSITE[direc] == Snake.get_direction(gamestate, sid):
+            return
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+
+    @staticmethod
+    def is_present(gamestate, sid, loc):
+        """checks if location loc is on top of the snake"""
+        return loc in body_cells(gamestate, sid)
+
+    @staticmethod
+    def body_present(gamestate, sid, loc):
+        """checks if location loc is present in body of snake (head
+        excluded)"""
+        count = body_cells(gamestate, sid).get(loc, 0)
+        return count > (gamestate[(sid, 'body')][0] == loc)
+
+    @staticmethod
+    def move(gamestate, sid, record=None):
+        """Moves the head in the appropriate direction, keeping the tail. The
+        tail is popped or cut by check_collisions."""
+        gamestate[(sid, 'direction')] = gamestate[(sid, 'next_direction')]
+        direc = gamestate[(sid, 'direction')][0][0]
+        body = gamestate[(sid, 'body')]
+        grid = grid_of(gamestate['dims'][0])
+        nhead = grid.neighbor_locs[grid.cell(body[0])][DIR_CODES[direc]]
+        cells = body_cells(gamestate, sid)
+        body.appendleft(nhead)
+        cells[nhead] = cells.get(nhead, 0) + 1
+        if record is None:
+            free_cells(gamestate).occupy(nhead)
+        else:
+            free_cells(gamestate).occupy(nhead, record.journal)
+
+    @staticmethod
+    def pop(gamestate, sid, record=None):
+        """pops the last block of the tail and returns it"""
+        cells = body_cells(gamestate, sid)
+        val = gamestate[(sid, 'body')].pop()
+        _release(cells, val)
+        if record is None:
+            free_cells(gamestate).release(val)
+        else:
+            free_cells(gamestate).release(val, record.journal)
+            record.popped[sid].append(val)
+        return val
+
+    @staticmethod
+    def cut(gamestate, sid, loc, record=None):
+        """Cuts of the tail at the given location. Note that loc is not the
+        location of the cut in the array, but rather the (x,y) coordinates
+        of the cut point."""
+        val = Snake.pop(gamestate, sid, record)
+        while val != loc:
+            val = Snake.pop(gamestate, sid, record)
+
+def _release(cells, loc):
+    """takes one block at loc out of the body_cells cells"""
+    count = cells[loc] - 1
+    if count:
+        cells[loc] = count
+    else:
+        del cells[loc]
@@ -0,0 +1,347 @@
+"""Compact recordings of adversnake games that can be replayed exactly.
+
+Like snaketron.replay: a game is determined by how it was set up, the seed
+its pips are drawn from and the direction each snake moved in every tick,
+so that is what a recording holds: a header and 2 bits per snake per tick,
+two ticks to a byte.
+
+    header    '<4sBBBQBIHIBI' magic b'ASRP', format version, board width
+                              and height, seed, pips_disp, pips_total,
+                              snake length, number of ticks, winner
+                              (0: none), keyframe interval (0: no
+                              keyframes)
+    moves     per tick snake 1's direction code | snake 2's << 2, the first
+              tick of each byte in its low four bits
+    keyframes '<I' count, count '<I' offsets from the start of the file,
+              then the keyframes
+
+Direction codes are those of grid. As in snaketron.replay, every keyframe
+interval ticks the full gamestate is stored as well, so that getting to a
+tick does not mean stepping through every one before it:
+
+    keyframe  '<IBBBIHHHH'  tick, last_pip, direction codes of snake 1 and
+                            2, pips_remaining, number of pips, length of
+                            body 1, body 2 and the free cells
+              '<H' cells    body 1, body 2, the pips and the free cells in
+                            their order
+              '<625I'       state of the pip generator
+
+Cells are x + y*width. Replay.seek(t) starts from the last keyframe at or
+before t.
+
+A Recorder is fed the gamestate after every step and turns into bytes at the
+end; load turns them back into a Replay, which simulate steps through again:
+
+    python -m adversnake.replay game.asrp [--show] [--per ms] [--start t]
+
+checks that a recording reproduces its own result, and with --show plays it
+back in a window, from tick --start on.
+"""
+import argparse
+import random
+import struct
+import sys
+from collections import deque
+from adversnake import engine
+from grid import DIRS, DIR_CODES
+
+MAGIC = b'ASRP'
+VERSION = 2
+HEADER = struct.Struct('<4sBBBQBIHIBI')
+# version 1 had no keyframes
+HEADER_V1 = struct.Struct('<4sBBBQBIHIB')
+UINT = struct.Struct('<I')
+KEYFRAME = struct.Struct('<IBBBIHHHH')
+RNG = struct.Struct('<625I')
+
+# default ticks between keyframes
+keyframe_interval = 1024
+
+class Recorder():
+    """Records the game of a gamestate just made by engine.reset, with a
+    keyframe every interval ticks (never if 0)"""
+
+    def __init__(self, gamestate, interval=None):
+        self.seed = gamestate['seed'][0][0]
+        self.dims = tuple(gamestate['dims'][0])
+        self.pips_disp = gamestate['pips_disp'][0][0]
+        self.pips_total = gamestate['pips_remaining'][0][0]
+        self.snake_len = len(gamestate[(1, 'body')])
+        self.interval = keyframe_interval if interval is None else interval
+        self.moves = bytearray()
+        self.keyframes = []
+        self.ticks = 0
+        self.winner = None
+
+    def record(self, gamestate, win=None):
+        """Records the tick gamestate was just stepped through. win is what
+        the step returned."""
+        code = (DIR_CODES[gamestate[(1, 'direction')][0][0]]
+                | DIR_CODES[gamestate[(2, 'direction')][0][0]] << 2)
+        if self.ticks % 2:
+            self.moves[-1] |= code << 4
+        else:
+            self.moves.append(code)
+        self.ticks += 1
+        if win is not None:
+            self.winner = win
+        elif self.interval and self.ticks % self.interval == 0:
+            self.keyframes.append(pack_keyframe(gamestate, self.ticks))
+
+    def to_bytes(self):
+        head = HEADER.pack(MAGIC, VERSION, self.dims[0], self.dims[1],
+                           self.seed, self.pips_disp, self.pips_total,
+                           self.snake_len, self.ticks, self.winner or 0,
+                           self.interval)
+        start = (len(head) + len(self.moves)
+                 + UINT.size*(1 + len(self.keyframes)))
+        offsets = []
+        for keyframe in self.keyframes:
+            offsets.append(start)
+            start += len(keyframe)
+        return b''.join([head, bytes(self.moves),
+                         struct.pack('<%dI' % (1 + len(offsets)),
+                                     len(offsets), *offsets)]
+                        + self.keyframes)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+def pack_keyframe(gamestate, tick):
+    """gamestate after tick ticks as a keyframe"""
+    bx = gamestate['dims'][0][0]
+    body1 = gamestate[(1, 'body')]
+    body2 = gamestate[(2, 'body')]
+    pips = gamestate['pips']
+    free = engine.free_cells(gamestate).cells
+    cells = [x + y*bx for x, y in body1] + [x + y*bx for x, y in body2]
+    cells += [x + y*bx for x, y in pips]
+    return b''.join([
+        KEYFRAME.pack(tick, gamestate['last_pip'][0][0],
+                      DIR_CODES[gamestate[(1, 'direction')][0][0]],
+                      DIR_CODES[gamestate[(2, 'direction')][0][0]],
+                      gamestate['pips_remaining'][0][0], len(pips),
+                      len(body1), len(body2), len(free)),
+        struct.pack('<%dH' % (len(cells) + len(free)), *(cells + free)),
+        RNG.pack(*engine.game_rng(gamestate).getstate()[1])])
+
+def unpack_keyframe(data, offset, seed, dims, pips_disp):
+    """(tick, gamestate) from the keyframe at offset in data"""
+    bx, by = dims
+    (tick, last_pip, d1, d2, pips_remaining, npips, len1, len2,
+     nfree) = KEYFRAME.unpack_from(data, offset)
+    offset += KEYFRAME.size
+    ncells = len1 + len2 + npips
+    cells = struct.unpack_from('<%dH' % (ncells + nfree), data, offset)
+    offset += 2*len(cells)
+    rng = random.Random()
+    rng.setstate((3, RNG.unpack_from(data, offset), None))
+    loc = lambda c: (c % bx, c // bx)
+    gamestate = {
+        'dims': [(bx, by)],
+        'pips': [loc(c) for c in cells[len1 + len2:ncells]],
+        'pips_disp': [(pips_disp,)],
+        'pips_remaining': [(pips_remaining,)],
+        'last_pip': [(last_pip,)],
+        'seed': [(seed,)],
+        'rng': [rng],
+        (1, 'direction'): [(DIRS[d1],)],
+        (1, 'next_direction'): [(DIRS[d1],)],
+        (2, 'direction'): [(DIRS[d2],)],
+        (2, 'next_direction'): [(DIRS[d2],)],
+        (1, 'body'): deque(loc(c) for c in cells[:len1]),
+        (2, 'body'): deque(loc(c) for c in cells[len1:len1 + len2]),
+    }
+    engine.free_cells(gamestate).reorder(cells[ncells:])
+    return tick, gamestate
+
+class Replay():
+    """A loaded recording: seed, dims, pips_disp, pips_total, snake_len,
+    winner (None if the game was cut short), ticks, and keyframes, the
+    (tick, offset in data) of every keyframe. Moves are decoded as they are
+    needed."""
+
+    def __init__(self, data, seed, dims, pips_disp, pips_total, snake_len,
+                 winner, ticks, moves_at, keyframes=()):
+        self.data = data
+        self.seed = seed
+        self.dims = dims
+        self.pips_disp = pips_disp
+        self.pips_total = pips_total
+        self.snake_len = snake_len
+        self.winner = winner
+        self.ticks = ticks
+        self.moves_at = moves_at
+        self.keyframes = list(keyframes)
+
+    def __len__(self):
+        return self.ticks
+
+    def move(self, t):
+        """(snake 1, snake 2) directions of tick t, counting from 0"""
+        code = (self.data[self.moves_at + t//2] >> 4*(t % 2)) & 15
+        return DIRS[code & 3], DIRS[code >> 2]
+
+    def moves(self, start=0, stop=None):
+        stop = self.ticks if stop is None else stop
+        for t in range(start, stop):
+            yield self.move(t)
+
+    def reset(self):
+        """the gamestate the game started from"""
+        self.check_dims()
+        return engine.reset(self.seed, self.pips_disp, self.pips_total,
+                            self.snake_len)
+
+    def seek(self, tick):
+        """The gamestate after tick ticks, stepped to from the last keyframe
+        at or before it"""
+        if not 0 <= tick <= self.ticks:
+            raise IndexError('tick %d of a %d tick replay'
+                             % (tick, self.ticks))
+        self.check_dims()
+        start, offset = 0, None
+        for t, at in self.keyframes:
+            if t > tick:
+                break
+            start, offset = t, at
+        if offset is None:
+            gamestate = self.reset()
+        else:
+            gamestate = self.keyframe(offset)
+        for s1dir, s2dir in self.moves(start, tick):
+            engine.step(gamestate, s1dir, s2dir)
+        return gamestate
+
+    def keyframe(self, offset):
+        """the gamestate of the keyframe at offset"""
+        return unpack_keyframe(self.data, offset, self.seed, self.dims,
+                               self.pips_disp)[1]
+
+    def simulate(self, start=0):
+        """Plays the game again from tick start on, yielding (gamestate, win)
+        after every tick. The gamestate is the same object every time."""
+        gamestate = self.seek(start)
+        for s1dir, s2dir in self.moves(start):
+            yield gamestate, engine.step(gamestate, s1dir, s2dir)
+
+    def check(self):
+        """True if simulating the moves ends the way the recording did: with
+        the recorded winner on the last tick, and not before, and passing
+        through every keyframe."""
+        win = None
+        keyframes = iter(self.keyframes)
+        keyframe = next(keyframes, None)
+        for t, (gamestate, win) in enumerate(self.simulate(), 1):
+            if win is not None and t < self.ticks:
+                return False
+            if keyframe is not None and keyframe[0] == t:
+                if not same_gamestate(self.keyframe(keyframe[1]), gamestate):
+                    return False
+                keyframe = next(keyframes, None)
+        return win == self.winner and keyframe is None
+
+    def check_dims(self):
+        if self.dims != (engine.blocksx, engine.blocksy):
+            raise ValueError('recorded on a %dx%d board, the engine plays '
+                             'on %dx%d' % (self.dims + (engine.blocksx,
+                                                        engine.blocksy)))
+
+def same_gamestate(a, b):
+    """True if a and b are the same game and will place the same pips"""
+    for k in a:
+        if k not in engine.ENGINE_KEYS and a[k] != b.get(k):
+            return False
+    return (engine.free_cells(a).cells == engine.free_cells(b).cells
+            and engine.game_rng(a).getstate() == engine.game_rng(b).getstate())
+
+def load(data):
+    """Replay from the bytes of a recording"""
+    if len(data) < HEADER_V1.size:
+        raise ValueError('too short for an adversnake replay')
+    magic, version = data[:4], data[4]
+    if magic != MAGIC:
+        raise ValueError('not an adversnake replay')
+    if version == 1:
+        (magic, version, bx, by, seed, pips_disp, pips_total, snake_len,
+         ticks, winner) = HEADER_V1.unpack_from(data)
+        interval = 0
+        moves_at = HEADER_V1.size
+    elif version == VERSION:
+        if len(data) < HEADER.size:
+            raise ValueError('too short for an adversnake replay')
+        (magic, version, bx, by, seed, pips_disp, pips_total, snake_len,
+         ticks, winner, interval) = HEADER.unpack_from(data)
+        moves_at = HEADER.size
+    else:
+        raise ValueError('replay format version %d, expected %d'
+                         % (version, VERSION))
+    end = moves_at + (ticks + 1)//2
+    if len(data) < end or (version == 1 and len(data) != end):
+        raise ValueError('%d ticks need %d bytes of moves, got %d'
+                         % (ticks, (ticks + 1)//2, len(data) - moves_at))
+    keyframes = []
+    if version > 1:
+        if len(data) < end + UINT.size:
+            raise ValueError('replay has no keyframe index')
+        count = UINT.unpack_from(data, end)[0]
+        offsets = struct.unpack_from('<%dI' % count, data, end + UINT.size)
+        if interval:
+            keyframes = [((k + 1)*interval, offset)
+                         for k, offset in enumerate(offsets)]
+    return Replay(data, seed, (bx, by), pips_disp, pips_total, snake_len,
+                  winner or None, ticks, moves_at, keyframes)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return load(f.read())
+
+def show(replay, per=100, start=0):
+    """plays replay back in a window from tick start on, per ms a tick"""
+    import pygame
+    from adversnake.adversnake import AdverSnake
+    game = AdverSnake(pips_disp=replay.pips_disp,
+                      pips_total=replay.pips_total,
+                      snake_len=replay.snake_len, seed=replay.seed)
+    game.gamestate = replay.seek(start)
+    game.s1.gamestate = game.s2.gamestate = game.gamestate
+    pygame.time.set_timer(pygame.USEREVENT, per)
+    pygame.display.update(game.render())
+    moves = replay.moves(start)
+    while True:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            return
+        if event.type != pygame.USEREVENT:
+            continue
+        move = next(moves, None)
+        if move is None:
+            return
+        engine.step(game.gamestate, move[0], move[1])
+        pygame.display.update(game.render())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path')
+    parser.add_argument('--show', action='store_true',
+                        help='play the game back in a window')
+    parser.add_argument('--per', type=int, default=100,
+                        help='ms per tick when showing')
+    parser.add_argument('--start', type=int, default=0,
+                        help='tick to start showing from')
+    args = parser.parse_args(argv)
+    replay = read(args.path)
+    print('seed %d, %d ticks on %dx%d, %d pips, winner %s, %d keyframes'
+          % (replay.seed, replay.ticks, replay.dims[0], replay.dims[1],
+             replay.pips_total, replay.winner or 'none',
+             len(replay.keyframes)))
+    reproduced = replay.check()
+    print('reproduces its result' if reproduced
+          else 'does NOT reproduce its result')
+    if args.show:
+        show(replay, args.per, args.start)
+    return 0 if reproduced else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Speed and strength of AdverSnakeAI2's lookahead.
+
+Every lookahead decides snake 1's move in positions from AI1 vs AI1 games
+(see benchmarks.suite.adversnake_positions); reported are nodes (joint
+moves made) per decision, the mean and worst time per decision and
+decisions per second. Then AI2 plays AdverSnakeAI1 in a headless tournament
+(see tournament), once with the deadline the game loop gives it every tick
+and once at every fixed lookahead:
+
+    python -m benchmarks.adversnake_search [--games 1000] [--per 100]
+                                           [--workers n]
+"""
+import argparse
+from timeit import default_timer
+from adversnake import engine
+from adversnake.AIs.ai2 import AdverSnakeAI2
+from benchmarks.suite import adversnake_positions
+import tournament
+
+LOOKAHEADS = [1, 2, 3, 4]
+AI1 = 'adversnake.AIs.ai1:AdverSnakeAI1'
+AI2 = 'adversnake.AIs.ai2:AdverSnakeAI2'
+
+def time_decisions(ai, positions):
+    """(nodes per decision, mean seconds, worst seconds)"""
+    total = 0.0
+    worst = 0.0
+    nodes = 0
+    for gamestate in positions:
+        start = default_timer()
+        engine.ai_move(ai, gamestate, 1)
+        elapsed = default_timer() - start
+        nodes += ai.nodes
+        total += elapsed
+        worst = max(worst, elapsed)
+    return float(nodes)/len(positions), total/len(positions), worst
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--games', type=int, default=1000,
+                        help='games against AI1 per configuration')
+    parser.add_argument('--per', type=int, default=100,
+                        help='tick length in ms the deadline is taken from')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions = adversnake_positions()
+    print('%9s %8s %9s %9s %12s' % ('lookahead', 'nodes', 'mean ms',
+                                     'worst ms', 'decisions/s'))
+    for lookahead in LOOKAHEADS:
+        ai = AdverSnakeAI2(lookahead=lookahead, anytime=False)
+        nodes, mean, worst = time_decisions(ai, positions)
+        print('%9d %8.1f %9.2f %9.2f %12.0f' % (lookahead, nodes, 1000*mean,
+                                                  1000*worst, 1/mean))
+    print('')
+
+    specs = [AI2] + ['%s,lookahead=%d,anytime=False' % (AI2, lookahead)
+                     for lookahead in LOOKAHEADS]
+    for spec in specs:
+        results = tournament.run([spec, AI1], args.games, args.workers,
+                                 args.seed, args.per)
+        tournament.report(results)
+
+if __name__ == '__main__':
+    main()
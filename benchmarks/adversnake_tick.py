@@ -0,0 +1,47 @@
+"""Cost of one adversnake engine tick (move both snakes + check_collisions)
+as the tails get longer, with the heads running into nothing, and with
+snake 1 running into its own body or into snake 2's. Body tests are lookups
+in the per-snake cell counts, so ticks without a hit should stay about flat
+in the tail length; a hit costs as much as the tail it cuts off.
+
+    python -m benchmarks.adversnake_tick
+"""
+from timeit import default_timer
+from adversnake.engine import GameStep
+from benchmarks.suite import adversnake_game, adversnake_hit_game
+
+# the snakes wind over the field from its top and bottom rows (see
+# benchmarks.suite), leaving at least 11 free rows between their heads
+LENGTHS = [3, 30, 100, 300]
+TICKS = 5
+GAMES = 100
+HITS = ('self', 'opponent')
+
+def time_tick(snake_len, hit=None, games=GAMES, ticks=TICKS):
+    """average seconds per tick for snakes of length snake_len, timing only
+    the tick with the hit if one is given"""
+    if hit is not None:
+        ticks = 1
+    total = 0.0
+    for g in range(games):
+        if hit is None:
+            game = adversnake_game(snake_len, snake_len)
+        else:
+            game = adversnake_hit_game(snake_len, hit)
+        start = default_timer()
+        for t in range(ticks):
+            GameStep.tick(game)
+        total += default_timer() - start
+    return total/(games*ticks)
+
+def main():
+    print('%10s %12s %12s %12s' % ('tail len', 'us no hit', 'us hit self',
+                                    'us hit opp'))
+    for snake_len in LENGTHS:
+        print('%10d %12.1f %12.1f %12.1f'
+              % (snake_len, time_tick(snake_len)*1e6,
+                 time_tick(snake_len, 'self')*1e6,
+                 time_tick(snake_len, 'opponent')*1e6))
+
+if __name__ == '__main__':
+    main()
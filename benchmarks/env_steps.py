@@ -0,0 +1,55 @@
+"""Steps per second of the environments in env, against the bare engines
+they wrap, after checking that their planes match observe.
+
+Both snakes play random direction codes, and a game that ends is reset, in
+the environment and the engine alike. Reported is each rate, and for the
+environment also the cost of building the planes from scratch every step
+with observe instead.
+
+    python -m benchmarks.env_steps
+"""
+import random
+from timeit import default_timer
+import env
+from grid import DIRS
+
+STEPS = 50000
+
+def random_actions(steps, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(4), rng.randrange(4)) for s in range(steps)]
+
+def env_rate(e, actions, rebuild=False):
+    e.reset(0)
+    start = default_timer()
+    for a in actions:
+        obs, rewards, terminated, truncated, info = e.step(a)
+        if rebuild:
+            env.observe(e.gamestate)
+        if terminated or truncated:
+            e.reset()
+    return len(actions)/(default_timer() - start)
+
+def engine_rate(e, actions):
+    engine = e.engine
+    gamestate = e._new_game(0)
+    start = default_timer()
+    for a1, a2 in actions:
+        if engine.step(gamestate, DIRS[a1], DIRS[a2]) is not None:
+            gamestate = e._new_game(0)
+    return len(actions)/(default_timer() - start)
+
+def main():
+    actions = random_actions(STEPS)
+    print('%-14s %10s %12s %12s %14s' % ('game', 'mismatches', 'engine/s',
+                                         'env steps/s', 'rebuilt/s'))
+    for name, make in (('snaketron', env.SnakeTronEnv),
+                       ('adversnake', env.AdverSnakeEnv)):
+        mismatches = env.crosscheck(make(seed=0))
+        print('%-14s %10d %12.0f %12.0f %14.0f'
+              % (name, len(mismatches), engine_rate(make(), actions),
+                 env_rate(make(seed=0), actions),
+                 env_rate(make(seed=0), actions[:STEPS//10], True)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Cost of moving and measuring on the board with grid's tables against the
+branching on direction names and modular arithmetic the AIs used to do.
+
+Each case does the same work both ways, for every cell of a 31x31 board in
+every direction: the location one step away, and its distance to a fixed
+cell with and without wrapping. Reported is the mean cost per (cell,
+direction) in ns. Then the AI1s of both games decide in sampled positions,
+as in benchmarks.suite.
+
+    python -m benchmarks.grid_geometry
+"""
+import timeit
+from grid import grid_of, DIRS, DIR_CODES
+from snaketron import engine
+from snaketron.AIs.ai1 import SnakeTronAI1
+from adversnake import engine as adversnake_engine
+from adversnake.AIs.ai1 import AdverSnakeAI1
+from benchmarks.snaketron_search import sample_positions
+from benchmarks.suite import adversnake_positions
+
+DIMS = (31, 31)
+TARGET = (7, 23)
+
+def branching_move_to(dims, p, direc):
+    """a move the way the AIs' move_to made it"""
+    hx, hy = p
+    if direc == 'left':
+        return ((hx - 1 + dims[0])%dims[0], hy)
+    elif direc == 'right':
+        return ((hx + 1)%dims[0], hy)
+    elif direc == 'up':
+        return (hx, (hy - 1 + dims[1])%dims[1])
+    elif direc == 'down':
+        return (hx,(hy + 1)%dims[1])
+
+def branching_distance(dims, p1, p2):
+    return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
+
+def branching_torus_distance(dims, p1, p2):
+    xd = abs(p1[0] - p2[0])
+    yd = abs(p1[1] - p2[1])
+    return min(xd, dims[0] - xd) + min(yd, dims[1] - yd)
+
+def per_move(f, number=20):
+    """ns per (cell, direction) of f, which walks the whole board"""
+    moves = DIMS[0]*DIMS[1]*len(DIRS)
+    return min(timeit.repeat(f, number=number, repeat=5))/number/moves*1e9
+
+def main():
+    grid = grid_of(DIMS)
+    locs = grid.locs
+    target = grid.cell(TARGET)
+
+    def move_branching():
+        for loc in locs:
+            for direc in DIRS:
+                branching_move_to(DIMS, loc, direc)
+    def move_table():
+        neighbor_locs = grid.neighbor_locs
+        for c in range(grid.size):
+            for direc in DIRS:
+                neighbor_locs[c][DIR_CODES[direc]]
+    def plain_branching():
+        for loc in locs:
+            for direc in DIRS:
+                branching_distance(DIMS, branching_move_to(DIMS, loc, direc),
+                                   TARGET)
+    def plain_table():
+        row = grid.plain_distances(target)
+        for cells in grid.neighbors:
+            for code in range(4):
+                row[cells[code]]
+    def torus_branching():
+        for loc in locs:
+            for direc in DIRS:
+                branching_torus_distance(
+                    DIMS, branching_move_to(DIMS, loc, direc), TARGET)
+    def torus_table():
+        row = grid.torus_distances(target)
+        for cells in grid.neighbors:
+            for code in range(4):
+                row[cells[code]]
+
+    print('%-22s %12s %10s %8s' % ('case', 'branching ns', 'table ns',
+                                   'speedup'))
+    for name, slow, fast in [('move', move_branching, move_table),
+                             ('move + distance', plain_branching,
+                              plain_table),
+                             ('move + torus distance', torus_branching,
+                              torus_table)]:
+        before = per_move(slow)
+        after = per_move(fast)
+        print('%-22s %12.1f %10.1f %8.2f' % (name, before, after,
+                                            before/after))
+    print('')
+
+    positions = [engine.copy_gamestate(p, full=False)
+                 for p in sample_positions(n=50)]
+    ai = SnakeTronAI1()
+    def snaketron_ai1():
+        for gamestate in positions:
+            ai.update(gamestate, 1)
+    adversnake = adversnake_positions()
+    ai2 = AdverSnakeAI1()
+    def adversnake_ai1():
+        for gamestate in adversnake:
+            adversnake_engine.ai_move(ai2, gamestate, 1)
+    for name, f, n in [('snaketron ai1', snaketron_ai1, len(positions)),
+                       ('adversnake ai1', adversnake_ai1, len(adversnake))]:
+        f()
+        took = min(timeit.repeat(f, number=20, repeat=5))/20/n
+        print('%-22s %9.2f us per decision' % (name, took*1e6))
+
+if __name__ == '__main__':
+    main()
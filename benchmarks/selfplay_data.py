@@ -0,0 +1,116 @@
+"""Cost of storing self-play positions in shards (see snaketron.selfplay)
+against pickling the gamestate dicts, and of reading them back.
+
+Positions come from an AI1 vs AI1 game on env.SnakeTronEnv. Reported per
+position are the bytes on disk and the positions per second of encoding
+and writing them, as shard records and as pickled gamestate copies (the
+ones AIs get, without the engine's own entries), then the rate at which
+they are read back as planes: by ShardReader and decode_planes, and by
+unpickling and env.observe. Last, snaketron.selfplay
+plays --games games of SnakeTronAI2 at each lookahead against itself in
+--workers processes, which is where the time of a real run goes.
+
+    python -m benchmarks.selfplay_data [--games 4] [--workers n]
+                                       [--max-ticks 500]
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+from timeit import default_timer
+import numpy as np
+import env
+from grid import DIR_CODES
+from shards import ShardReader, ShardWriter
+from snaketron import engine, selfplay
+from snaketron.AIs.ai1 import SnakeTronAI1
+
+POSITIONS = 2000
+LOOKAHEADS = [1, 2]
+
+def ai1_game(n=POSITIONS, seed=0):
+    """(planes views copied, gamestate copies) of n positions"""
+    e = env.SnakeTronEnv(max_ticks=n)
+    obs, info = e.reset(seed)
+    ai = SnakeTronAI1()
+    planes = []
+    gamestates = []
+    while len(planes) < n:
+        planes.append(obs.copy())
+        gamestates.append(engine.copy_gamestate(e.gamestate, full=False))
+        obs, rewards, terminated, truncated, info = e.step(
+            [DIR_CODES[engine.ai_move(ai, e.gamestate, sid)]
+             for sid in (1, 2)])
+        if terminated or truncated:
+            obs, info = e.reset()
+    return planes, gamestates
+
+def write_shards(directory, planes):
+    writer = ShardWriter(directory, 'bench', selfplay.record_dtype())
+    records = np.zeros(len(planes), dtype=writer.dtype)
+    records['planes'] = [np.packbits(p[0]) for p in planes]
+    writer.append(records)
+    return writer.close()
+
+def write_pickles(directory, gamestates):
+    path = os.path.join(directory, 'bench.pickle')
+    with open(path, 'wb') as f:
+        for gamestate in gamestates:
+            pickle.dump(gamestate, f, pickle.HIGHEST_PROTOCOL)
+    return [path]
+
+def timed_write(f, directory, positions):
+    """(bytes per position, positions per second)"""
+    start = default_timer()
+    paths = f(directory, positions)
+    took = default_timer() - start
+    size = sum(os.path.getsize(p) for p in paths)
+    return float(size)/len(positions), len(positions)/took
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--games', type=int, default=4,
+                        help='self-play games per lookahead')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-ticks', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    planes, gamestates = ai1_game()
+    directory = tempfile.mkdtemp()
+    try:
+        print('%-10s %12s %14s' % ('format', 'bytes/pos', 'written/s'))
+        for name, f, positions in (('shards', write_shards, planes),
+                                   ('pickle', write_pickles, gamestates)):
+            size, rate = timed_write(f, directory, positions)
+            print('%-10s %12.0f %14.0f' % (name, size, rate))
+        start = default_timer()
+        read = 0
+        for records in ShardReader(directory):
+            read += len(selfplay.decode_planes(records))
+        print('%-10s %12s %14.0f read/s' % ('shards', '',
+                                             read/(default_timer() - start)))
+        start = default_timer()
+        read = 0
+        with open(os.path.join(directory, 'bench.pickle'), 'rb') as f:
+            for i in range(len(gamestates)):
+                env.observe(pickle.load(f))
+                read += 1
+        print('%-10s %12s %14.0f read/s' % ('pickle', '',
+                                             read/(default_timer() - start)))
+        print('')
+
+        for lookahead in LOOKAHEADS:
+            out = os.path.join(directory, 'selfplay-%d' % lookahead)
+            spec = '%s,lookahead=%d' % ('snaketron.AIs.ai2:SnakeTronAI2',
+                                        lookahead)
+            positions, outcomes, took = selfplay.run(
+                out, args.games, args.workers, 0, spec, args.max_ticks)
+            print('lookahead %d: %d positions from %d games in %.1f s, '
+                  '%.0f positions/s' % (lookahead, positions, args.games,
+                                        took, positions/took))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
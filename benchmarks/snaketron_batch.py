@@ -0,0 +1,43 @@
+"""Steps per second of snaketron.batch against the scalar engine, after
+checking that the two agree on random moves.
+
+    python -m benchmarks.snaketron_batch
+"""
+import random
+import numpy as np
+from timeit import default_timer
+from snaketron import batch, engine
+
+SIZES = [1, 64, 1024, 8192]
+STEPS = 200
+
+def batch_rate(n, steps=STEPS, seed=0):
+    games = batch.BatchGame(n, seed=seed)
+    moves = np.random.RandomState(seed).randint(0, 4, size=(steps, n, 2))
+    start = default_timer()
+    for s in range(steps):
+        games.step(moves[s])
+        games.reset_finished()
+    return n*steps/(default_timer() - start)
+
+def scalar_rate(steps=20000, seed=0):
+    rng = random.Random(seed)
+    dirs = ['left', 'right', 'up', 'down']
+    gamestate = engine.reset()
+    start = default_timer()
+    for s in range(steps):
+        if engine.step(gamestate, rng.choice(dirs), rng.choice(dirs)):
+            gamestate = engine.reset()
+    return steps/(default_timer() - start)
+
+def main():
+    mismatches = batch.crosscheck()
+    print('crosscheck against snaketron.engine: %d mismatches'
+          % len(mismatches))
+    print('%8s %14s' % ('games', 'steps/s'))
+    print('%8s %14.0f' % ('scalar', scalar_rate()))
+    for n in SIZES:
+        print('%8d %14.0f' % (n, batch_rate(n)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Speed and strength of SnakeTronAI3's tree search.
+
+Each rollout policy decides snake 1's move in the positions from
+benchmarks.snaketron_search with a fixed number of iterations (one rollout
+each); reported are iterations per second, joint moves made per iteration
+and per second, and the mean time per decision. Then AI3 with each policy
+plays AI1 and AI2 in a headless tournament (see tournament). AI2 and AI3
+are both anytime AIs, so at any --per they are given the same time for
+every move. Games still going after --max-ticks ticks are drawn:
+
+    python -m benchmarks.snaketron_mcts [--games 100] [--per 100]
+                                        [--max-ticks 2000] [--workers n]
+"""
+import argparse
+from timeit import default_timer
+from snaketron import engine
+from snaketron.AIs.ai3 import SnakeTronAI3
+from benchmarks.snaketron_search import sample_positions
+import tournament
+
+ROLLOUTS = 300
+POLICIES = ['random', 'ai1']
+AI1 = 'snaketron.AIs.ai1:SnakeTronAI1'
+AI2 = 'snaketron.AIs.ai2:SnakeTronAI2'
+AI3 = 'snaketron.AIs.ai3:SnakeTronAI3'
+
+def time_rollouts(ai, positions):
+    """(iterations, nodes, seconds) over a decision in every position"""
+    iterations = 0
+    nodes = 0
+    total = 0.0
+    for gamestate in positions:
+        start = default_timer()
+        ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        total += default_timer() - start
+        iterations += ai.decisions[-1][0]
+        nodes += ai.nodes
+    return iterations, nodes, total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--games', type=int, default=100,
+                        help='games per pairing')
+    parser.add_argument('--per', type=int, default=100,
+                        help='tick length in ms the deadlines are taken from')
+    parser.add_argument('--max-ticks', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions = sample_positions()
+    print('%8s %12s %10s %10s %9s' % ('rollout', 'iterations/s',
+                                      'nodes/iter', 'nodes/s', 'mean ms'))
+    for policy in POLICIES:
+        ai = SnakeTronAI3(rollouts=ROLLOUTS, rollout=policy, reuse=False,
+                          seed=args.seed)
+        iterations, nodes, total = time_rollouts(ai, positions)
+        print('%8s %12.0f %10.1f %10.0f %9.1f'
+              % (policy, iterations/total, float(nodes)/iterations,
+                 nodes/total, 1000*total/len(positions)))
+    print('')
+
+    for policy in POLICIES:
+        for opponent in (AI1, AI2):
+            results = tournament.run(['%s,rollout=%r' % (AI3, policy),
+                                      opponent], args.games, args.workers,
+                                     args.seed, args.per, args.max_ticks)
+            tournament.report(results)
+
+if __name__ == '__main__':
+    main()
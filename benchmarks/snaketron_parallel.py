@@ -0,0 +1,48 @@
+"""Speedup of SnakeTronAI2's process pool search against worker count.
+
+Every configuration decides snake 1's move in the positions from
+benchmarks.snaketron_search, and its moves are checked against the serial
+search's. The pool is started before timing, so the numbers are per
+decision with a warm pool.
+
+    python -m benchmarks.snaketron_parallel [lookahead] [count|minimax]
+"""
+import multiprocessing
+import sys
+from snaketron.AIs.ai2 import SnakeTronAI2
+from benchmarks.snaketron_search import sample_positions, time_decisions
+from snaketron import engine
+
+def decide_all(ai, positions):
+    return [ai.update(engine.copy_gamestate(p, full=False), 1)
+            for p in positions]
+
+def main(lookahead=4, mode='count'):
+    positions = sample_positions()
+    serial = SnakeTronAI2(lookahead=lookahead, mode=mode)
+    moves = decide_all(serial, positions)
+    nodes, base, worst = time_decisions(serial, positions)
+    print('%s mode, lookahead %d, %d cpus'
+          % (mode, lookahead, multiprocessing.cpu_count()))
+    print('%8s %6s %9s %9s %8s %5s' % ('workers', 'split', 'mean ms',
+                                       'worst ms', 'speedup', 'same'))
+    print('%8s %6s %9.1f %9.1f %8.2f %5s' % ('serial', '-', base*1000,
+                                             worst*1000, 1.0, 'yes'))
+    workers = 1
+    while workers <= max(2, multiprocessing.cpu_count()):
+        for split in (1, 2):
+            ai = SnakeTronAI2(lookahead=lookahead, mode=mode,
+                              workers=workers, split_plies=split)
+            same = decide_all(ai, positions) == moves
+            nodes, mean, worst = time_decisions(ai, positions)
+            ai.close()
+            print('%8d %6d %9.1f %9.1f %8.2f %5s'
+                  % (workers, split, mean*1000, worst*1000, base/mean,
+                     'yes' if same else 'NO'))
+        workers *= 2
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args:
+        args[0] = int(args[0])
+    main(*args)
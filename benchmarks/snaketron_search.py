@@ -0,0 +1,65 @@
+"""Per decision cost of SnakeTronAI2's search modes.
+
+Positions are sampled from a SnakeTronAI1 vs SnakeTronAI1 game, and every
+configuration decides snake 1's move in each of them. Reported are nodes
+(joint moves made) per decision, the mean and worst wall-clock time per
+decision and nodes per second.
+
+    python -m benchmarks.snaketron_search
+"""
+import random
+from timeit import default_timer
+from snaketron import engine
+from snaketron.AIs.ai1 import SnakeTronAI1
+from snaketron.AIs.ai2 import SnakeTronAI2
+
+CONFIGS = [('count', 2), ('count', 3), ('count', 4),
+           ('minimax', 3), ('minimax', 4), ('minimax', 5), ('minimax', 6),
+           ('minimax', 7)]
+
+def sample_positions(n=20, every=10, seed=0):
+    """gamestates from every every'th tick of an AI1 vs AI1 game"""
+    random.seed(seed)
+    ai = SnakeTronAI1()
+    gamestate = engine.reset()
+    s1dir, s2dir = 'right', 'left'
+    positions = []
+    t = 0
+    while len(positions) < n:
+        if engine.step(gamestate, s1dir, s2dir) is not None:
+            gamestate = engine.reset()
+            s1dir, s2dir = 'right', 'left'
+            continue
+        if t % every == 0:
+            positions.append(engine.copy_gamestate(gamestate))
+        s1dir = ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        s2dir = ai.update(engine.copy_gamestate(gamestate, full=False), 2)
+        t += 1
+    return positions
+
+def time_decisions(ai, positions):
+    """(nodes per decision, mean seconds, worst seconds)"""
+    nodes = 0
+    total = 0.0
+    worst = 0.0
+    for gamestate in positions:
+        start = default_timer()
+        ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        elapsed = default_timer() - start
+        nodes += ai.nodes
+        total += elapsed
+        worst = max(worst, elapsed)
+    return float(nodes)/len(positions), total/len(positions), worst
+
+def main():
+    positions = sample_positions()
+    print('%8s %9s %10s %9s %9s %10s' % ('mode', 'lookahead', 'nodes',
+                                         'mean ms', 'worst ms', 'nodes/s'))
+    for mode, lookahead in CONFIGS:
+        ai = SnakeTronAI2(lookahead=lookahead, mode=mode)
+        nodes, mean, worst = time_decisions(ai, positions)
+        print('%8s %9d %10.0f %9.1f %9.1f %10.0f'
+              % (mode, lookahead, nodes, mean*1000, worst*1000, nodes/mean))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Throughput of snaketron.territory and what it does for SnakeTronAI2.
+
+After checking counts against a plain breadth-first search on positions
+from benchmarks.snaketron_search, TerritoryEvaluator scores batches of
+bitboard leaves of growing size; reported are leaves per second, against
+the reference search one leaf at a time. Then SnakeTronAI2 in minimax mode
+decides in the same positions at each lookahead, with and without the
+evaluator, and last it plays AI1 and plain minimax in a headless tournament
+(see tournament) with the same time for every move. Games still going after
+--max-ticks ticks are drawn:
+
+    python -m benchmarks.snaketron_territory [--games 100] [--per 100]
+                                             [--max-ticks 2000] [--workers n]
+"""
+import argparse
+from timeit import default_timer
+from snaketron import bitboard, engine, territory
+from snaketron.AIs.ai2 import SnakeTronAI2
+from benchmarks.snaketron_search import sample_positions
+import tournament
+
+BATCHES = [1, 9, 81, 729, 4096]
+LOOKAHEADS = [0, 1, 2, 3]
+AI1 = 'snaketron.AIs.ai1:SnakeTronAI1'
+MINIMAX = "snaketron.AIs.ai2:SnakeTronAI2,mode='minimax'"
+TERRITORY = MINIMAX + ",evaluator='territory'"
+
+def leaf_rate(f, leaves, calls):
+    start = default_timer()
+    for i in range(calls):
+        f(leaves)
+    return len(leaves)*calls/(default_timer() - start)
+
+def time_decisions(ai, positions):
+    """(mean nodes, mean seconds) per decision"""
+    nodes = 0
+    total = 0.0
+    for gamestate in positions:
+        start = default_timer()
+        ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        total += default_timer() - start
+        nodes += ai.nodes
+    return float(nodes)/len(positions), total/len(positions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--games', type=int, default=100,
+                        help='games per pairing')
+    parser.add_argument('--per', type=int, default=100,
+                        help='tick length in ms the deadlines are taken from')
+    parser.add_argument('--max-ticks', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions = sample_positions(n=200, every=3)
+    print('crosscheck against a plain search: %d mismatches'
+          % len(territory.crosscheck(positions)))
+    states = [bitboard.from_gamestate(g) for g in positions]
+    evaluator = territory.TerritoryEvaluator()
+    def reference(leaves):
+        for state in leaves:
+            territory.reference_counts(state)
+    print('%10s %14s' % ('batch', 'leaves/s'))
+    print('%10s %14.0f' % ('reference', leaf_rate(reference, states, 1)))
+    for n in BATCHES:
+        leaves = (states*(n//len(states) + 1))[:n]
+        rate = leaf_rate(lambda l: evaluator.evaluate(l, 1), leaves,
+                         max(1, 2000//n))
+        print('%10d %14.0f' % (n, rate))
+    print('')
+
+    positions = positions[:20]
+    print('%9s %10s %9s %10s %9s %10s' % ('lookahead', 'nodes', 'mean ms',
+                                         'territory', 'mean ms',
+                                         'leaves/s'))
+    for lookahead in LOOKAHEADS:
+        plain = SnakeTronAI2(lookahead=lookahead, mode='minimax')
+        nodes, took = time_decisions(plain, positions)
+        ai = SnakeTronAI2(lookahead=lookahead, mode='minimax',
+                          evaluator='territory')
+        t_nodes, t_took = time_decisions(ai, positions)
+        print('%9d %10.1f %9.2f %10.1f %9.2f %10.0f'
+              % (lookahead, nodes, 1000*took, t_nodes, 1000*t_took,
+                 ai.evaluator.leaves/(t_took*len(positions))))
+    print('')
+
+    for opponent in (AI1, MINIMAX):
+        results = tournament.run([TERRITORY, opponent], args.games,
+                                 args.workers, args.seed, args.per,
+                                 args.max_ticks)
+        tournament.report(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Transposition table hit rates for SnakeTronAI2 at several lookaheads.
+
+SnakeTronAI2 (with its table) plays snake 1 against SnakeTronAI1 for a number
+of ticks of the same game, so the table carries over from tick to tick the
+way it does in play. In minimax mode each tick deepens from lookahead 0 up,
+as update does when it has a deadline, so the best moves the table keeps
+from one step get tried first in the next. For every lookahead the table's
+probes, hits and the nodes those hits saved are reported per remaining
+depth, next to the nodes that were actually searched and the time per tick
+with and without the table. Only subtrees in which no pip is taken are
+stored, so both play the same moves.
+
+    python -m benchmarks.snaketron_tt [count|minimax] [lookahead ...]
+"""
+import random
+import sys
+from timeit import default_timer
+from snaketron import engine
+from snaketron.AIs.ai1 import SnakeTronAI1
+from snaketron.AIs.ai2 import SnakeTronAI2
+
+LOOKAHEADS = [3, 4, 5, 6]
+# deeper searches get fewer ticks so every lookahead takes a similar time
+TICKS = {'count': {3: 100, 4: 20, 5: 4, 6: 1},
+         'minimax': {3: 200, 4: 200, 5: 100, 6: 50}}
+
+def run(mode, lookahead, ticks, tt_size=2**18, seed=0):
+    random.seed(seed)
+    ai = SnakeTronAI2(lookahead=lookahead, mode=mode, tt_size=tt_size)
+    op = SnakeTronAI1()
+    gamestate = engine.reset()
+    s1dir, s2dir = 'right', 'left'
+    nodes = 0
+    elapsed = 0.0
+    moves = []
+    for t in range(ticks):
+        if engine.step(gamestate, s1dir, s2dir) is not None:
+            break
+        start = default_timer()
+        steps = range(lookahead + 1) if mode == 'minimax' else [lookahead]
+        for ai.lookahead in steps:
+            s1dir = ai.update(engine.copy_gamestate(gamestate, full=False),
+                              1)
+            nodes += ai.nodes
+        elapsed += default_timer() - start
+        moves.append(s1dir)
+        s2dir = op.update(engine.copy_gamestate(gamestate, full=False), 2)
+    stats = ai.tt.stats() if ai.tt is not None else None
+    return t + 1, nodes, elapsed, stats, moves
+
+def main(mode='count', lookaheads=LOOKAHEADS):
+    for lookahead in lookaheads:
+        ticks = TICKS[mode].get(lookahead, 1)
+        ticks, nodes, elapsed, stats, moves = run(mode, lookahead, ticks)
+        plain = run(mode, lookahead, ticks, tt_size=None)
+        print('%s lookahead %d: %d ticks, %d nodes searched (%d without the'
+              ' table), %.1f ms per tick (%.1f without), same moves: %s'
+              % (mode, lookahead, ticks, nodes, plain[1],
+                 elapsed/ticks*1000, plain[2]/ticks*1000,
+                 'yes' if moves == plain[4] else 'NO'))
+        print('%8s %10s %10s %8s %12s' % ('depth', 'probes', 'hits',
+                                           'hit rate', 'nodes saved'))
+        for depth in stats:
+            probes, hits, rate, saved = stats[depth]
+            print('%8d %10d %10d %8.3f %12d' % (depth, probes, hits, rate,
+                                               saved))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    mode = 'count'
+    if args and args[0] in ('count', 'minimax'):
+        mode = args.pop(0)
+    main(mode, [int(a) for a in args] or LOOKAHEADS)
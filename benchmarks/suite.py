@@ -0,0 +1,488 @@
+"""Microbenchmarks of the engine and AI hot paths, checked against a baseline.
+
+Every case times one operation and reports its median cost in microseconds
+over a few repeats:
+
+    snaketron.step/<board>/<len>     GameStep.make_move + unmake_move with
+                                     both snakes len blocks long
+    snaketron.bitstep/<board>/<len>  the same on a bitboard.BitState
+    snaketron.relocate/<fill>        Pip.relocate on a 31x31 board with fill
+                                     percent of it covered by snakes
+    snaketron.bitrelocate/<fill>     bitboard.relocate_pip on the same boards
+    adversnake.tick/<len>            adversnake.engine GameStep.tick, snakes
+                                     laid out as for snaketron.step
+    adversnake.tick.<hit>/<len>      the same for a tick in which snake 1 runs
+                                     into its own body (hit self) or snake
+                                     2's (hit opponent)
+    adversnake.relocate/<fill>       adversnake Pip.take + Pip.refill
+    render.snaketron/<len>           SnakeTron.render after a step, both
+                                     snakes len blocks long
+    render.snaketron.full/<len>      SnakeTron.render_all on the same
+    replay.seek/<interval>           Replay.seek to a random tick of a
+                                     REPLAY_TICKS tick game recorded with a
+                                     keyframe every interval ticks
+    adversnake.replay.seek/<interval>
+                                     the same for adversnake.replay
+    fields/<len>                     engine.distance_fields and the field
+                                     from snake 1's head, snakes laid out as
+                                     for snaketron.step on 31x31
+    env.<game>                       one env step on random moves, resets
+                                     included
+    territory/<batch>                territory.TerritoryEvaluator on batch
+                                     leaves from an AI1 vs AI1 game, per leaf
+    ai.<name>                        one decision, averaged over positions
+                                     from an AI1 vs AI1 game
+
+Results are written as JSON ({case: microseconds}). Given a baseline file
+(by default the one checked in next to this module), every case that got
+slower by more than the threshold is reported and the exit status is 1.
+
+    python -m benchmarks.suite [--out results.json] [--baseline file]
+                               [--threshold 0.25] [--save-baseline]
+                               [--filter prefix]
+
+The checked in baseline was recorded on one machine; rerun with
+--save-baseline before comparing on another.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from collections import deque
+from timeit import default_timer
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import env
+from snaketron import engine, bitboard, snaketron, replay, territory
+from snaketron.AIs.ai1 import SnakeTronAI1
+from snaketron.AIs.ai2 import SnakeTronAI2
+from snaketron.AIs.ai3 import SnakeTronAI3
+from adversnake import engine as adversnake_engine
+from adversnake import replay as adversnake_replay
+from adversnake.AIs.ai1 import AdverSnakeAI1
+from adversnake.AIs.ai2 import AdverSnakeAI2
+from grid import DIRS, DIR_CODES, grid_of
+from benchmarks.snaketron_search import sample_positions
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+REPEATS = 5
+
+# (board side, snake length); the two snakes plus a free row each have to
+# fit on the board
+STEP_CASES = [(31, 10), (31, 100), (31, 400), (63, 100), (63, 1000),
+              (127, 1000), (127, 4000)]
+FILLS = [50, 90, 97]
+ADVERSNAKE_LENGTHS = [3, 30, 300]
+RENDER_LENGTHS = [10, 100, 400]
+REPLAY_TICKS = 50000
+KEYFRAME_INTERVALS = [256, 1024, 4096]
+TERRITORY_BATCHES = [9, 81, 729]
+AI_CASES = [('ai1', SnakeTronAI1, {}),
+            ('ai2.count.2', SnakeTronAI2, {'lookahead': 2}),
+            ('ai2.count.3', SnakeTronAI2, {'lookahead': 3}),
+            ('ai2.count.4', SnakeTronAI2, {'lookahead': 4}),
+            ('ai2.minimax.3', SnakeTronAI2,
+             {'lookahead': 3, 'mode': 'minimax'}),
+            ('ai2.minimax.4', SnakeTronAI2,
+             {'lookahead': 4, 'mode': 'minimax'}),
+            ('ai2.minimax.5', SnakeTronAI2,
+             {'lookahead': 5, 'mode': 'minimax'}),
+            ('ai2.minimax.6', SnakeTronAI2,
+             {'lookahead': 6, 'mode': 'minimax'}),
+            ('ai2.territory.2', SnakeTronAI2,
+             {'lookahead': 2, 'mode': 'minimax', 'evaluator': 'territory'}),
+            ('ai3.random.200', SnakeTronAI3,
+             {'rollouts': 200, 'reuse': False, 'seed': 0}),
+            ('ai3.ai1.200', SnakeTronAI3,
+             {'rollouts': 200, 'rollout': 'ai1', 'reuse': False, 'seed': 0})]
+
+def serpentine(side, length, from_top):
+    """length cells winding row by row from the top (or bottom) of a side x
+    side board, tail first"""
+    cells = []
+    for i in range(length):
+        row, col = divmod(i, side)
+        if row % 2:
+            col = side - 1 - col
+        if not from_top:
+            row = side - 1 - row
+        cells.append((col, row))
+    return cells
+
+def packed_gamestate(side, len1, len2):
+    """A gamestate on a side x side board with snake 1 winding down from the
+    top and snake 2 up from the bottom, both heading into free space. The
+    pip is on a free cell neither snake is about to reach."""
+    gamestate = {'dims': [(side, side)], 'pip': [None], 'last_pip': [(1,)]}
+    for sid, length, from_top, direc in ((1, len1, True, 'down'),
+                                          (2, len2, False, 'up')):
+        body = serpentine(side, length, from_top)[::-1]
+        gamestate[(sid, 'body')] = body
+        gamestate[(sid, 'direction')] = [(direc,)]
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+    taken = set(gamestate[(1, 'body')]) | set(gamestate[(2, 'body')])
+    h1 = gamestate[(1, 'body')][0]
+    h2 = gamestate[(2, 'body')][0]
+    taken.add((h1[0], h1[1] + 1))
+    taken.add((h2[0], h2[1] - 1))
+    gamestate['pip'][0] = next((x, y) for y in range(side)
+                               for x in range(side) if (x, y) not in taken)
+    return gamestate
+
+def fill_lengths(side, fill):
+    """snake lengths covering fill percent of a side x side board"""
+    total = side*side*fill//100
+    return total - total//2, total//2
+
+def repeat(f, repeats=REPEATS):
+    """median of f() over repeats runs"""
+    return sorted(f() for r in range(repeats))[repeats//2]
+
+def per_call(f, n):
+    """seconds per call of f over n calls"""
+    start = default_timer()
+    for i in range(n):
+        f()
+    return (default_timer() - start)/n
+
+def bench_step(side, length):
+    gamestate = packed_gamestate(side, length, length)
+    make, unmake = engine.GameStep.make_move, engine.GameStep.unmake_move
+    def one():
+        win, undo = make(gamestate, 'down', 'up')
+        unmake(gamestate, undo)
+    return repeat(lambda: per_call(one, 2000))
+
+def bench_bitstep(side, length):
+    state = bitboard.from_gamestate(packed_gamestate(side, length, length))
+    make, unmake = bitboard.make_move, bitboard.unmake_move
+    def one():
+        win, undo = make(state, 'down', 'up')
+        unmake(state, undo)
+    return repeat(lambda: per_call(one, 20000))
+
+def bench_relocate(fill):
+    gamestate = packed_gamestate(31, *fill_lengths(31, fill))
+    random.seed(0)
+    return repeat(lambda: per_call(lambda: engine.Pip.relocate(gamestate),
+                                   200))
+
+def bench_bitrelocate(fill):
+    state = bitboard.from_gamestate(
+        packed_gamestate(31, *fill_lengths(31, fill)))
+    random.seed(0)
+    return repeat(lambda: per_call(lambda: bitboard.relocate_pip(state),
+                                   2000))
+
+def bench_replay_seek(interval, rules=engine, recording=replay):
+    # snakes going straight on separate rows never meet, and an adversnake
+    # game with that many pips never ends
+    if rules is engine:
+        gamestate = engine.reset(0)
+    else:
+        gamestate = rules.reset(0, pips_total=10**6)
+    recorder = recording.Recorder(gamestate, interval)
+    for t in range(REPLAY_TICKS):
+        recorder.record(gamestate, rules.step(gamestate, 'right', 'left'))
+    game = recording.load(recorder.to_bytes())
+    rng = random.Random(0)
+    return repeat(lambda: per_call(
+        lambda: game.seek(rng.randrange(REPLAY_TICKS + 1)), 20))
+
+def bench_fields(length):
+    gamestate = packed_gamestate(engine.blocksx, length, length)
+    head = gamestate[(1, 'body')][0]
+    def search():
+        gamestate.pop('fields', None)
+        engine.distance_fields(gamestate).from_loc(head)
+    return repeat(lambda: per_call(search, 200))
+
+def bench_env(make):
+    rng = random.Random(0)
+    actions = [(rng.randrange(4), rng.randrange(4)) for i in range(2000)]
+    e = make(seed=0)
+    def run():
+        e.reset(0)
+        start = default_timer()
+        for a in actions:
+            if e.step(a)[2]:
+                e.reset()
+        return (default_timer() - start)/len(actions)
+    return repeat(run)
+
+def bench_territory(batch, positions):
+    states = [bitboard.from_gamestate(g) for g in positions]
+    leaves = (states*(batch//len(states) + 1))[:batch]
+    evaluator = territory.TerritoryEvaluator()
+    calls = max(1, 500//batch)
+    return repeat(lambda: per_call(lambda: evaluator.evaluate(leaves, 1),
+                                   calls)/batch)
+
+def adversnake_game(len1, len2):
+    """An adversnake gamestate whose snakes lie like those of
+    packed_gamestate, with no pips on the board"""
+    game = adversnake_engine.reset(0, pips_total=10**6, snake_len=1)
+    gamestate = packed_gamestate(adversnake_engine.blocksx, len1, len2)
+    for sid in (1, 2):
+        game[(sid, 'body')] = deque(gamestate[(sid, 'body')])
+        for key in ('direction', 'next_direction'):
+            game[(sid, key)] = gamestate[(sid, key)]
+    game['pips'] = []
+    del game['free']
+    del game['cells']
+    adversnake_engine.free_cells(game)
+    adversnake_engine.body_cells(game, 1)
+    return game
+
+def adversnake_hit_game(length, hit):
+    """adversnake_game(length, length) where snake 1 runs into its own body
+    (hit 'self') or into snake 2's (hit 'opponent') on the next tick"""
+    game = adversnake_game(length, length)
+    body1 = game[(1, 'body')]
+    grid = grid_of(game['dims'][0])
+    neighbors = grid.neighbor_locs[grid.cell(body1[0])]
+    if hit == 'opponent':
+        # snake 2 lies again below snake 1's head, heading on down, so that
+        # snake 1 going down runs into the block next to its tail
+        side = adversnake_engine.blocksx
+        hx, hy = body1[0]
+        game[(2, 'body')] = deque(
+            ((x + hx - 1) % side, y + hy + 1)
+            for x, y in serpentine(side, length, True)[::-1])
+        game[(2, 'direction')] = [('down',)]
+        game[(2, 'next_direction')] = [('down',)]
+        code = DIR_CODES['down']
+    else:
+        # a block of its body next to the head other than the tail, which
+        # pops, or the neck if the snake is too short to have one
+        inner = list(body1)[2:-1]
+        code = next((c for c in range(4) if neighbors[c] in inner),
+                    neighbors.index(body1[1]))
+    game[(1, 'next_direction')] = [(DIRS[code],)]
+    del game['free']
+    del game['cells']
+    adversnake_engine.free_cells(game)
+    adversnake_engine.body_cells(game, 1)
+    return game
+
+def bench_adversnake_tick(length, hit=None):
+    # without a hit both snakes have at least 11 free rows between their
+    # heads, so 5 ticks never run into anything; with one only the first
+    # tick is timed
+    tick = adversnake_engine.GameStep.tick
+    ticks = 5 if hit is None else 1
+    def run():
+        total = 0.0
+        for g in range(50):
+            if hit is None:
+                game = adversnake_game(length, length)
+            else:
+                game = adversnake_hit_game(length, hit)
+            start = default_timer()
+            for t in range(ticks):
+                tick(game)
+            total += default_timer() - start
+        return total/(50*ticks)
+    return repeat(run)
+
+def bench_adversnake_relocate(fill):
+    game = adversnake_game(*fill_lengths(adversnake_engine.blocksx, fill))
+    Pip = adversnake_engine.Pip
+    Pip.refill(game)
+    def one():
+        Pip.take(game, game['pips'][0])
+        Pip.refill(game)
+    return repeat(lambda: per_call(one, 200))
+
+def bench_render(length, full):
+    # 2 ticks leave at least one free row between the heads
+    def run():
+        total = 0.0
+        for g in range(50):
+            game = snaketron.SnakeTron()
+            game.gamestate = packed_gamestate(snaketron.blocksx, length,
+                                              length)
+            game.render()
+            for t in range(2):
+                engine.step(game.gamestate, 'down', 'up')
+                start = default_timer()
+                if full:
+                    game.render_all()
+                else:
+                    game.render()
+                total += default_timer() - start
+        return total/100
+    return repeat(run)
+
+def bench_ai(cls, kwargs, positions):
+    ai = cls(**kwargs)
+    def run():
+        start = default_timer()
+        for gamestate in positions:
+            ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        return (default_timer() - start)/len(positions)
+    out = repeat(run, 3)
+    if hasattr(ai, 'close'):
+        ai.close()
+    return out
+
+def bench_adversnake_ai(positions, ai=None):
+    ai = ai or AdverSnakeAI1()
+    ai_move = adversnake_engine.ai_move
+    def run():
+        start = default_timer()
+        for gamestate in positions:
+            ai_move(ai, gamestate, 1)
+        return (default_timer() - start)/len(positions)
+    return repeat(run)
+
+def adversnake_positions(n=50, seed=0):
+    """adversnake gamestates from AI1 vs AI1 games, i*3 ticks into game i"""
+    positions = []
+    ai = AdverSnakeAI1()
+    for i in range(n):
+        gamestate = adversnake_engine.reset(seed + i, snake_len=3)
+        m1, m2 = 'right', 'left'
+        for t in range(i*3):
+            if adversnake_engine.step(gamestate, m1, m2) is not None:
+                break
+            m1 = adversnake_engine.ai_move(ai, gamestate, 1)
+            m2 = adversnake_engine.ai_move(ai, gamestate, 2)
+        positions.append(gamestate)
+    return positions
+
+def cases():
+    """(name, function returning seconds per operation) for every case"""
+    out = []
+    for side, length in STEP_CASES:
+        suffix = '/%dx%d/%d' % (side, side, length)
+        out.append(('snaketron.step' + suffix,
+                    lambda s=side, l=length: bench_step(s, l)))
+        out.append(('snaketron.bitstep' + suffix,
+                    lambda s=side, l=length: bench_bitstep(s, l)))
+    for fill in FILLS:
+        out.append(('snaketron.relocate/%d' % fill,
+                    lambda f=fill: bench_relocate(f)))
+        out.append(('snaketron.bitrelocate/%d' % fill,
+                    lambda f=fill: bench_bitrelocate(f)))
+        out.append(('adversnake.relocate/%d' % fill,
+                    lambda f=fill: bench_adversnake_relocate(f)))
+    for length in ADVERSNAKE_LENGTHS:
+        out.append(('adversnake.tick/%d' % length,
+                    lambda l=length: bench_adversnake_tick(l)))
+        for hit in ('self', 'opponent'):
+            out.append(('adversnake.tick.%s/%d' % (hit, length),
+                        lambda l=length, h=hit: bench_adversnake_tick(l, h)))
+    for length in RENDER_LENGTHS:
+        out.append(('render.snaketron/%d' % length,
+                    lambda l=length: bench_render(l, False)))
+        out.append(('render.snaketron.full/%d' % length,
+                    lambda l=length: bench_render(l, True)))
+    for length in RENDER_LENGTHS:
+        out.append(('fields/%d' % length,
+                    lambda l=length: bench_fields(l)))
+    for interval in KEYFRAME_INTERVALS:
+        out.append(('replay.seek/%d' % interval,
+                    lambda i=interval: bench_replay_seek(i)))
+        out.append(('adversnake.replay.seek/%d' % interval,
+                    lambda i=interval: bench_replay_seek(
+                        i, adversnake_engine, adversnake_replay)))
+    out.append(('env.snaketron', lambda: bench_env(env.SnakeTronEnv)))
+    out.append(('env.adversnake', lambda: bench_env(env.AdverSnakeEnv)))
+    positions = []
+    def territory_case(batch):
+        if not positions:
+            positions.extend(sample_positions(n=10))
+        return bench_territory(batch, positions)
+    for batch in TERRITORY_BATCHES:
+        out.append(('territory/%d' % batch,
+                    lambda b=batch: territory_case(b)))
+    def ai_case(cls, kwargs):
+        if not positions:
+            positions.extend(sample_positions(n=10))
+        return bench_ai(cls, kwargs, positions)
+    for name, cls, kwargs in AI_CASES:
+        out.append(('ai.snaketron.' + name,
+                    lambda c=cls, k=kwargs: ai_case(c, k)))
+    out.append(('ai.adversnake.ai1',
+                lambda: bench_adversnake_ai(adversnake_positions())))
+    out.append(('ai.adversnake.ai2',
+                lambda: bench_adversnake_ai(
+                    adversnake_positions(),
+                    AdverSnakeAI2(lookahead=2, anytime=False))))
+    return out
+
+def run(prefix=''):
+    """{case: microseconds} for every case whose name starts with prefix"""
+    results = {}
+    for name, f in cases():
+        if name.startswith(prefix):
+            results[name] = f()*1e6
+            print('%-36s %12.2f us' % (name, results[name]))
+    return results
+
+def compare(results, baseline, threshold):
+    """Prints current against baseline numbers. Returns the names of cases
+    that got slower by more than threshold (a fraction)."""
+    regressions = []
+    print('\n%-36s %12s %12s %8s' % ('case', 'baseline us', 'now us',
+                                     'change'))
+    for name in sorted(results):
+        if name not in baseline:
+            print('%-36s %12s %12.2f %8s' % (name, '-', results[name], 'new'))
+            continue
+        change = results[name]/baseline[name] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print('%-36s %12.2f %12.2f %+7.0f%%%s' % (name, baseline[name],
+                                                  results[name], change*100,
+                                                  flag))
+    if regressions:
+        print('\n%d of %d cases regressed by more than %.0f%%:'
+              % (len(regressions), len(results), threshold*100))
+        for name in regressions:
+            print('  ' + name)
+    else:
+        print('\nno regressions over %.0f%%' % (threshold*100))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown counted as a regression (default '
+                             '0.25, i.e. 25%%)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--filter', default='',
+                        help='only run cases starting with this')
+    args = parser.parse_args(argv)
+    results = run(args.filter)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+    if not os.path.exists(args.baseline):
+        print('\nno baseline at %s, run with --save-baseline' % args.baseline)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return 1 if compare(results, baseline, args.threshold) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Redrawing only the blocks of a snake game that changed.
+
+From one tick to the next a snake only gains a head, turns its old head into
+body and, unless it ate, loses the end of its tail. BodyTrack remembers
+enough of a body to tell which blocks those were, or that something else
+happened (a reset or a cut tail) and the whole field has to be drawn again.
+DirtyRects paints blocks on a surface and collects their rects, so the
+display only has to update those:
+
+    track = BodyTrack()
+    dirty = DirtyRects(screen, block_size, background)
+    ...
+    moved = track.update(snake_body)
+    if moved is None:
+        # draw everything
+    else:
+        old_head, freed = moved
+        for loc in freed:
+            dirty.paint(loc, background)
+        dirty.paint(old_head, body_color)
+        dirty.paint(snake_body[0], head_color)
+        pygame.display.update(dirty.flush())
+"""
+import pygame
+
+class DirtyRects():
+    """Blocks of block_size pixels painted on surface since the last flush"""
+
+    def __init__(self, surface, block_size, background):
+        self.surface = surface
+        self.block_size = block_size
+        self.background = background
+        self.rects = []
+
+    def paint(self, loc, color):
+        """paints the block at loc (x, y) color"""
+        rect = pygame.Rect((loc[0]*self.block_size, loc[1]*self.block_size),
+                           (self.block_size, self.block_size))
+        pygame.draw.rect(self.surface, color, rect)
+        self.rects.append(rect)
+
+    def clear(self, loc):
+        self.paint(loc, self.background)
+
+    def flush(self):
+        """the rects painted since the last flush"""
+        rects = self.rects
+        self.rects = []
+        return rects
+
+class BodyTrack():
+    """Head, tail and length of a snake body as of the last update"""
+
+    def __init__(self):
+        self.last = None
+
+    def reset(self):
+        """forget the body, so the next update asks for a full redraw"""
+        self.last = None
+
+    def update(self, body):
+        """Compares body (head first) with the one given last time. Returns
+        (old head, [blocks the tail left]) if the snake moved one block, and
+        None if anything else happened or there was no last time.
+        """
+        last = self.last
+        self.last = (body[0], body[-1], len(body))
+        if last is None or len(body) < 2 or body[1] != last[0]:
+            return None
+        if len(body) == last[2]:
+            return last[0], [last[1]]
+        if len(body) == last[2] + 1:
+            return last[0], []
+        return None
@@ -0,0 +1,276 @@
+"""Gym-style environments for both games, for training agents that see the
+board as numpy planes rather than gamestate dicts.
+
+    env = SnakeTronEnv(seed=0)
+    obs, info = env.reset()
+    while True:
+        obs, rewards, terminated, truncated, info = env.step((RIGHT, LEFT))
+        if terminated or truncated:
+            break
+
+Actions are direction codes (grid.LEFT, RIGHT, UP, DOWN) for snakes 1 and
+2; anything else keeps a snake going the way it was. rewards are (1, -1) or
+(-1, 1) on the step a snake wins and (0, 0) otherwise. Games still going
+after max_ticks are truncated.
+
+obs is a read-only uint8 view of shape (2, len(PLANES), height, width):
+obs[0] is the board as snake 1 sees it, obs[1] as snake 2 does, each with
+the planes in PLANES. The same view is handed out every step and changes
+under it as the game goes on, so copy it to keep it. The planes are not
+rebuilt: each step sets and clears only the cells the heads, tails and pips
+moved from and to, as the engine's make_move reports them. observe builds
+the same array from a gamestate from scratch, and crosscheck compares the
+two over random games.
+
+env.gamestate is the live gamestate of the engine (snaketron.engine or
+adversnake.engine), for opponents that play through ai_move.
+"""
+import random
+import numpy as np
+from grid import DIRS, grid_of
+from snaketron import engine as snaketron_engine
+from adversnake import engine as adversnake_engine
+
+PLANES = ('own_body', 'opponent_body', 'own_head', 'opponent_head', 'pips',
+          'last_pip')
+OWN_BODY, OPPONENT_BODY, OWN_HEAD, OPPONENT_HEAD, PIPS, LAST_PIP = range(
+    len(PLANES))
+
+class Planes():
+    """The observation planes of a dims board, kept in a bytearray that obs
+    is a numpy view of. Blocks of each snake are counted per cell, since
+    adversnake bodies can run over themselves; a body plane is set where the
+    count is not zero. last_pip planes are all ones for the snake that had
+    the last pip."""
+
+    def __init__(self, dims):
+        bx, by = dims
+        self.grid = grid_of(tuple(dims))
+        self.cells = cells = bx*by
+        n = len(PLANES)
+        self.buf = bytearray(2*n*cells)
+        self.obs = np.frombuffer(self.buf, dtype=np.uint8).reshape(
+            2, n, by, bx)
+        self.obs.flags.writeable = False
+        def offsets(own, opponent):
+            # where a cell of snake 1 and of snake 2 is written, as its own
+            # plane of one view and the opponent's plane of the other
+            return [None, (own*cells, (n + opponent)*cells),
+                    ((n + own)*cells, opponent*cells)]
+        self.body_at = offsets(OWN_BODY, OPPONENT_BODY)
+        self.head_at = offsets(OWN_HEAD, OPPONENT_HEAD)
+        self.pips_at = (PIPS*cells, (n + PIPS)*cells)
+        self.last_pip_at = [None, LAST_PIP*cells, (n + LAST_PIP)*cells]
+        self.count = [None, bytearray(cells), bytearray(cells)]
+        self.head = [None, None, None]
+        self.last_pip = None
+
+    def load(self, bodies, pips, last_pip):
+        """Sets every plane from bodies, {sid: [(x, y), ...]} head first,
+        pips, a list of (x, y), and last_pip, the snake that had it."""
+        self.buf[:] = bytes(len(self.buf))
+        cell = self.grid.cell
+        for sid in (1, 2):
+            self.count[sid][:] = bytes(self.cells)
+            for loc in bodies[sid]:
+                self.occupy(sid, cell(loc))
+            self.head[sid] = None
+            self.move_head(sid, cell(bodies[sid][0]))
+        self.set_pips([], [cell(loc) for loc in pips])
+        self.last_pip = None
+        self.set_last_pip(last_pip)
+
+    def occupy(self, sid, c):
+        count = self.count[sid]
+        count[c] += 1
+        if count[c] == 1:
+            a, b = self.body_at[sid]
+            self.buf[a + c] = 1
+            self.buf[b + c] = 1
+
+    def release(self, sid, c):
+        count = self.count[sid]
+        count[c] -= 1
+        if not count[c]:
+            a, b = self.body_at[sid]
+            self.buf[a + c] = 0
+            self.buf[b + c] = 0
+
+    def move_head(self, sid, c):
+        old = self.head[sid]
+        if old == c:
+            return
+        a, b = self.head_at[sid]
+        if old is not None:
+            self.buf[a + old] = 0
+            self.buf[b + old] = 0
+        self.buf[a + c] = 1
+        self.buf[b + c] = 1
+        self.head[sid] = c
+
+    def set_pips(self, old, new):
+        """moves the pips from cells old to cells new"""
+        a, b = self.pips_at
+        for c in old:
+            self.buf[a + c] = 0
+            self.buf[b + c] = 0
+        for c in new:
+            self.buf[a + c] = 1
+            self.buf[b + c] = 1
+
+    def set_last_pip(self, sid):
+        if sid == self.last_pip:
+            return
+        cells = self.cells
+        ones = b'\x01'*cells
+        zeros = bytes(cells)
+        for s in (1, 2):
+            at = self.last_pip_at[s]
+            self.buf[at:at + cells] = ones if s == sid else zeros
+        self.last_pip = sid
+
+def observe(gamestate):
+    """A new (2, len(PLANES), height, width) array of the planes of a
+    gamestate of either game"""
+    planes = Planes(gamestate['dims'][0])
+    if 'pips' in gamestate:
+        pips = gamestate['pips']
+    else:
+        pips = [p for p in gamestate['pip'] if p is not None]
+    planes.load({1: gamestate[(1, 'body')], 2: gamestate[(2, 'body')]},
+                pips, gamestate['last_pip'][0][0])
+    return planes.obs.copy()
+
+class SnakeEnv():
+    """reset/step over one of the engines. Subclasses set engine and fill in
+    _new_game and _apply."""
+    engine = None
+
+    def __init__(self, seed=None, max_ticks=None):
+        """seed seeds the seeds of the games reset draws unless it is given
+        one. With max_ticks, games are truncated after that many ticks."""
+        self.rng = random.Random(seed)
+        self.max_ticks = max_ticks
+        self.gamestate = None
+        self.planes = None
+        self.tick = 0
+        self.done = True
+
+    def reset(self, seed=None):
+        """Starts a new game, from seed if given. Returns (obs, info)."""
+        if seed is None:
+            seed = self.rng.getrandbits(63)
+        gamestate = self.gamestate = self._new_game(seed)
+        dims = gamestate['dims'][0]
+        if self.planes is None or self.planes.grid.dims != tuple(dims):
+            self.planes = Planes(dims)
+        self.planes.load({1: gamestate[(1, 'body')],
+                          2: gamestate[(2, 'body')]},
+                         self._pips(), gamestate['last_pip'][0][0])
+        self.tick = 0
+        self.done = False
+        return self.planes.obs, {'winner': None, 'tick': 0}
+
+    def step(self, actions):
+        """Plays actions, the direction codes of snakes 1 and 2. Returns
+        (obs, rewards, terminated, truncated, info), where info holds the
+        winner, if any, and the tick."""
+        if self.done:
+            raise RuntimeError('the game is over, reset the environment')
+        gamestate = self.gamestate
+        old_pips = self._pips()
+        win, undo = self.engine.GameStep.make_move(
+            gamestate, _direction(actions[0]), _direction(actions[1]))
+        planes = self.planes
+        cell = planes.grid.cell
+        for sid, popped in self._popped(undo):
+            for loc in popped:
+                planes.release(sid, cell(loc))
+            head = cell(gamestate[(sid, 'body')][0])
+            planes.occupy(sid, head)
+            planes.move_head(sid, head)
+        new_pips = self._pips()
+        if new_pips != old_pips:
+            planes.set_pips([cell(loc) for loc in old_pips],
+                            [cell(loc) for loc in new_pips])
+        planes.set_last_pip(gamestate['last_pip'][0][0])
+        self.tick += 1
+        terminated = win is not None
+        truncated = (not terminated and self.max_ticks is not None
+                     and self.tick >= self.max_ticks)
+        self.done = terminated or truncated
+        if win == 1:
+            rewards = (1, -1)
+        elif win == 2:
+            rewards = (-1, 1)
+        else:
+            rewards = (0, 0)
+        return (planes.obs, rewards, terminated, truncated,
+                {'winner': win, 'tick': self.tick})
+
+    def _new_game(self, seed):
+        raise NotImplementedError
+
+    def _pips(self):
+        raise NotImplementedError
+
+    def _popped(self, undo):
+        """((sid, blocks the move took off snake sid), ...) from the undo
+        record of make_move"""
+        raise NotImplementedError
+
+def _direction(action):
+    if action in (0, 1, 2, 3):
+        return DIRS[action]
+    return None
+
+class SnakeTronEnv(SnakeEnv):
+    engine = snaketron_engine
+
+    def _new_game(self, seed):
+        return snaketron_engine.reset(seed)
+
+    def _pips(self):
+        pip = self.gamestate['pip'][0]
+        return [] if pip is None else [pip]
+
+    def _popped(self, undo):
+        return ((1, undo[1]), (2, undo[2]))
+
+class AdverSnakeEnv(SnakeEnv):
+    """Rewards come only at the end, once the last pip is taken (see
+    adversnake.engine)."""
+    engine = adversnake_engine
+
+    def __init__(self, seed=None, max_ticks=None, pips_disp=1,
+                 pips_total=20, snake_len=3):
+        """pips_disp, pips_total and snake_len are passed on to
+        adversnake.engine.reset"""
+        SnakeEnv.__init__(self, seed, max_ticks)
+        self.options = (pips_disp, pips_total, snake_len)
+
+    def _new_game(self, seed):
+        return adversnake_engine.reset(seed, *self.options)
+
+    def _pips(self):
+        return self.gamestate['pips'][:]
+
+    def _popped(self, undo):
+        popped = undo[-1].popped
+        return ((1, popped[1]), (2, popped[2]))
+
+def crosscheck(env, steps=5000, seed=0):
+    """Steps env on random moves, resetting it whenever a game ends, and
+    returns the steps after which its observation differs from observe of
+    its gamestate."""
+    rng = random.Random(seed)
+    mismatches = []
+    obs, info = env.reset(seed)
+    for s in range(steps):
+        actions = (rng.randrange(-1, 4), rng.randrange(-1, 4))
+        obs, rewards, terminated, truncated, info = env.step(actions)
+        if not np.array_equal(obs, observe(env.gamestate)):
+            mismatches.append(s)
+        if terminated or truncated:
+            obs, info = env.reset()
+    return mismatches
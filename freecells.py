@@ -0,0 +1,126 @@
+"""Index of the free cells of a board, for placing pips in O(1).
+
+Placing a pip by drawing random cells until one is free takes longer the
+fuller the board gets, and never finishes on a full one. A FreeCells keeps
+every free cell in an array, with each cell's position in it, so a free cell
+can be drawn with a single random index and a cell can leave the array by
+swapping the last one into its place:
+
+    free = FreeCells((31, 31), snake_body)
+    free.occupy(new_head)
+    free.release(old_tail)
+    loc = free.sample()        # None if the board is full
+
+Cells count how many things are on them, so overlapping bodies (and a head
+on a pip) only free a cell once everything has left it.
+"""
+import random
+
+class FreeCells():
+    """Free cells of a dims board, as (x, y) locations"""
+
+    def __init__(self, dims, occupied=()):
+        self.dims = tuple(dims)
+        n = self.dims[0]*self.dims[1]
+        #free cells (x + y*bx) in no particular order
+        self.cells = list(range(n))
+        #index of every cell in cells, -1 if it is occupied
+        self.slot = list(range(n))
+        #number of things on every cell
+        self.count = [0]*n
+        for loc in occupied:
+            self.occupy(loc)
+
+    def copy(self):
+        other = FreeCells.__new__(FreeCells)
+        other.dims = self.dims
+        other.cells = self.cells[:]
+        other.slot = self.slot[:]
+        other.count = self.count[:]
+        return other
+
+    def reorder(self, cells):
+        """Puts the free cells in the order of cells, a list of the same cell
+        ids, as when restoring a snapshot: which cell a sample draws depends
+        on the order."""
+        if sorted(cells) != sorted(self.cells):
+            raise ValueError('not the free cells of this board')
+        self.cells = list(cells)
+        for i, c in enumerate(self.cells):
+            self.slot[c] = i
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __eq__(self, other):
+        return (isinstance(other, FreeCells) and self.dims == other.dims
+                and self.count == other.count)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def full(self):
+        return not self.cells
+
+    def is_free(self, loc):
+        return self.count[loc[0] + loc[1]*self.dims[0]] == 0
+
+    def count_at(self, loc):
+        """number of things on loc"""
+        return self.count[loc[0] + loc[1]*self.dims[0]]
+
+    def occupy(self, loc, journal=None):
+        """puts one more thing on loc. If a journal list is given, what undo
+        needs to take it back is appended to it."""
+        c = loc[0] + loc[1]*self.dims[0]
+        self.count[c] += 1
+        if self.count[c] > 1:
+            if journal is not None:
+                journal.append((c, 1, None))
+            return
+        i = self.slot[c]
+        last = self.cells.pop()
+        if last != c:
+            self.cells[i] = last
+            self.slot[last] = i
+        self.slot[c] = -1
+        if journal is not None:
+            journal.append((c, 1, i))
+
+    def release(self, loc, journal=None):
+        """takes one thing off loc, which has to have something on it"""
+        c = loc[0] + loc[1]*self.dims[0]
+        self.count[c] -= 1
+        if self.count[c] == 0:
+            self.slot[c] = len(self.cells)
+            self.cells.append(c)
+        if journal is not None:
+            journal.append((c, -1, None))
+
+    def undo(self, journal):
+        """Reverts the occupy and release calls that filled journal, leaving
+        the free cells in exactly the order they were in before, so later
+        samples come out the same as well."""
+        for c, delta, i in reversed(journal):
+            self.count[c] -= delta
+            if delta < 0:
+                if self.count[c] == 1:
+                    self.cells.pop()
+                    self.slot[c] = -1
+            elif i is not None:
+                if i == len(self.cells):
+                    self.cells.append(c)
+                else:
+                    last = self.cells[i]
+                    self.cells[i] = c
+                    self.slot[last] = len(self.cells)
+                    self.cells.append(last)
+                self.slot[c] = i
+
+    def sample(self, randrange=random.randrange):
+        """a uniformly drawn free (x, y) location, None if the board is full
+        """
+        if not self.cells:
+            return None
+        c = self.cells[randrange(len(self.cells))]
+        return (c % self.dims[0], c // self.dims[0])
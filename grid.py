@@ -0,0 +1,152 @@
+"""Geometry of the wrapping boards both games are played on, as tables.
+
+Cells are numbered x + y*width and directions are codes into DIRS. Moving
+and measuring distances on the board is then a matter of indexing a list
+rather than branching on direction names and redoing the modular
+arithmetic every time:
+
+    grid = grid_of((31, 31))
+    c = grid.cell((30, 4))
+    grid.neighbors[c][RIGHT]            # 4*31, the cell (0, 4)
+    grid.neighbor_locs[c][RIGHT]        # (0, 4)
+    grid.torus_distances(c)[0]          # 5 steps to (0, 0), wrapping
+    grid.plain_distances(c)[0]          # 34, without wrapping
+
+The tables of a board size are built once, the first time it is asked for;
+distance rows are built as cells are measured from.
+
+A DistanceFields measures distances around obstacles instead, the snake
+bodies of one position of a game, by breadth-first search:
+
+    fields = DistanceFields((31, 31), body1 + body2)
+    fields.from_loc(pip)[c]             # steps from the pip to cell c
+
+Each field is searched the first time it is asked for and kept for as long
+as the DistanceFields; the game engines keep one per position (see
+distance_fields in snaketron.engine and adversnake.engine).
+"""
+from array import array
+
+LEFT, RIGHT, UP, DOWN = 0, 1, 2, 3
+DIRS = ('left', 'right', 'up', 'down')
+DIR_CODES = {'left': LEFT, 'right': RIGHT, 'up': UP, 'down': DOWN}
+OPPOSITE = (RIGHT, LEFT, DOWN, UP)
+# distance in a DistanceFields field to cells that cannot be reached
+UNREACHED = 0xffff
+
+_grids = {}
+
+def grid_of(dims):
+    """the Grid of a board dims (width, height) in size"""
+    try:
+        return _grids[dims]
+    except KeyError:
+        pass
+    grid = _grids[tuple(dims)] = Grid(dims)
+    return grid
+
+def neighbor_table(dims):
+    """list indexed by cell of (left, right, up, down) neighbor cells on the
+    wrapping field dims"""
+    return grid_of(dims).neighbors
+
+class Grid():
+    """Tables of a dims board. locs[c] is the (x, y) location of cell c,
+    neighbors[c] the (left, right, up, down) cells next to it and
+    neighbor_locs[c] their locations."""
+
+    def __init__(self, dims):
+        self.dims = bx, by = tuple(dims)
+        self.size = bx*by
+        self.locs = [(c % bx, c // bx) for c in range(self.size)]
+        self.neighbors = []
+        for x, y in self.locs:
+            self.neighbors.append(((x - 1) % bx + y*bx,
+                                   (x + 1) % bx + y*bx,
+                                   x + ((y - 1) % by)*bx,
+                                   x + ((y + 1) % by)*bx))
+        self.neighbor_locs = [tuple(self.locs[n] for n in cells)
+                              for cells in self.neighbors]
+        # distance rows by cell, built on first use
+        self._torus = [None]*self.size
+        self._plain = [None]*self.size
+
+    def cell(self, loc):
+        return loc[0] + loc[1]*self.dims[0]
+
+    def torus_distances(self, c):
+        """array of the number of steps from cell c to every cell, going
+        through the edges of the board where that is shorter"""
+        row = self._torus[c]
+        if row is None:
+            bx, by = self.dims
+            x, y = self.locs[c]
+            xs = [min(abs(x - i), bx - abs(x - i)) for i in range(bx)]
+            ys = [min(abs(y - j), by - abs(y - j)) for j in range(by)]
+            row = self._torus[c] = array('H', [dy + dx for dy in ys
+                                               for dx in xs])
+        return row
+
+    def plain_distances(self, c):
+        """array of |dx| + |dy| from cell c to every cell, the distance the
+        AIs steer by (they do not wrap it, which made them go round in
+        circles)"""
+        row = self._plain[c]
+        if row is None:
+            bx, by = self.dims
+            x, y = self.locs[c]
+            xs = [abs(x - i) for i in range(bx)]
+            ys = [abs(y - j) for j in range(by)]
+            row = self._plain[c] = array('H', [dy + dx for dy in ys
+                                               for dx in xs])
+        return row
+
+    def torus_distance(self, a, b):
+        """steps between cells a and b, wrapping"""
+        return self.torus_distances(a)[b]
+
+    def plain_distance(self, a, b):
+        return self.plain_distances(a)[b]
+
+class DistanceFields():
+    """Distances from cells of a dims board to every other cell, going
+    around walls, a list of (x, y) locations. A wall cell gets the number of
+    steps it takes to run into it, but is not gone through; cells that
+    can't be reached at all are UNREACHED. The source of a field may be a
+    wall itself, as a snake's head is."""
+
+    def __init__(self, dims, walls=()):
+        self.grid = grid_of(tuple(dims))
+        self.walls = bytearray(self.grid.size)
+        for loc in walls:
+            self.walls[self.grid.cell(loc)] = 1
+        self._fields = {}
+
+    def from_cell(self, c):
+        """array of the distance from cell c to every cell"""
+        field = self._fields.get(c)
+        if field is None:
+            field = self._fields[c] = self._search(c)
+        return field
+
+    def from_loc(self, loc):
+        return self.from_cell(self.grid.cell(loc))
+
+    def _search(self, source):
+        neighbors = self.grid.neighbors
+        walls = self.walls
+        field = array('H', [UNREACHED])*self.grid.size
+        field[source] = 0
+        frontier = [source]
+        d = 0
+        while frontier:
+            d += 1
+            reached = []
+            for c in frontier:
+                for n in neighbors[c]:
+                    if field[n] == UNREACHED:
+                        field[n] = d
+                        if not walls[n]:
+                            reached.append(n)
+            frontier = reached
+        return field
@@ -0,0 +1,133 @@
+"""Fixed-record .npy shards, written a chunk at a time and read lazily.
+
+A shard is an ordinary .npy file holding a 1-d array of a structured dtype,
+so np.load(path, mmap_mode='r') reads it. ShardWriter appends records to
+shards of up to shard_records records each, starting a new one when one
+fills up. Records are gathered in memory chunk at a time and then copied
+into the memory-mapped shard, after which its header is rewritten with the
+number of records so far: numpy leaves room in .npy headers for the length
+to grow in place. A shard that is still being written is therefore a valid
+.npy file of the records that made it to disk. Closing a writer trims the
+last shard to its length.
+
+    writer = ShardWriter('out', 'games-0', dtype)
+    writer.append(records)              # structured array of dtype
+    writer.close()
+    for chunk in ShardReader('out'):    # read-only memory-mapped slices
+        ...
+"""
+import glob
+import os
+import numpy as np
+from numpy.lib import format as npy
+
+def _header(dtype, length):
+    return {'descr': npy.dtype_to_descr(dtype), 'fortran_order': False,
+            'shape': (length,)}
+
+def shard_length(path):
+    """number of records in the shard at path, read from its header"""
+    with open(path, 'rb') as f:
+        version = npy.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = npy.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = npy.read_array_header_2_0(f)
+    return shape[0]
+
+class ShardWriter():
+    """Writes records of dtype to directory/prefix-00000.npy,
+    prefix-00001.npy and so on."""
+
+    def __init__(self, directory, prefix, dtype, shard_records=65536,
+                 chunk=1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.dtype = np.dtype(dtype)
+        self.shard_records = shard_records
+        self.buffer = np.zeros(chunk, dtype=self.dtype)
+        self.buffered = 0
+        self.paths = []
+        self.records = 0
+        self._shard = None
+        self._length = 0
+
+    def append(self, records):
+        """Appends a structured array of records."""
+        records = np.asarray(records, dtype=self.dtype)
+        i = 0
+        while i < len(records):
+            n = min(len(records) - i, len(self.buffer) - self.buffered)
+            self.buffer[self.buffered:self.buffered + n] = records[i:i + n]
+            self.buffered += n
+            i += n
+            if self.buffered == len(self.buffer):
+                self.flush()
+        self.records += len(records)
+
+    def flush(self):
+        """Writes the records gathered so far to the shards."""
+        i = 0
+        while i < self.buffered:
+            if self._shard is None or self._length == self.shard_records:
+                self._next_shard()
+            n = min(self.buffered - i, self.shard_records - self._length)
+            self._shard[self._length:self._length + n] = self.buffer[i:i + n]
+            self._length += n
+            i += n
+            self._shard.flush()
+            self._set_length(self._length)
+        self.buffered = 0
+
+    def close(self):
+        """Flushes and trims the last shard. Returns the paths written."""
+        self.flush()
+        self._close_shard()
+        return self.paths
+
+    def _next_shard(self):
+        self._close_shard()
+        path = os.path.join(self.directory, '%s-%05d.npy'
+                            % (self.prefix, len(self.paths)))
+        self._shard = npy.open_memmap(path, mode='w+', dtype=self.dtype,
+                                      shape=(self.shard_records,))
+        self._length = 0
+        self.paths.append(path)
+        self._set_length(0)
+
+    def _set_length(self, length):
+        with open(self.paths[-1], 'r+b') as f:
+            npy.write_array_header_1_0(f, _header(self.dtype, length))
+
+    def _close_shard(self):
+        if self._shard is None:
+            return
+        offset = self._shard.offset
+        del self._shard
+        self._shard = None
+        with open(self.paths[-1], 'r+b') as f:
+            f.truncate(offset + self._length*self.dtype.itemsize)
+
+class ShardReader():
+    """Iterates over the records of shards in chunks of up to chunk
+    records, read-only slices of the memory-mapped shards, mapping one
+    shard at a time. source is a directory, whose .npy files are read in
+    name order, or a list of paths."""
+
+    def __init__(self, source, chunk=4096):
+        if isinstance(source, str):
+            source = sorted(glob.glob(os.path.join(source, '*.npy')))
+        self.paths = list(source)
+        self.chunk = chunk
+
+    def __len__(self):
+        return sum(shard_length(path) for path in self.paths)
+
+    def __iter__(self):
+        for path in self.paths:
+            if not shard_length(path):
+                continue
+            shard = np.load(path, mmap_mode='r')
+            for i in range(0, len(shard), self.chunk):
+                yield shard[i:i + self.chunk]
+            del shard
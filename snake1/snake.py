@@ -1,10 +1,18 @@
-""" Dmitriy's first attempt at classic Snake using Pygame"""
+""" Dmitriy's first attempt at classic Snake using Pygame
+
+Run from the top of the repository, which has the shared freecells and
+dirtyrects modules:
+
+    python -m snake1.snake
+"""
 import os
 import sys
 import pygame
 from collections import deque
 from pygame.locals import *
 from random import randint
+from freecells import FreeCells
+from dirtyrects import DirtyRects, BodyTrack
 pygame.init()
 
 block_size = 20
@@ -33,20 +41,22 @@ class Pip():
 
     def paint(self, screen):
         """paints pip on the screen"""
-        paint_block(screen, self.loc, self.color)
+        if self.loc != None:
+            paint_block(screen, self.loc, self.color)
 
     def relocate(self, snake=None, loc=None):
         """ If snake object is passed and loc is None, then pip is relocated
-        to a random position that is not overlapping with the snake body. If 
-        no snake is given, pip is placed randomly without checking for overlap.
-        If a location is passed then the pip is placed there regardless of snake
+        to a random position that is not overlapping with the snake body, or
+        to None if the snake fills the board. If no snake is given, pip is
+        placed randomly without checking for overlap. If a location is passed
+        then the pip is placed there regardless of snake
         """
 
         if loc == None:
-            self.loc = (randint(0, blocksx-1), randint(0, blocksy-1))
             if snake != None:
-                while snake.is_present(self.loc):
-                    self.loc = (randint(0, blocksx-1), randint(0, blocksy-1))
+                self.loc = snake.free.sample()
+            else:
+                self.loc = (randint(0, blocksx-1), randint(0, blocksy-1))
         else:
             self.loc = loc
 
@@ -86,6 +96,8 @@ class Snake():
         if init_dir == 'down':
             self.body = deque([(init_loc[0], init_loc[1] - x) 
                         for x in range(init_len)])
+        #cells not under the snake, for placing the pip
+        self.free = FreeCells((blocksx, blocksy), self.body)
     
     def paint(self, screen, bgr= pygame.Color(0, 0, 0, 1)):
         """Paint the snake object on the backround.
@@ -103,10 +115,7 @@ class Snake():
     
     def is_present(self, loc):
         """checks if location loc is on top of the snake"""
-        if loc in self.body:
-            return True
-        else:
-            return False
+        return not self.free.is_free(loc)
 
     def set_direction(self, direc):
         if (self.direc == "left" and direc == "right"
@@ -118,7 +127,8 @@ class Snake():
         self.direc = direc
 
     def move(self, pip):
-        """Moves the head in the appropriate direction."""  
+        """Moves the head in the appropriate direction. Returns -1 if the
+        snake died and 1 if it filled the board."""  
         
         if self.direc == "left":
             nhead = (self.body[0][0] - 1, self.body[0][1])
@@ -130,18 +140,21 @@ class Snake():
             nhead = (self.body[0][0], self.body[0][1] + 1)
 
         #check if dead
-        if (nhead[0] in (-1, blocksx + 1) 
-        or nhead[1] in (-1, blocksy + 1)
-        or nhead in self.body):
+        if (nhead[0] in (-1, blocksx) 
+        or nhead[1] in (-1, blocksy)
+        or self.is_present(nhead)):
             return -1 #indicates that you're dead
 
         self.body.appendleft(nhead)
+        self.free.occupy(nhead)
 
         if nhead == pip.location():
             pip.relocate(self)
+            if pip.location() == None:
+                return 1 #nowhere left for the pip, you've won
             #potentially increase score
         else:
-            self.body.pop()
+            self.free.release(self.body.pop())
 
 
 
@@ -149,6 +162,10 @@ def main():
     screen = pygame.display.set_mode(screen_size)
     s = Snake()
     p = Pip(s)
+    #only blocks that changed are repainted, see dirtyrects
+    dirty = DirtyRects(screen, block_size, backround)
+    track = BodyTrack()
+    pip_shown = None
     pygame.time.set_timer(pygame.USEREVENT, 100)
 
     while True:
@@ -168,12 +185,25 @@ def main():
         if event.type == pygame.USEREVENT:
             updateFlag = True
         if updateFlag:
-            screen.fill(backround) #may cause flicker
             status = s.move(p)
-            s.paint(screen)
-            p.paint(screen)
-            pygame.display.update()
-            if status == -1:
+            moved = track.update(s.body)
+            if moved is None:
+                screen.fill(backround)
+                s.paint(screen)
+                p.paint(screen)
+                rects = [screen.get_rect()]
+            else:
+                old_head, freed = moved
+                for loc in freed:
+                    dirty.clear(loc)
+                dirty.paint(old_head, s.body_color)
+                dirty.paint(s.body[0], s.head_color)
+                if p.location() != pip_shown and p.location() != None:
+                    dirty.paint(p.location(), p.color)
+                rects = dirty.flush()
+            pip_shown = p.location()
+            pygame.display.update(rects)
+            if status in (-1, 1):
                 sys.exit()
 
 if __name__ == '__main__':
@@ -1,59 +1,19 @@
 """Dmitriy's first attempt at a SnakeTron ai
 """
-from snaketron.snaketron import play_ai, Snake
-
-def distance(dims, p1, p2):
-    """determines the distance between two points on a wrapping field dimensions
-    dims. Distance is defined as the minimum number of steps between p1 and p2
-    if only vertical or horizontal steps are allowed.
-    """
-    hdx = dims[0]/2
-    hdy = dims[1]/2
-    xd = abs(p1[0] - p2[0])#%hdx
-    yd = abs(p1[1] - p2[1])#%hdy
-    #wrapping around produces cyclical behavior. Ideally, some method should be
-    #developped to avoid this while still having the snake be smart enough to
-    #go through walls when it needs to, but for now just don't wrap distance
-    # if xd > hdx:
-    #     xd = xd - hdx
-    # if yd > hdy:
-    #     yd = yd - hdy
-    return xd + yd
-
-def move_to(dims, p, direc):
-    """helper function to compute the location of a move in direc from p
-    """
-    hx, hy = p
-    if direc == 'left':
-        return ((hx - 1 + dims[0])%dims[0], hy)
-    elif direc == 'right':
-        return ((hx + 1)%dims[0], hy)
-    elif direc == 'up':
-        return (hx, (hy - 1 + dims[1])%dims[1])
-    elif direc == 'down':
-        return (hx,(hy + 1)%dims[1])
-    return None
-
-def direction_distance(dims, head, pip, direc):
-    """ computes distance between head and pip if the head is to move along
-    direction direc
-    """
-    hx, hy = head
-    if direc == 'left':
-        return distance(dims, ((hx - 1 + dims[0])%dims[0], hy), pip)
-    elif direc == 'right':
-        return distance(dims, ((hx + 1)%dims[0], hy), pip)
-    elif direc == 'up':
-        return distance(dims, (hx, (hy - 1 + dims[1])%dims[1]), pip)
-    elif direc == 'down':
-        return distance(dims, (hx,(hy + 1)%dims[1]), pip)
-    return None
-
-def nearest_direction(dims, head, pip, dirs):
-    """of the directions listed in dirs, compute the one along which a move of
-    the head would put it closest to the pip, return (distance, direction)
-    """
-    return min([(direction_distance(dims, head, pip, x), x) for x in dirs])
+from snaketron.engine import Snake, distance_fields
+from grid import grid_of, DIR_CODES
+
+# weights of the penalties SnakeTronAI1 puts on each move: distance to the
+# pip, running into itself, running into the opponent, and coming within 3
+# blocks of the opponent's head without having had the last pip
+K_D = 1
+K_HIT_SELF = 10
+K_HIT_OP = 1000
+K_DOH = 100
+# distance counted for a move from which the pip can't be reached around the
+# snakes at all: more than any way round on the standard board, and less
+# than running into the opponent
+FAR = 500
 
 
 class SnakeTronAI1():
@@ -62,7 +22,8 @@ class SnakeTronAI1():
     frame update.
     This is a basic ai which follows two rules: go to the pip and avoid the
     other snake. It will always make the move that will bring it closest to the
-    pip as long as that move doesn't cause it collide with the enemy.
+    pip as long as that move doesn't cause it collide with the enemy. Distances
+    are counted the way around both snakes (see engine.distance_fields).
     """
     def __init__(self):
         self.dirs = ['left', 'right', 'up', 'down']
@@ -88,41 +49,44 @@ class SnakeTronAI1():
         else:
             mysnake = 2
             opsnake = 1
-        dims = gamestate['dims'][0]
+        grid = grid_of(gamestate['dims'][0])
         pip = gamestate['pip'][0]
         last_pip = gamestate['last_pip'][0][0] == snake_id
 
 
-        myhead = gamestate[(mysnake, 'body')][0]
-        ophead = gamestate[(opsnake, 'body')][0]
-        pl = pip
+        myhead = grid.cell(gamestate[(mysnake, 'body')][0])
+        ophead = grid.cell(gamestate[(opsnake, 'body')][0])
+        #distances around both snakes, shared with the other AI this tick
+        fields = distance_fields(gamestate)
+        if pip is None:
+            #board full, no pip to go for
+            to_pip = grid.plain_distances(myhead)
+        else:
+            to_pip = fields.from_loc(pip)
+        to_op = fields.from_cell(ophead)
         mydir = gamestate[(snake_id, 'direction')][0][0]
         dirs = list(set(self.dirs) - set([self.dir_ops[mydir]]))
 
         #a penalty for each direction is computed, and the one with the lowest
         #penalty wins
-        d = [direction_distance(dims, myhead, pl, x) for x in dirs]
-        hit_self = [Snake.is_present(gamestate, mysnake, move_to(dims, myhead, x)) for x in dirs]
-        hit_op = [Snake.is_present(gamestate, opsnake, move_to(dims, myhead, x)) for x in dirs]
-        doh = [not last_pip
-               and direction_distance(dims, myhead, ophead, x) <3
-               for x in dirs]
-
-
-        k_d = 1
-        k_hit_self = 10
-        k_hit_op = 1000
-        k_doh = 100
-        cost = [k_d*w + k_hit_self*x + k_hit_op*y + k_doh*z for w, x, y, z
-                in zip(d, hit_self, hit_op, doh)]
+        neighbors = grid.neighbors[myhead]
+        cost = []
+        for x in dirs:
+            c = neighbors[DIR_CODES[x]]
+            loc = grid.locs[c]
+            cost.append(K_D*min(to_pip[c], FAR)
+                        + K_HIT_SELF*Snake.is_present(gamestate, mysnake, loc)
+                        + K_HIT_OP*Snake.is_present(gamestate, opsnake, loc)
+                        + K_DOH*(not last_pip and to_op[c] < 3))
         return min(zip(cost, dirs))[1]
 
 def play():
+    from snaketron.snaketron import play_ai
     ai1 = SnakeTronAI1()
     #ai2 = SnakeTronAI1()
     play_ai(ai1)
 
 if __name__ == '__main__':
-    print "play snaketron against ai"
+    print("play snaketron against ai")
     play()
 
@@ -1,8 +1,96 @@
-import time
+import random
 from collections import defaultdict
-from snaketron.AIs.ai1 import SnakeTronAI1
-from snaketron.snaketron import play_ai, Snake, GameStep, copy_gamestate
-from copy import deepcopy, copy
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer
+from snaketron.AIs.ai1 import (SnakeTronAI1, K_D, K_HIT_SELF, K_HIT_OP, K_DOH,
+                               FAR)
+from snaketron import bitboard, zobrist
+from snaketron.engine import distance_fields
+from grid import grid_of
+
+# value of a win in minimax mode, less the number of moves it takes
+WIN = 10**6
+# how a minimax value in the transposition table bounds the true value
+EXACT, LOWER, UPPER = 0, 1, 2
+# subtrees shallower than this are cheaper to search again than to look up
+TABLE_DEPTH = 2
+
+class SearchTimeout(Exception):
+    """Raised inside a search once its deadline has passed"""
+
+def _to_table(value, this_move):
+    """minimax value found this_move moves into the search, with wins and
+    losses counted from there instead of from the root"""
+    if value > WIN//2:
+        return value + this_move
+    if value < -WIN//2:
+        return value - this_move
+    return value
+
+def _from_table(value, this_move):
+    """reverses _to_table"""
+    return _to_table(value, -this_move)
+
+def pip_fields(fields, pip):
+    """{pip cell: distances from it around the snakes} for the pip at pip,
+    an (x, y) location or None, measured on fields, the grid.DistanceFields
+    of the position a search starts from; see ordered_moves"""
+    if pip is None:
+        return {}
+    return {fields.grid.cell(pip): fields.from_loc(pip)}
+
+def ordered_moves(state, sid, fields=None):
+    """
+    Moves snake sid of the bitboard state is allowed to make, cheapest first
+    by SnakeTronAI1's cost, so that alpha-beta tries the likely best replies
+    first. Like SnakeTronAI1, it goes by distances to the pip around the
+    snakes, read from fields, a pip_fields dict. Searches pass the one of the
+    position they start from, which differs from state only by the few cells
+    the snakes moved since; pips placed inside the search are measured on
+    the open board. Without it, the pip of state is measured around its
+    snakes.
+    """
+    grid = grid_of(state.dims)
+    op = 3 - sid
+    head = state.ring[sid][state.head[sid]]
+    neighbors = grid.neighbors[head]
+    my_occ = state.occ[sid]
+    op_occ = state.occ[op]
+    if state.pip == bitboard.NO_PIP:
+        #board full, no pip to go for
+        to_pip = grid.plain_distances(head)
+    else:
+        if fields is None:
+            fields = {state.pip:
+                      bitboard.distance_fields(state).from_cell(state.pip)}
+        to_pip = fields.get(state.pip)
+        if to_pip is None:
+            to_pip = grid.plain_distances(state.pip)
+    last_pip = state.last_pip == sid
+    #cells the opponent's head gets to in less than 3 moves, around the
+    #snakes as they are now, which only count without the last pip
+    near_op = ()
+    if not last_pip:
+        op_head = state.ring[op][state.head[op]]
+        walls = my_occ | op_occ
+        near_op = set(grid.neighbors[op_head])
+        for n in grid.neighbors[op_head]:
+            if not (walls >> n) & 1:
+                near_op.update(grid.neighbors[n])
+        near_op.add(op_head)
+    reverse = bitboard.OPPOSITE[state.direction[sid]]
+    costs = []
+    for code in range(4):
+        if code == reverse:
+            continue
+        c = neighbors[code]
+        cost = (K_D*min(to_pip[c], FAR)
+                + K_HIT_SELF*((my_occ >> c) & 1)
+                + K_HIT_OP*((op_occ >> c) & 1)
+                + K_DOH*(c in near_op))
+        costs.append((cost, bitboard.DIRS[code]))
+    costs.sort()
+    return [direc for cost, direc in costs]
 
 class SnakeTronAI2():
     """ An object of this class is to be passed to a SnakeTron contstructor.
@@ -12,46 +100,338 @@ class SnakeTronAI2():
     to death or victory and takes the best one. If there is a tie, it is decided by
     the applying the logic of AI1 to the tied choices.
     If none do, AI2 makes the same move as AI1.
+
+    There are two ways of weighing the lookahead. In 'count' mode every
+    joint move sequence is played out and each move is scored by how many of
+    them it wins minus how many it loses. In 'minimax' mode each move is
+    scored by the worst outcome the opponent can force after it, the
+    quickest win or the slowest loss, which lets alpha-beta skip most of
+    the tree and look much further ahead in the same time.
+
+    Without an evaluator, minimax scores every position where the search
+    stops as even. With one, those positions are scored by it instead, so a
+    shallower search can still tell good moves from bad ones. Evaluators
+    score a whole batch of positions in one call, so the last batch_plies
+    moves of every line are searched without alpha-beta and all the
+    positions they reach are handed over at once.
+
+    If the game passes a deadline to update (it does for AIs whose anytime
+    attribute is true), the search deepens one move at a time until the
+    deadline and the move from the deepest finished search is played.
     """
+    anytime = True
     dirs = set(['left', 'right', 'up', 'down'])
     # directions opposite each direction
     dir_ops = {'left': set(['right']),
                'right': set(['left']),
                'up': set(['down']),
                'down': set(['up'])}
-    def __init__(self):
+    def __init__(self, lookahead=3, tt_size=None, mode='count',
+                 max_lookahead=30, workers=0, split_plies=1, evaluator=None,
+                 batch_plies=2):
+        """lookahead is the number of moves ahead to look. Using 3 can run
+        without lag, 4 makes it too slow. If tt_size is given, subtree
+        results are kept in a transposition table of that many entries for
+        as long as the AI lives, in either mode. Only subtrees in which no
+        pip is taken go in, so the table never changes the move the search
+        picks, only how many nodes it takes. It is off by default: snake
+        positions rarely repeat at the same remaining depth, and keeping
+        the keys up to date costs more than the table saves (see
+        benchmarks/snaketron_tt.py). mode is 'count' or 'minimax', see
+        above. When update is given a deadline, lookahead is ignored and the
+        search goes no deeper than max_lookahead.
+
+        If workers is more than 0, the first split_plies (1 or 2) moves of
+        every search are split across a pool of that many processes, which
+        is started on first use and kept until close(). Parallel searches
+        pick the same move as serial ones.
+
+        evaluator, in minimax mode only, is an object with an
+        evaluate(states, snake_id) method returning the value for snake_id
+        of each of a list of bitboard.BitStates, between -WIN//2 and WIN//2,
+        or 'territory' for a snaketron.territory.TerritoryEvaluator.
+
+        Every decision appends (lookahead reached, seconds taken, nodes) to
+        self.decisions. A lookahead of -1 means not even the shallowest
+        search finished and the move is AI1's.
+        """
+        if mode not in ('count', 'minimax'):
+            raise ValueError('unknown search mode ' + repr(mode))
+        if evaluator == 'territory':
+            from snaketron.territory import TerritoryEvaluator
+            evaluator = TerritoryEvaluator()
+        if evaluator is not None and mode != 'minimax':
+            raise ValueError('evaluators are only used in minimax mode')
         self.ai1 = SnakeTronAI1()
-        pass
+        self.lookahead = lookahead
+        self.mode = mode
+        if tt_size:
+            self.tt = zobrist.TranspositionTable(tt_size)
+        else:
+            self.tt = None
+        self.max_lookahead = max_lookahead
+        self.workers = workers
+        self.split_plies = split_plies
+        self.evaluator = evaluator
+        self.batch_plies = batch_plies
+        self._pool = None
+        # pip_fields of the position being searched from, which order the
+        # moves everywhere in the search
+        self.pip_fields = None
+        self.nodes = 0
+        # moves made that took the pip, which keep subtrees out of the table
+        self.pip_draws = 0
+        self.deadline = None
+        self.decisions = []
 
-    def _win_lose_recur(self, gamestate, this_move, max_moves):
+    def _win_lose_recur(self, state, this_move, max_moves):
         """
         Recursive brute force computation of wins/losses for each
-        possible move.
+        possible move. state is a bitboard.BitState; every move made on it
+        is unmade before returning, so the whole tree is walked on one state.
+        Returns {(s1 move, s2 move): (s1 wins, s2 wins)}, the wins summed
+        over the subtree under each move.
         """
-        s1allowed = self.dirs - self.dir_ops[Snake.get_direction(gamestate, 1)]
-        s2allowed = self.dirs - self.dir_ops[Snake.get_direction(gamestate, 2)]
-        moves = [(s1, s2) for s1 in s1allowed for s2 in s2allowed]
+        if self.deadline is not None and default_timer() > self.deadline:
+            raise SearchTimeout()
+        moves = self._joint_moves(state)
+        self.nodes += len(moves)
         out = {}
         for move in moves:
-            gsnew = copy_gamestate(gamestate)
-            win = GameStep.update(gsnew, move[0], move[1])
-            if win is not None or this_move == max_moves:
-                out[move] = win
-                # If a snake wins on this move, it wins on all future
-                # moves as well. For each move, there are 3 x 3 = 9
-                # different following moves. The following line scales
-                # appropriately
-                win_scale = 9 ** (max_moves - this_move)
+            out[move] = self._move_wins(state, move, this_move, max_moves)
+        return out
+
+    def _joint_moves(self, state):
+        s1allowed = self.dirs - self.dir_ops[bitboard.DIRS[state.direction[1]]]
+        s2allowed = self.dirs - self.dir_ops[bitboard.DIRS[state.direction[2]]]
+        return [(s1, s2) for s1 in s1allowed for s2 in s2allowed]
+
+    def _move_wins(self, state, move, this_move, max_moves):
+        """
+        (s1 wins, s2 wins) summed over the tree under the joint move made
+        from state.
+        """
+        win, undo = bitboard.make_move(state, move[0], move[1])
+        if bitboard.drew_pip(undo):
+            self.pip_draws += 1
+        if win is not None or this_move == max_moves:
+            wins = self._end_wins(win, this_move, max_moves)
+        else:
+            wins = self._subtree_wins(state, this_move + 1, max_moves)
+        bitboard.unmake_move(state, undo)
+        return wins
+
+    def _end_wins(self, win, this_move, max_moves):
+        """
+        (s1 wins, s2 wins) for a move that ends the game or the search.
+        """
+        # If a snake wins on this move, it wins on all future
+        # moves as well. For each move, there are 3 x 3 = 9
+        # different following moves. The following line scales
+        # appropriately
+        win_scale = 9 ** (max_moves - this_move)
+        if win is None:
+            return (0, 0)
+        elif win == 1:
+            return (win_scale, 0)
+        return (0, win_scale)
+
+    def _subtree_wins(self, state, this_move, max_moves):
+        """
+        (s1 wins, s2 wins) summed over the whole tree under state, taken from
+        the transposition table if this position was already searched as
+        deep. Only subtrees in which no pip was taken are stored: the cells
+        later pips land on depend on the state of random, so the rest would
+        not come out the same when searched again.
+        """
+        depth = max_moves - this_move
+        tt = self.tt if depth >= TABLE_DEPTH else None
+        if tt is not None:
+            wins = tt.probe(state.key, depth)
+            if wins is not None:
+                return wins
+            nodes = self.nodes
+            draws = self.pip_draws
+        s1wins = 0
+        s2wins = 0
+        for sub in self._win_lose_recur(state, this_move, max_moves).values():
+            s1wins += sub[0]
+            s2wins += sub[1]
+        if tt is not None and self.pip_draws == draws:
+            tt.store(state.key, depth, (s1wins, s2wins), self.nodes - nodes)
+        return (s1wins, s2wins)
+
+    def _ordered_moves(self, state, sid):
+        return ordered_moves(state, sid, self.pip_fields)
+
+    def _minimax_quality(self, state, snake_id, max_moves):
+        """
+        Minimax value of each of snake_id's moves. Moves are searched with
+        a window just below the best value so far, so every move that ties
+        the best gets its exact value and worse ones get an upper bound.
+        """
+        if self.evaluator is not None and max_moves < self.batch_plies:
+            return self._batched_quality(state, snake_id, 0, max_moves)
+        quality = {}
+        best = -2*WIN
+        for move in self._ordered_moves(state, snake_id):
+            value = self._min_value(state, snake_id, move, 0, max_moves,
+                                    best - 1, 2*WIN)
+            quality[move] = value
+            if value > best:
+                best = value
+        return quality
+
+    def _max_value(self, state, snake_id, this_move, max_moves, alpha, beta):
+        """
+        Best value for snake_id of its moves from state. Values outside
+        (alpha, beta) are bounds, and are kept in the transposition table
+        as such, on the same terms as in _subtree_wins, along with the best
+        move. That move is tried first the next time the position comes up,
+        usually one move deeper on the next tick or the next step of
+        iterative deepening.
+        """
+        depth = max_moves - this_move
+        if self.evaluator is not None and depth < self.batch_plies:
+            return max(self._batched_quality(state, snake_id, this_move,
+                                             max_moves).values())
+        moves = self._ordered_moves(state, snake_id)
+        tt = self.tt if depth >= TABLE_DEPTH else None
+        if tt is not None:
+            entry = tt.probe(state.key, depth)
+            if entry is not None and entry[0] == snake_id:
+                bound = entry[1]
+                value = _from_table(entry[2], this_move)
+                if (bound == EXACT or (bound == LOWER and value >= beta)
+                    or (bound == UPPER and value <= alpha)):
+                    return value
+            first = tt.best_move(state.key)
+            if first is not None and first != moves[0] and first in moves:
+                moves.remove(first)
+                moves.insert(0, first)
+            nodes = self.nodes
+            draws = self.pip_draws
+        best = -2*WIN
+        best_move = None
+        for move in moves:
+            value = self._min_value(state, snake_id, move, this_move,
+                                    max_moves, max(alpha, best), beta)
+            if value > best:
+                best = value
+                best_move = move
+                if best >= beta:
+                    break
+        if tt is not None and self.pip_draws == draws:
+            if best >= beta:
+                bound = LOWER
+            elif best <= alpha:
+                bound = UPPER
+            else:
+                bound = EXACT
+            tt.store(state.key, depth,
+                     (snake_id, bound, _to_table(best, this_move)),
+                     self.nodes - nodes, best_move)
+        return best
+
+    def _min_value(self, state, snake_id, move, this_move, max_moves, alpha,
+                   beta):
+        """
+        Worst value for snake_id over the opponent's replies to move.
+        """
+        if self.deadline is not None and default_timer() > self.deadline:
+            raise SearchTimeout()
+        op_id = 3 - snake_id
+        worst = 2*WIN
+        for op_move in self._ordered_moves(state, op_id):
+            if snake_id == 1:
+                win, undo = bitboard.make_move(state, move, op_move)
+            else:
+                win, undo = bitboard.make_move(state, op_move, move)
+            self.nodes += 1
+            if bitboard.drew_pip(undo):
+                self.pip_draws += 1
+            if win is not None:
+                if win == snake_id:
+                    value = WIN - this_move
+                else:
+                    value = this_move - WIN
+            elif this_move == max_moves:
+                value = self._leaf_value(state, snake_id)
+            else:
+                value = self._max_value(state, snake_id, this_move + 1,
+                                        max_moves, alpha, min(beta, worst))
+            bitboard.unmake_move(state, undo)
+            if value < worst:
+                worst = value
+                if worst <= alpha:
+                    break
+        return worst
+
+    def _leaf_value(self, state, snake_id):
+        if self.evaluator is None:
+            return 0
+        return self.evaluator.evaluate([state], snake_id)[0]
+
+    def _batched_quality(self, state, snake_id, this_move, max_moves):
+        """
+        Minimax value of each of snake_id's moves from state, this_move
+        moves into the search, with every position at max_moves scored in
+        one call to the evaluator.
+        """
+        leaves = []
+        tree = self._leaf_tree(state, snake_id, this_move, max_moves, leaves)
+        return self._back_up(tree, self.evaluator.evaluate(leaves, snake_id))
+
+    def _leaf_tree(self, state, snake_id, this_move, max_moves, leaves):
+        """
+        [(move, replies)] for each of snake_id's moves, where replies holds
+        for each of the opponent's answers ('won', value) if the game ends,
+        ('leaf', index into leaves) for a copy of the position at max_moves
+        or ('tree', the same for the position after it).
+        """
+        if self.deadline is not None and default_timer() > self.deadline:
+            raise SearchTimeout()
+        op_id = 3 - snake_id
+        op_moves = self._ordered_moves(state, op_id)
+        tree = []
+        for move in self._ordered_moves(state, snake_id):
+            replies = []
+            for op_move in op_moves:
+                if snake_id == 1:
+                    win, undo = bitboard.make_move(state, move, op_move)
+                else:
+                    win, undo = bitboard.make_move(state, op_move, move)
+                self.nodes += 1
                 if win is not None:
-                    if win == 1:
-                        out[move] = (win_scale, 0)
+                    if win == snake_id:
+                        replies.append(('won', WIN - this_move))
                     else:
-                        out[move] = (0, win_scale)
+                        replies.append(('won', this_move - WIN))
+                elif this_move == max_moves:
+                    replies.append(('leaf', len(leaves)))
+                    leaves.append(state.copy())
                 else:
-                    out[move] = (0, 0)
-                continue
-            out[move] = self._win_lose_recur(gsnew, this_move + 1, max_moves)
-        return out
+                    replies.append(('tree', self._leaf_tree(
+                        state, snake_id, this_move + 1, max_moves, leaves)))
+                bitboard.unmake_move(state, undo)
+            tree.append((move, replies))
+        return tree
+
+    def _back_up(self, tree, values):
+        """{move: minimax value} of a _leaf_tree given the leaf values"""
+        quality = {}
+        for move, replies in tree:
+            worst = 2*WIN
+            for kind, reply in replies:
+                if kind == 'leaf':
+                    value = values[reply]
+                elif kind == 'tree':
+                    value = max(self._back_up(reply, values).values())
+                else:
+                    value = reply
+                worst = min(worst, value)
+            quality[move] = worst
+        return quality
 
     def _parse_recur(self, subtree, snake_id):
         my_idx = snake_id - 1
@@ -66,21 +446,203 @@ class SnakeTronAI2():
         Parse the output of _win_lose_recur to figure out which move
         is best for snake snake_id
         """
-        # TODO: update interpreter and change to a lamba
-        def return_0():
-            return 0
         my_idx = snake_id - 1
-        quality = defaultdict(return_0)
+        quality = defaultdict(int)
         for move in win_lose:
             quality[move[my_idx]] = quality[move[my_idx]] + self._parse_recur(win_lose[move], snake_id)
         return quality
 
 
-    def update(self, gamestate, snake_id):
-        # last number is the number of moves ahead to look
-        # using 3 can run without lag, 4 is makes it too slow
-        win_lose = self._win_lose_recur(gamestate, 0, 3)
-        move_quality = self._move_quality(win_lose, snake_id)
+    def _search(self, state, snake_id, lookahead):
+        """
+        Quality of each of snake_id's moves searched lookahead moves ahead.
+        """
+        if self.workers:
+            return self._parallel_search(state, snake_id, lookahead)
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.mode == 'minimax':
+            return self._minimax_quality(state, snake_id, lookahead)
+        win_lose = self._win_lose_recur(state, 0, lookahead)
+        return self._move_quality(win_lose, snake_id)
+
+    def _parallel_search(self, state, snake_id, lookahead):
+        """
+        _search with the subtrees under the first split_plies moves
+        searched in the worker pool. Each subtree starts from the state of
+        random it would have in the serial search, so pips relocated inside
+        the search land on the same cells. Minimax subtrees are searched
+        with a full window, since they cannot share bounds.
+        """
+        pool = self._get_pool()
+        rng_state = random.getstate()
+        budget = None
+        if self.deadline is not None:
+            budget = self.deadline - default_timer()
+        packed = bitboard.pack(state)
+        if self.mode == 'minimax':
+            return self._parallel_minimax(state, snake_id, lookahead, pool,
+                                          packed, rng_state, budget)
+
+        moves = self._joint_moves(state)
+        self.nodes += len(moves)
+        win_lose = {}
+        futures = {}
+        for move in moves:
+            if self.split_plies < 2 or lookahead == 0:
+                futures[move] = [pool.submit(_search_task, 'count', packed,
+                                             rng_state, snake_id, move, 0,
+                                             lookahead, budget)]
+                continue
+            win, undo = bitboard.make_move(state, move[0], move[1])
+            if win is not None:
+                win_lose[move] = self._end_wins(win, 0, lookahead)
+            else:
+                child_packed = bitboard.pack(state)
+                child_rng_state = random.getstate()
+                children = self._joint_moves(state)
+                self.nodes += len(children)
+                futures[move] = [pool.submit(_search_task, 'count',
+                                             child_packed, child_rng_state,
+                                             snake_id, child, 1, lookahead,
+                                             budget)
+                                 for child in children]
+            bitboard.unmake_move(state, undo)
+        for move in futures:
+            wins = self._collect(futures[move])
+            win_lose[move] = (sum(w[0] for w in wins),
+                              sum(w[1] for w in wins))
+        return self._move_quality(win_lose, snake_id)
+
+    def _parallel_minimax(self, state, snake_id, lookahead, pool, packed,
+                          rng_state, budget):
+        """
+        The minimax half of _parallel_search. With split_plies 2 every
+        opponent reply to each move gets a task of its own, and each move is
+        worth the worst of its replies.
+        """
+        moves = self._ordered_moves(state, snake_id)
+        if self.split_plies < 2 or lookahead == 0:
+            values = self._collect(
+                [pool.submit(_search_task, 'minimax', packed, rng_state,
+                             snake_id, move, 0, lookahead, budget,
+                             self.evaluator, self.batch_plies)
+                 for move in moves])
+            return dict(zip(moves, values))
+        op_id = 3 - snake_id
+        quality = {}
+        futures = {}
+        for move in moves:
+            worst = 2*WIN
+            futures[move] = []
+            for op_move in self._ordered_moves(state, op_id):
+                if snake_id == 1:
+                    win, undo = bitboard.make_move(state, move, op_move)
+                else:
+                    win, undo = bitboard.make_move(state, op_move, move)
+                self.nodes += 1
+                if win == snake_id:
+                    worst = min(worst, WIN)
+                elif win is not None:
+                    worst = min(worst, -WIN)
+                else:
+                    # None in place of a move searches the position itself
+                    futures[move].append(pool.submit(
+                        _search_task, 'minimax', bitboard.pack(state),
+                        random.getstate(), snake_id, None, 1, lookahead,
+                        budget, self.evaluator, self.batch_plies))
+                bitboard.unmake_move(state, undo)
+            quality[move] = worst
+        for move in moves:
+            quality[move] = min([quality[move]]
+                                + self._collect(futures[move]))
+        return quality
+
+    def _collect(self, futures):
+        """
+        Results of worker tasks in order, adding up the nodes they searched.
+        """
+        try:
+            results = [f.result() for f in futures]
+        except SearchTimeout:
+            for f in futures:
+                f.cancel()
+            raise
+        for result, nodes in results:
+            self.nodes += nodes
+        return [result for result, nodes in results]
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def close(self):
+        """Shuts down the worker pool, if there is one."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _deepen(self, state, snake_id, deadline):
+        """
+        Iterative deepening: search one move further each time until the
+        deadline passes or the next search is not expected to finish before
+        it. Returns (quality, lookahead) of the deepest finished search, or
+        (None, -1) if none finished.
+        """
+        quality = None
+        reached = -1
+        prev_took = None
+        rng_state = random.getstate()
+        self.deadline = deadline
+        try:
+            for lookahead in range(self.max_lookahead + 1):
+                start = default_timer()
+                quality = self._search(state, snake_id, lookahead)
+                reached = lookahead
+                now = default_timer()
+                took = now - start
+                if self.mode == 'minimax':
+                    # forced wins and losses do not change any deeper
+                    if abs(max(quality.values())) > WIN//2:
+                        break
+                # assume the next search grows by as much as the last did
+                if prev_took:
+                    growth = took/prev_took
+                else:
+                    growth = 1
+                prev_took = took
+                if now + took*growth > deadline:
+                    break
+        except SearchTimeout:
+            # the unfinished search left moves made on state and may have
+            # drawn pips from random; state is thrown away, random is not
+            random.setstate(rng_state)
+        finally:
+            self.deadline = None
+        return quality, reached
+
+    def update(self, gamestate, snake_id, deadline=None):
+        """
+        Returns the move for snake_id. deadline, if given, is a
+        timeit.default_timer() time by which the move must be chosen.
+        """
+        start = default_timer()
+        state = bitboard.from_gamestate(gamestate)
+        if self.tt is not None:
+            zobrist.attach(state)
+        self.pip_fields = pip_fields(distance_fields(gamestate),
+                                     gamestate['pip'][0])
+        self.nodes = 0
+        if deadline is None:
+            move_quality = self._search(state, snake_id, self.lookahead)
+            reached = self.lookahead
+        else:
+            move_quality, reached = self._deepen(state, snake_id, deadline)
+        self.decisions.append((reached, default_timer() - start, self.nodes))
+        if move_quality is None:
+            self.ai1.dirs = list(self.dirs)
+            return self.ai1.update(gamestate, snake_id)
         best_moves = []
         best_move_score = float('-inf')
         for m in move_quality:
@@ -96,11 +658,50 @@ class SnakeTronAI2():
         return self.ai1.update(gamestate, snake_id)
 
 
+# one AI per search mode in each worker process, reused between tasks
+_worker_ais = {}
+
+def _search_task(mode, packed, rng_state, snake_id, move, this_move,
+                 max_moves, budget, evaluator=None, batch_plies=2):
+    """
+    Runs in a worker process: searches the subtree under move from the
+    packed bitboard state. Returns (result, nodes searched), where result is
+    the minimax value of snake_id's move or the (s1 wins, s2 wins) of the
+    joint move. In minimax mode move may be None, for the value of snake_id
+    choosing its move in the packed state. budget is the number of seconds
+    left, or None.
+    """
+    ai = _worker_ais.get(mode)
+    if ai is None:
+        ai = _worker_ais[mode] = SnakeTronAI2(mode=mode, tt_size=None)
+    ai.evaluator = evaluator
+    ai.batch_plies = batch_plies
+    random.setstate(rng_state)
+    state = bitboard.unpack(packed)
+    pip = None if state.pip == bitboard.NO_PIP else state.loc(state.pip)
+    ai.pip_fields = pip_fields(bitboard.distance_fields(state), pip)
+    ai.nodes = 0
+    if budget is not None:
+        ai.deadline = default_timer() + budget
+    try:
+        if mode == 'minimax' and move is None:
+            result = ai._max_value(state, snake_id, this_move, max_moves,
+                                   -2*WIN - 1, 2*WIN)
+        elif mode == 'minimax':
+            result = ai._min_value(state, snake_id, move, this_move,
+                                   max_moves, -2*WIN - 1, 2*WIN)
+        else:
+            result = ai._move_wins(state, move, this_move, max_moves)
+    finally:
+        ai.deadline = None
+    return result, ai.nodes
+
 def play():
+    from snaketron.snaketron import play_ai
     ai1 = SnakeTronAI2()
     #ai2 = SnakeTronAI1()
     play_ai(ai1)
 
 if __name__ == '__main__':
-    print "play snaketron against ai"
+    print("play snaketron against ai")
     play()
@@ -0,0 +1,226 @@
+"""A snaketron ai that plays games out at random to pick its moves: Monte
+Carlo tree search with decoupled UCT for the simultaneous moves.
+"""
+import math
+import random
+from timeit import default_timer
+from snaketron import bitboard
+from snaketron.engine import distance_fields
+from snaketron.AIs.ai1 import SnakeTronAI1
+from snaketron.AIs.ai2 import ordered_moves, pip_fields
+
+# score of a rollout that is cut short before either snake wins
+DRAW = 0.5
+
+class Node():
+    """Statistics of one position in the tree. Per snake values are lists
+    indexed by snake id (index 0 unused); n and w are indexed by direction
+    code and hold how often the snake played that move from here and the
+    score it got for it. Children are keyed by (snake 1 code, snake 2 code).
+    """
+    __slots__ = ('visits', 'moves', 'n', 'w', 'children')
+
+    def __init__(self, state, fields=None):
+        self.visits = 0
+        # allowed moves, cheapest by SnakeTronAI1's cost first so that the
+        # likely best one is tried first (see ordered_moves for fields)
+        self.moves = [None] + [[bitboard.DIR_CODES[d]
+                                for d in ordered_moves(state, sid, fields)]
+                               for sid in (1, 2)]
+        self.n = [None, [0]*4, [0]*4]
+        self.w = [None, [0.0]*4, [0.0]*4]
+        self.children = {}
+
+class SnakeTronAI3():
+    """ An object of this class is to be passed to a SnakeTron contstructor.
+    The SnakeTron object will call the update method of this class after every
+    frame update.
+    Rather than walking every joint move sequence like AI2, this AI grows a
+    tree of the positions that look most promising. Each iteration walks
+    down the tree, with each snake choosing its own move by UCB1 on its own
+    statistics of the node (decoupled UCT: neither snake knows what the
+    other will do), adds the first position not in the tree yet and plays
+    the game on from there with rollout moves. The win, loss or, after
+    rollout_len moves, draw is scored for every move on the way down. The
+    move played is the one the snake tried most often.
+
+    Rollout moves are 'random' (uniform over the moves that do not run into
+    a body, if there are any) or 'ai1' (SnakeTronAI1's choice, with a random
+    move every so often so that rollouts differ).
+
+    Pips land where they land in each iteration, so a node stands for the
+    joint moves that lead to it rather than one position. The part of the
+    tree under the moves actually played is kept for the next tick.
+
+    If the game passes a deadline to update (it does for AIs whose anytime
+    attribute is true), iterations run until the deadline, otherwise
+    rollouts of them.
+    """
+    anytime = True
+
+    def __init__(self, rollouts=1000, rollout='random', rollout_len=40,
+                 exploration=0.7, epsilon=0.1, reuse=True, seed=None):
+        """exploration is the UCB1 constant, epsilon how often an 'ai1'
+        rollout plays a random move instead. With reuse false every search
+        starts from an empty tree. seed seeds the AI's own random moves; the
+        pips placed in its searches are drawn from random, whose state is
+        put back afterwards.
+
+        Every decision appends (iterations, seconds taken, nodes, visits
+        kept from the last tick) to self.decisions, where nodes counts the
+        joint moves made in the tree and in rollouts.
+        """
+        if rollout not in ('random', 'ai1'):
+            raise ValueError('unknown rollout policy ' + repr(rollout))
+        self.ai1 = SnakeTronAI1()
+        self.rollouts = rollouts
+        self.rollout = rollout
+        self.rollout_len = rollout_len
+        self.exploration = exploration
+        self.epsilon = epsilon
+        self.reuse = reuse
+        self.rng = random.Random(seed)
+        self.root = None
+        # head cells at the root, to tell whether a new position follows it
+        self.root_heads = None
+        # pip_fields of the position being searched from, see ordered_moves
+        self.pip_fields = None
+        self.nodes = 0
+        self.decisions = []
+
+    def _follow(self, state):
+        """The node of the tree kept from the last tick for state, a new one
+        if state does not follow from the last root by one joint move."""
+        root = self.root
+        if root is None or not self.reuse:
+            return Node(state, self.pip_fields)
+        d1 = state.direction[1]
+        d2 = state.direction[2]
+        child = root.children.get((d1, d2))
+        h1, h2 = self.root_heads
+        if (child is None
+            or state.neighbors[h1][d1] != state.head_cell(1)
+            or state.neighbors[h2][d2] != state.head_cell(2)):
+            return Node(state, self.pip_fields)
+        return child
+
+    def _select(self, node, sid):
+        """snake sid's move at node by UCB1, untried moves first"""
+        n = node.n[sid]
+        w = node.w[sid]
+        log_visits = math.log(node.visits) if node.visits else 0.0
+        best = None
+        best_value = -1.0
+        for code in node.moves[sid]:
+            if not n[code]:
+                return code
+            value = (w[code]/n[code]
+                     + self.exploration*math.sqrt(log_visits/n[code]))
+            if value > best_value:
+                best = code
+                best_value = value
+        return best
+
+    def _iterate(self, state, root):
+        """one iteration from root on state, which is left as it was"""
+        node = root
+        path = []
+        undos = []
+        while True:
+            c1 = self._select(node, 1)
+            c2 = self._select(node, 2)
+            path.append((node, c1, c2))
+            win, undo = bitboard.make_move(state, bitboard.DIRS[c1],
+                                           bitboard.DIRS[c2])
+            undos.append(undo)
+            self.nodes += 1
+            if win is not None:
+                score = 1.0 if win == 1 else 0.0
+                break
+            child = node.children.get((c1, c2))
+            if child is None:
+                node.children[(c1, c2)] = Node(state, self.pip_fields)
+                score = self._play_out(state)
+                break
+            node = child
+        for undo in reversed(undos):
+            bitboard.unmake_move(state, undo)
+        for node, c1, c2 in path:
+            node.visits += 1
+            node.n[1][c1] += 1
+            node.w[1][c1] += score
+            node.n[2][c2] += 1
+            node.w[2][c2] += 1.0 - score
+
+    def _play_out(self, state):
+        """score for snake 1 of playing on from state with rollout moves"""
+        state = state.copy()
+        if self.rollout == 'ai1':
+            policy = self._ai1_move
+        else:
+            policy = self._random_move
+        for t in range(self.rollout_len):
+            win = bitboard.step(state, policy(state, 1), policy(state, 2))
+            self.nodes += 1
+            if win is not None:
+                return 1.0 if win == 1 else 0.0
+        return DRAW
+
+    def _random_move(self, state, sid):
+        occ = state.occ[1] | state.occ[2]
+        neighbors = state.neighbors[state.head_cell(sid)]
+        reverse = bitboard.OPPOSITE[state.direction[sid]]
+        safe = [code for code in range(4)
+                if code != reverse and not (occ >> neighbors[code]) & 1]
+        if not safe:
+            safe = [code for code in range(4) if code != reverse]
+        return bitboard.DIRS[self.rng.choice(safe)]
+
+    def _ai1_move(self, state, sid):
+        if self.rng.random() < self.epsilon:
+            return self._random_move(state, sid)
+        return ordered_moves(state, sid, self.pip_fields)[0]
+
+    def update(self, gamestate, snake_id, deadline=None):
+        """
+        Returns the move for snake_id. deadline, if given, is a
+        timeit.default_timer() time by which the move must be chosen.
+        """
+        start = default_timer()
+        state = bitboard.from_gamestate(gamestate)
+        self.pip_fields = pip_fields(distance_fields(gamestate),
+                                     gamestate['pip'][0])
+        root = self._follow(state)
+        kept = root.visits
+        self.nodes = 0
+        rng_state = random.getstate()
+        iterations = 0
+        try:
+            if deadline is None:
+                for iterations in range(1, self.rollouts + 1):
+                    self._iterate(state, root)
+            else:
+                while default_timer() < deadline:
+                    self._iterate(state, root)
+                    iterations += 1
+        finally:
+            random.setstate(rng_state)
+        self.decisions.append((iterations, default_timer() - start,
+                               self.nodes, kept))
+        self.root = root
+        self.root_heads = (state.head_cell(1), state.head_cell(2))
+        n = root.n[snake_id]
+        if not root.visits:
+            return self.ai1.update(gamestate, snake_id)
+        # moves are in SnakeTronAI1's order, which settles ties
+        best = max(root.moves[snake_id], key=lambda code: n[code])
+        return bitboard.DIRS[best]
+
+def play():
+    from snaketron.snaketron import play_ai
+    ai1 = SnakeTronAI3()
+    play_ai(ai1)
+
+if __name__ == '__main__':
+    print("play snaketron against ai")
+    play()
@@ -0,0 +1,133 @@
+"""Running an AI next to the game loop instead of inside it.
+
+An AIWorker owns an AI in a worker process (or thread). Every tick the game
+asks it for a move on a copy of the gamestate and goes on handling input and
+drawing; at the next tick it takes whatever answer came in. An AI that has
+not answered by then misses the tick, which is recorded, and its snake keeps
+going the way it was:
+
+    worker = AIWorker(ai)
+    worker.ask(tick, gamestate, 1, budget)
+    ...                           # one tick later
+    direction = worker.answer()   # None if the AI missed the tick
+    worker.close()
+
+A worker that falls behind skips straight to the newest question, so one
+slow move does not make every later one late as well. Processes sidestep
+the GIL, so a searching AI cannot slow the game loop down; threads share
+the AI object with the caller, which is handy for inspecting it afterwards.
+"""
+import multiprocessing
+import threading
+from collections import deque
+from timeit import default_timer
+from snaketron.engine import copy_gamestate
+
+# share of each tick a worker's anytime AI may spend on its move. Workers
+# think in parallel and the game loop does not wait, but the answer has to
+# be back before the next tick
+async_time_share = 0.8
+
+class AIWorker():
+    """AI answering update(gamestate, snake_id) calls in a worker process,
+    or a thread if processes is false."""
+
+    def __init__(self, ai, processes=True):
+        self.ai = ai
+        #tick of the question waiting for an answer, None if there is none
+        self.asked = None
+        #ticks whose answer did not come in time
+        self.misses = []
+        #answers that came in after their tick was over
+        self.late = 0
+        if processes:
+            self.conn, child = multiprocessing.Pipe()
+            self.worker = multiprocessing.Process(target=serve,
+                                                  args=(ai, child))
+        else:
+            self.conn, child = queue_pipe()
+            self.worker = threading.Thread(target=serve, args=(ai, child))
+        self.worker.daemon = True
+        self.worker.start()
+
+    def ask(self, tick, gamestate, snake_id, budget=None):
+        """Asks for snake_id's move in gamestate (which is copied). Anytime
+        AIs are given budget seconds from when the worker gets to it."""
+        if not getattr(self.ai, 'anytime', False):
+            budget = None
+        self.conn.send((tick, copy_gamestate(gamestate, full=False), snake_id,
+                        budget))
+        self.asked = tick
+
+    def answer(self):
+        """The answer to the last question, or None if it is not in yet (a
+        miss) or nothing was asked. Answers to older questions are dropped.
+        """
+        if self.asked is None:
+            return None
+        direction = None
+        answered = False
+        while self.conn.poll():
+            tick, move = self.conn.recv()
+            if tick == self.asked:
+                direction = move
+                answered = True
+            else:
+                self.late += 1
+        if not answered:
+            self.misses.append(self.asked)
+        self.asked = None
+        return direction
+
+    def close(self):
+        self.conn.send(None)
+        self.worker.join(1)
+        if hasattr(self.worker, 'terminate') and self.worker.is_alive():
+            self.worker.terminate()
+
+def serve(ai, conn):
+    """Worker loop: answers (tick, gamestate, snake_id, budget) questions
+    with (tick, direction) until it gets None"""
+    while True:
+        question = conn.recv()
+        #only the newest question is worth answering
+        while question is not None and conn.poll():
+            question = conn.recv()
+        if question is None:
+            return
+        tick, gamestate, snake_id, budget = question
+        if budget is None:
+            move = ai.update(gamestate, snake_id)
+        else:
+            move = ai.update(gamestate, snake_id,
+                             deadline=default_timer() + budget)
+        conn.send((tick, move))
+
+class QueueEnd():
+    """One end of a duplex queue pair, with the send/recv/poll subset of a
+    multiprocessing Connection that AIWorker uses"""
+
+    def __init__(self, inbox, outbox, ready):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.ready = ready
+
+    def send(self, obj):
+        with self.ready:
+            self.outbox.append(obj)
+            self.ready.notify_all()
+
+    def recv(self):
+        with self.ready:
+            while not self.inbox:
+                self.ready.wait()
+            return self.inbox.popleft()
+
+    def poll(self):
+        return bool(self.inbox)
+
+def queue_pipe():
+    """two connected QueueEnds for talking to a thread"""
+    a, b = deque(), deque()
+    ready = threading.Condition()
+    return QueueEnd(a, b, ready), QueueEnd(b, a, ready)
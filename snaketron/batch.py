@@ -0,0 +1,265 @@
+"""Many snaketron games stepped at once with numpy.
+
+BatchGame holds n games in arrays: per snake occupancy grids, ring buffers
+of body cells with head and tail indices, directions, the pip and last_pip.
+step applies one joint move to every running game with the rules of
+snaketron.engine (GameStep.check_collisions and Snake.move), in bulk.
+Cells and direction codes are the same as in snaketron.bitboard.
+
+Pips are drawn uniformly from the free cells with the batch's own numpy
+generator, so the games do not follow the random module's stream the way
+the scalar engines do. While the snakes cover the whole board a game has no
+pip (NO_PIP), and one is drawn every step until there is room for it, as
+the engine does. crosscheck runs a batch next to snaketron.engine on random
+moves and reports any game where the two disagree.
+
+    games = BatchGame(4096, seed=0)
+    moves = numpy.random.randint(0, 4, size=(4096, 2))
+    winners = games.step(moves)
+"""
+import random
+import numpy as np
+from snaketron import bitboard
+from snaketron.bitboard import NO_PIP
+from snaketron.engine import blocksx, blocksy, Snake
+from snaketron.engine import step as engine_step
+
+OPPOSITE = np.array(bitboard.OPPOSITE, dtype=np.int8)
+
+class BatchGame():
+    """n snaketron games on boards of size dims.
+
+    Arrays, with snake 1 at index 0 and snake 2 at index 1 of the second
+    axis:
+    occ - (n, 2, cells) bool, cells occupied by each snake
+    ring - (n, 2, cells) body cells, head at ring[head], tail at ring[tail]
+    pos - (n, 2, cells) ring index of each occupied cell
+    head, tail, direction, next_direction - (n, 2)
+    pip, last_pip - (n,), pip NO_PIP while the board is full
+    winner - (n,) 0 while a game runs, then the id of the winning snake
+    """
+
+    def __init__(self, n, dims=(blocksx, blocksy), seed=None):
+        self.n = n
+        self.dims = dims
+        self.ncells = dims[0]*dims[1]
+        self.neighbors = np.array(bitboard.neighbor_table(dims), dtype=np.int32)
+        self.rng = np.random.RandomState(seed)
+        shape = (n, 2, self.ncells)
+        self.occ = np.zeros(shape, dtype=bool)
+        self.ring = np.zeros(shape, dtype=np.int32)
+        self.pos = np.zeros(shape, dtype=np.int32)
+        self.head = np.zeros((n, 2), dtype=np.int32)
+        self.tail = np.zeros((n, 2), dtype=np.int32)
+        self.direction = np.zeros((n, 2), dtype=np.int8)
+        self.next_direction = np.zeros((n, 2), dtype=np.int8)
+        self.pip = np.zeros(n, dtype=np.int32)
+        self.last_pip = np.zeros(n, dtype=np.int8)
+        self.winner = np.zeros(n, dtype=np.int8)
+        start = {'dims': [dims]}
+        Snake.reset(start, 1)
+        Snake.reset(start, 2)
+        self._start = start
+        self.reset()
+
+    def reset(self, games=None):
+        """Puts games (indices or a bool mask, default all) back at the start
+        of a game with a freshly drawn pip."""
+        if games is None:
+            games = np.arange(self.n)
+        games = np.arange(self.n)[games]
+        for i in games:
+            self._load(i, self._start)
+        self.last_pip[games] = 1
+        self._relocate_pips(games)
+
+    def reset_finished(self):
+        """Restarts every game that has a winner. Returns their indices."""
+        games = np.nonzero(self.winner)[0]
+        self.reset(games)
+        return games
+
+    def set_gamestate(self, i, gamestate):
+        """Loads a snaketron.engine gamestate into game i."""
+        self._load(i, gamestate)
+        bx = self.dims[0]
+        pip = gamestate['pip'][0]
+        self.pip[i] = NO_PIP if pip is None else pip[0] + pip[1]*bx
+        self.last_pip[i] = gamestate['last_pip'][0][0]
+
+    def _load(self, i, gamestate):
+        bx = self.dims[0]
+        self.occ[i] = False
+        self.winner[i] = 0
+        for s in (0, 1):
+            sid = s + 1
+            cells = [x + y*bx for x, y in gamestate[(sid, 'body')]]
+            self.ring[i, s, :len(cells)] = cells
+            self.occ[i, s, cells] = True
+            self.pos[i, s, cells] = np.arange(len(cells))
+            self.head[i, s] = 0
+            self.tail[i, s] = len(cells) - 1
+            self.direction[i, s] = bitboard.DIR_CODES[
+                gamestate[(sid, 'direction')][0][0]]
+            self.next_direction[i, s] = bitboard.DIR_CODES[
+                gamestate[(sid, 'next_direction')][0][0]]
+
+    def gamestate(self, i):
+        """snaketron.engine gamestate dict of game i"""
+        bx = self.dims[0]
+        pip = int(self.pip[i])
+        gamestate = {
+            'dims': [self.dims],
+            'pip': [None if pip == NO_PIP else (pip % bx, pip // bx)],
+            'last_pip': [(int(self.last_pip[i]),)]
+        }
+        for s in (0, 1):
+            sid = s + 1
+            length = (self.tail[i, s] - self.head[i, s]) % self.ncells + 1
+            idx = (self.head[i, s] + np.arange(length)) % self.ncells
+            gamestate[(sid, 'body')] = [(int(c) % bx, int(c) // bx)
+                                        for c in self.ring[i, s, idx]]
+            gamestate[(sid, 'direction')] = [
+                (bitboard.DIRS[self.direction[i, s]],)]
+            gamestate[(sid, 'next_direction')] = [
+                (bitboard.DIRS[self.next_direction[i, s]],)]
+        return gamestate
+
+    def lengths(self):
+        """(n, 2) body lengths"""
+        return (self.tail - self.head) % self.ncells + 1
+
+    def step(self, moves):
+        """Applies moves, an (n, 2) array of direction codes for snakes 1
+        and 2, to every game without a winner. Codes outside 0-3, like -1,
+        leave the snake's direction as it was. Returns an (n,) array with
+        the winner of each game that ended on this step and 0 elsewhere.
+        """
+        moves = np.asarray(moves)
+        ended = np.zeros(self.n, dtype=np.int8)
+        g = np.nonzero(self.winner == 0)[0]
+        if not len(g):
+            return ended
+        ncells = self.ncells
+        rows = g[:, None]
+        sids = np.array([[0, 1]])
+
+        # Snake.set_direction
+        mv = moves[g]
+        valid = (mv >= 0) & (mv < 4)
+        mv = np.where(valid, mv, 0)
+        turn = valid & (mv != OPPOSITE[self.direction[g]])
+        direc = np.where(turn, mv, self.next_direction[g]).astype(np.int8)
+        self.next_direction[g] = direc
+        self.direction[g] = direc
+
+        # Snake.move, both snakes at once
+        h = self.head[g]
+        t = self.tail[g]
+        nhead = self.neighbors[self.ring[rows, sids, h], direc]
+        gi, si = np.nonzero(self.occ[rows, sids, nhead])
+        if len(gi):
+            # ran into itself: cut the tail off through the new head
+            games = g[gi]
+            cut = self.pos[games, si, nhead[gi, si]]
+            count = (t[gi, si] - cut) % ncells + 1
+            start = np.repeat(np.cumsum(count) - count, count)
+            idx = (np.repeat(cut, count) + np.arange(count.sum()) - start) % ncells
+            self.occ[np.repeat(games, count), np.repeat(si, count),
+                     self.ring[np.repeat(games, count), np.repeat(si, count),
+                               idx]] = False
+            t[gi, si] = (cut - 1) % ncells
+        # the tail goes unless the pip was reached
+        gi, si = np.nonzero(nhead != self.pip[rows])
+        self.occ[g[gi], si, self.ring[g[gi], si, t[gi, si]]] = False
+        t[gi, si] = (t[gi, si] - 1) % ncells
+        h = (h - 1) % ncells
+        self.ring[rows, sids, h] = nhead
+        self.occ[rows, sids, nhead] = True
+        self.pos[rows, sids, nhead] = h
+        self.head[g] = h
+        self.tail[g] = t
+
+        # GameStep.check_collisions
+        h1 = nhead[:, 0]
+        h2 = nhead[:, 1]
+        hit1 = self.occ[g, 0, h2]
+        hit2 = self.occ[g, 1, h1]
+        first1 = self.last_pip[g] == 1
+        win = np.where(first1,
+                       np.where(hit1, 1, np.where(hit2, 2, 0)),
+                       np.where(hit2, 2, np.where(hit1, 1, 0))).astype(np.int8)
+        self.winner[g] = win
+        ended[g] = win
+        running = win == 0
+        pip = self.pip[g]
+        took1 = running & (h1 == pip)
+        took2 = running & (h2 == pip)
+        self.last_pip[g[took1]] = 1
+        self.last_pip[g[took2]] = 2
+        # a full board gets its pip back once the snakes make room
+        self._relocate_pips(g[took1 | took2 | (running & (pip == NO_PIP))])
+        return ended
+
+    def _relocate_pips(self, games):
+        """Places the pip of each of games on a free cell, uniformly, or sets
+        it to NO_PIP if the snakes cover the board"""
+        if not len(games):
+            return
+        free = ~(self.occ[games, 0] | self.occ[games, 1])
+        r = self.rng.random_sample(free.shape)
+        r[~free] = -1
+        self.pip[games] = np.where(free.any(axis=1), r.argmax(axis=1),
+                                   NO_PIP)
+
+def full_gamestate(dims=(blocksx, blocksy)):
+    """A snaketron.engine gamestate with the snakes covering the whole board
+    and so no pip. They wind through it row by row, snake 1 from its tail in
+    the top left corner and snake 2 on from its head next to snake 1's, so
+    most moves run into a body."""
+    bx, by = dims
+    path = [(x if y % 2 == 0 else bx - 1 - x, y)
+            for y in range(by) for x in range(bx)]
+    half = len(path)//2
+    gamestate = {'dims': [dims], 'pip': [None], 'last_pip': [(1,)]}
+    for sid, body in ((1, path[half - 1::-1]), (2, path[half:])):
+        x, y = body[0]
+        nx, ny = body[1]
+        direc = bitboard.DIRS[bitboard.neighbor_table(dims)[
+            nx + ny*bx].index(x + y*bx)]
+        gamestate[(sid, 'body')] = body
+        gamestate[(sid, 'direction')] = [(direc,)]
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+    return gamestate
+
+def crosscheck(n=200, steps=300, seed=0):
+    """Steps n games in a BatchGame and in snaketron.engine side by side on
+    the same random moves, including reversals and invalid ones, and returns
+    a list of (game, step) where they disagree. Every fourth game starts
+    from full_gamestate instead of the usual start. Pips relocated by the
+    batch are copied into the engine's games, since the two draw from
+    different generators.
+    """
+    rng = np.random.RandomState(seed)
+    batch = BatchGame(n, seed=seed)
+    full = full_gamestate(batch.dims)
+    for i in range(0, n, 4):
+        batch.set_gamestate(i, full)
+    games = [batch.gamestate(i) for i in range(n)]
+    names = bitboard.DIRS + (None,)
+    mismatches = []
+    rng_state = random.getstate()
+    for s in range(steps):
+        moves = rng.randint(-1, 4, size=(n, 2))
+        running = batch.winner == 0
+        winners = batch.step(moves)
+        for i in np.nonzero(running)[0]:
+            win = engine_step(games[i], names[moves[i, 0]], names[moves[i, 1]])
+            games[i]['pip'][0] = batch.gamestate(i)['pip'][0]
+            # the engine's index of free cells has no counterpart here
+            game = {k: v for k, v in games[i].items() if k != 'free'}
+            if (win or 0) != winners[i] or game != batch.gamestate(i):
+                mismatches.append((i, s))
+                batch.winner[i] = -1
+    random.setstate(rng_state)
+    return mismatches
@@ -0,0 +1,314 @@
+"""Bitboard encoding of the snaketron gamestate for search code.
+
+Cells are numbered x + y*width. Each snake keeps its occupancy as a single
+int bitmask, so membership and overlap tests are one shift or one and,
+plus a ring buffer of its cells with the ring index of the head and of the
+tail. Rings are a power of two long and only grow, so copying a state costs
+about as much as copying the bodies themselves. The rules are the same as in
+snaketron.engine, so a BitState stepped with the same moves stays equal to the
+dict gamestate it was built from up to where relocated pips land: the engine
+draws them from its index of free cells, while here a random cell is tried
+until one is free, which the occupancy masks make cheap.
+
+    state = from_gamestate(gamestate)
+    win = step(state, 'up', 'left')
+    gamestate = to_gamestate(state)
+
+Search code can walk a tree on a single state with make_move/unmake_move
+instead of copying it at every node. A state with zobrist keys attached (see
+snaketron.zobrist) also keeps state.key up to date as it moves.
+"""
+from random import randint, getstate, setstate
+from grid import (LEFT, RIGHT, UP, DOWN, DIRS, DIR_CODES, OPPOSITE,
+                  neighbor_table, DistanceFields)
+
+# pip cell while the snakes cover the whole board and there is no room for it
+NO_PIP = -1
+
+class BitState():
+    """Snaketron gamestate as bitboards. Per snake values are lists indexed by
+    snake id (index 0 unused), cells are ints and directions are codes into
+    DIRS.
+    """
+    __slots__ = ('dims', 'neighbors', 'occ', 'ring', 'head', 'tail',
+                 'direction', 'next_direction', 'pip', 'last_pip',
+                 'zobrist', 'key')
+
+    def copy(self):
+        new = BitState.__new__(BitState)
+        new.dims = self.dims
+        new.neighbors = self.neighbors
+        new.occ = self.occ[:]
+        new.ring = [None, self.ring[1][:], self.ring[2][:]]
+        new.head = self.head[:]
+        new.tail = self.tail[:]
+        new.direction = self.direction[:]
+        new.next_direction = self.next_direction[:]
+        new.pip = self.pip
+        new.last_pip = self.last_pip
+        new.zobrist = self.zobrist
+        new.key = self.key
+        return new
+
+    def cell(self, loc):
+        return loc[0] + loc[1]*self.dims[0]
+
+    def loc(self, cell):
+        return (cell % self.dims[0], cell // self.dims[0])
+
+    def head_cell(self, sid):
+        return self.ring[sid][self.head[sid]]
+
+    def length(self, sid):
+        return ((self.tail[sid] - self.head[sid]) & (len(self.ring[sid]) - 1)) + 1
+
+    def cells(self, sid):
+        """cells of snake sid, head first"""
+        ring = self.ring[sid]
+        h = self.head[sid]
+        mask = len(ring) - 1
+        return [ring[(h + i) & mask] for i in range(self.length(sid))]
+
+    def body(self, sid):
+        """body of snake sid as a list of (x, y), head first"""
+        return [self.loc(c) for c in self.cells(sid)]
+
+    def is_present(self, sid, loc):
+        """checks if location loc (x, y) is on top of the snake"""
+        return (self.occ[sid] >> self.cell(loc)) & 1 == 1
+
+def from_gamestate(gamestate):
+    """Build a BitState from a snaketron.engine gamestate dict."""
+    dims = tuple(gamestate['dims'][0])
+    bx = dims[0]
+    pip = gamestate['pip'][0]
+    return _build(dims,
+                  [[x + y*bx for x, y in gamestate[(sid, 'body')]]
+                   for sid in (1, 2)],
+                  [DIR_CODES[gamestate[(sid, 'direction')][0][0]]
+                   for sid in (1, 2)],
+                  [DIR_CODES[gamestate[(sid, 'next_direction')][0][0]]
+                   for sid in (1, 2)],
+                  NO_PIP if pip is None else pip[0] + pip[1]*bx,
+                  gamestate['last_pip'][0][0])
+
+def pack(state):
+    """Compact, picklable tuple of everything in a BitState except zobrist
+    keys, for shipping states to other processes. unpack reverses it."""
+    return (state.dims, tuple(state.cells(1)), tuple(state.cells(2)),
+            state.direction[1], state.direction[2],
+            state.next_direction[1], state.next_direction[2],
+            state.pip, state.last_pip)
+
+def unpack(packed):
+    dims, cells1, cells2, d1, d2, nd1, nd2, pip, last_pip = packed
+    return _build(dims, [list(cells1), list(cells2)], [d1, d2], [nd1, nd2],
+                  pip, last_pip)
+
+def _build(dims, bodies, directions, next_directions, pip, last_pip):
+    """BitState from lists of cells, head first, and direction codes of
+    snakes 1 and 2"""
+    state = BitState.__new__(BitState)
+    state.dims = dims
+    state.neighbors = neighbor_table(dims)
+    state.occ = [0, 0, 0]
+    state.ring = [None, None, None]
+    state.head = [0, 0, 0]
+    state.tail = [0, 0, 0]
+    state.direction = [0] + directions
+    state.next_direction = [0] + next_directions
+    for sid in (1, 2):
+        cells = bodies[sid - 1]
+        occ = 0
+        for c in cells:
+            occ |= 1 << c
+        state.ring[sid] = _new_ring(cells)
+        state.occ[sid] = occ
+        state.tail[sid] = len(cells) - 1
+    state.pip = pip
+    state.last_pip = last_pip
+    state.zobrist = None
+    state.key = 0
+    return state
+
+def to_gamestate(state):
+    """Build a snaketron.engine gamestate dict from a BitState."""
+    gamestate = {
+        'dims': [state.dims],
+        'pip': [None if state.pip == NO_PIP else state.loc(state.pip)],
+        'last_pip': [(state.last_pip,)]
+    }
+    for sid in (1, 2):
+        gamestate[(sid, 'direction')] = [(DIRS[state.direction[sid]],)]
+        gamestate[(sid, 'next_direction')] = [
+            (DIRS[state.next_direction[sid]],)]
+        gamestate[(sid, 'body')] = state.body(sid)
+    return gamestate
+
+def distance_fields(state):
+    """A new grid.DistanceFields of the position of state, with the snake
+    bodies as walls, as snaketron.engine.distance_fields makes for a
+    gamestate"""
+    return DistanceFields(state.dims, state.body(1) + state.body(2))
+
+def _new_ring(cells, min_size=16):
+    """ring buffer holding cells from index 0 with room to spare"""
+    size = min_size
+    while size < 2*len(cells):
+        size *= 2
+    return cells + [0]*(size - len(cells))
+
+def step(state, s1dir, s2dir):
+    """Advance state by one tick in place. s1dir and s2dir are direction
+    names as in GameStep.update. Returns the winning snake id or None."""
+    set_direction(state, 1, s1dir)
+    set_direction(state, 2, s2dir)
+    move(state, 1)
+    move(state, 2)
+    return check_collisions(state)
+
+def make_move(state, s1dir, s2dir):
+    """Same as step, but also returns what unmake_move needs to put state back
+    exactly as it was: (win, undo). The state of random is saved if the pip
+    gets relocated, so unmaking a move does not change later pip draws.
+    """
+    h1 = state.head[1]
+    h2 = state.head[2]
+    ring1 = state.ring[1]
+    ring2 = state.ring[2]
+    # the slot in front of the head is the only ring entry a move writes to
+    slot1 = (h1 - 1) & (len(ring1) - 1)
+    slot2 = (h2 - 1) & (len(ring2) - 1)
+    undo = (state.direction[1], state.next_direction[1], h1, state.tail[1],
+            state.occ[1], ring1, slot1, ring1[slot1],
+            state.direction[2], state.next_direction[2], h2, state.tail[2],
+            state.occ[2], ring2, slot2, ring2[slot2],
+            state.pip, state.last_pip, state.key)
+    set_direction(state, 1, s1dir)
+    set_direction(state, 2, s2dir)
+    move(state, 1)
+    move(state, 2)
+    rng_state = None
+    pip = state.pip
+    if (state.ring[1][state.head[1]] == pip
+        or state.ring[2][state.head[2]] == pip or pip == NO_PIP):
+        rng_state = getstate()
+    return check_collisions(state), (undo, rng_state)
+
+def unmake_move(state, undo):
+    """Reverts the make_move that returned undo. Moves have to be unmade in
+    the reverse order they were made in."""
+    undo, rng_state = undo
+    (state.direction[1], state.next_direction[1], state.head[1], state.tail[1],
+     state.occ[1], ring1, slot1, cell1,
+     state.direction[2], state.next_direction[2], state.head[2], state.tail[2],
+     state.occ[2], ring2, slot2, cell2,
+     state.pip, state.last_pip, state.key) = undo
+    ring1[slot1] = cell1
+    ring2[slot2] = cell2
+    state.ring[1] = ring1
+    state.ring[2] = ring2
+    if rng_state is not None:
+        setstate(rng_state)
+
+def drew_pip(undo):
+    """True if the make_move that returned undo took the pip (or had none to
+    take), so what follows it depends on the state of random."""
+    return undo[1] is not None
+
+def set_direction(state, sid, direc):
+    code = DIR_CODES.get(direc)
+    if code is None or code == OPPOSITE[state.direction[sid]]:
+        return
+    state.next_direction[sid] = code
+
+def move(state, sid):
+    """Moves the head of snake sid one cell, truncating at the new head if it
+    runs into itself and dropping the tail unless the pip was reached."""
+    d = state.next_direction[sid]
+    ring = state.ring[sid]
+    mask = len(ring) - 1
+    h = state.head[sid]
+    t = state.tail[sid]
+    occ = state.occ[sid]
+    old_head = ring[h]
+    nhead = state.neighbors[old_head][d]
+    bit = 1 << nhead
+    if occ & bit:
+        #truncate tail
+        val = ring[t]
+        occ ^= 1 << val
+        t = (t - 1) & mask
+        while val != nhead:
+            val = ring[t]
+            occ ^= 1 << val
+            t = (t - 1) & mask
+    if nhead != state.pip:
+        occ ^= 1 << ring[t]
+        t = (t - 1) & mask
+    if state.zobrist is not None:
+        state.key ^= state.zobrist.move_delta(
+            sid, ring, mask, h, state.tail[sid], t, nhead,
+            state.direction[sid], d)
+    if nhead == state.pip and ((t - h) & mask) == mask:
+        # ring is full, grow it before the new head overwrites the tail
+        cells = ring[h:] + ring[:h]
+        ring = _new_ring(cells)
+        state.ring[sid] = ring
+        mask = len(ring) - 1
+        h = 0
+        t = len(cells) - 1
+    h = (h - 1) & mask
+    ring[h] = nhead
+    state.head[sid] = h
+    state.tail[sid] = t
+    state.occ[sid] = occ | bit
+    state.direction[sid] = d
+
+def check_collisions(state):
+    """Same rules as GameStep.check_collisions: returns the winning snake or
+    None, relocating the pip if a head reached it."""
+    h1 = state.ring[1][state.head[1]]
+    h2 = state.ring[2][state.head[2]]
+    occ1 = state.occ[1]
+    occ2 = state.occ[2]
+    if state.last_pip == 1:
+        if (occ1 >> h2) & 1:
+            return 1
+        if (occ2 >> h1) & 1:
+            return 2
+    else:
+        if (occ2 >> h1) & 1:
+            return 2
+        if (occ1 >> h2) & 1:
+            return 1
+
+    if h1 == state.pip:
+        _take_pip(state, 1)
+    if h2 == state.pip:
+        _take_pip(state, 2)
+    if state.pip == NO_PIP:
+        _take_pip(state, state.last_pip)
+
+def _take_pip(state, sid):
+    pip = state.pip
+    last_pip = state.last_pip
+    relocate_pip(state)
+    state.last_pip = sid
+    if state.zobrist is not None:
+        state.key ^= state.zobrist.pip_delta(pip, state.pip, last_pip, sid)
+
+def relocate_pip(state):
+    """Randomly places the pip on a cell not occupied by either snake, or
+    sets it to NO_PIP if they cover the board"""
+    bx, by = state.dims
+    occ = state.occ[1] | state.occ[2]
+    if occ == (1 << bx*by) - 1:
+        state.pip = NO_PIP
+        return
+    x = randint(0, bx-1)
+    y = randint(0, by-1)
+    while (occ >> (x + y*bx)) & 1:
+        x = randint(0, bx-1)
+        y = randint(0, by-1)
+    state.pip = x + y*bx
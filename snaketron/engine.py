@@ -0,0 +1,349 @@
+"""Headless simulation core for snaketron.
+
+Everything needed to run a game lives here with no dependency on pygame, so
+AIs and batch runs can simulate games without a display. The full state of a
+game is a single dict (see GameStep.reset); the display code in
+snaketron.snaketron only reads it.
+
+    gamestate = reset(seed)
+    win = step(gamestate, 'up', 'left')
+
+step returns None while the game goes on, otherwise the id of the winning
+snake. Pips are drawn from gamestate['rng'], a random.Random seeded with
+gamestate['seed'], so a game is fully determined by its seed and the moves
+made (see snaketron.replay). Gamestates without one, such as the copies AIs
+get, draw from the random module.
+
+Besides the game itself, gamestate['free'] holds a freecells.FreeCells of the
+cells neither snake is on, kept up to date as the snakes move, from which the
+pip is placed. Gamestates built elsewhere without it get one the first time a
+pip is placed; code that changes a body by hand has to drop it the same way.
+
+gamestate['fields'], made by distance_fields when it is first asked for,
+measures distances around the snakes for the AIs (see grid.DistanceFields).
+It holds for one position only: every step drops it, and so has code that
+changes a body by hand. The copies AIs get share it, so two AIs asking for
+the same field in the same tick search it once.
+"""
+import random
+from timeit import default_timer
+from freecells import FreeCells
+from grid import grid_of, DIR_CODES, OPPOSITE, DistanceFields
+
+blocksx = 31
+blocksy = 31
+
+# share of each tick an anytime AI may spend on its move. Both AIs think in
+# the same tick, so this has to stay under one half
+ai_time_share = 0.4
+
+# entries of a gamestate the engine keeps for itself rather than the game
+ENGINE_KEYS = ('free', 'rng', 'fields')
+# of those, the ones AI copies share with the game: they describe nothing but
+# the position as it is, and are dropped as soon as it changes
+SHARED_KEYS = ('fields',)
+
+def copy_gamestate(gamestate, full=True):
+    """Copy of gamestate that can be changed without touching it. With full
+    false the index of free cells and the random generator are left out: the
+    copy builds its own index if it ever needs to place a pip, and draws pips
+    from the random module, so it can't tell where the game's will land."""
+    if not full:
+        return {k: gamestate[k][:] for k in gamestate
+                if k not in ENGINE_KEYS or k in SHARED_KEYS}
+    copy = {k: gamestate[k][:] for k in gamestate}
+    if 'free' in copy:
+        copy['free'][0] = copy['free'][0].copy()
+    if 'rng' in copy:
+        rng = random.Random()
+        rng.setstate(copy['rng'][0].getstate())
+        copy['rng'][0] = rng
+    return copy
+
+def game_rng(gamestate):
+    """what gamestate draws pips from: its own generator or random"""
+    if 'rng' in gamestate:
+        return gamestate['rng'][0]
+    return random
+
+def free_cells(gamestate):
+    """The FreeCells of gamestate, built from the snake bodies if it has none
+    yet"""
+    if 'free' not in gamestate:
+        gamestate['free'] = [FreeCells(gamestate['dims'][0],
+                                       gamestate[(1, 'body')]
+                                       + gamestate[(2, 'body')])]
+    return gamestate['free'][0]
+
+def distance_fields(gamestate):
+    """The grid.DistanceFields of the position of gamestate, with the snake
+    bodies as walls, made if it has none yet"""
+    if 'fields' not in gamestate:
+        gamestate['fields'] = [DistanceFields(gamestate['dims'][0],
+                                              gamestate[(1, 'body')]
+                                              + gamestate[(2, 'body')])]
+    return gamestate['fields'][0]
+
+def reset(seed=None):
+    """Get a new gamestate with starting config, drawing pips from a generator
+    seeded with seed (a random one if None)."""
+    return GameStep.reset(seed)
+
+def step(gamestate, s1dir, s2dir):
+    """Advance gamestate by one tick in place. Returns the winning snake id or
+    None if nobody won."""
+    return GameStep.update(gamestate, s1dir, s2dir)
+
+def ai_move(ai, gamestate, sid, per=None):
+    """Asks ai for the next direction of snake sid, handing it a copy of
+    gamestate without the engine's own entries, except for the distance
+    fields of the tick (see distance_fields), which it shares. AIs with a
+    true anytime attribute are also given a deadline, ai_time_share of the
+    per ms tick from now, if per is given.
+    """
+    distance_fields(gamestate)
+    gamestate = copy_gamestate(gamestate, full=False)
+    if per is not None and getattr(ai, 'anytime', False):
+        deadline = default_timer() + per*ai_time_share/1000.0
+        return ai.update(gamestate, sid, deadline=deadline)
+    return ai.update(gamestate, sid)
+
+# Full state of the game should be represented in a single dict
+class GameStep():
+    """
+    Compute one step of the game (or reset to step 1).
+    """
+
+    @staticmethod
+    def reset(seed=None):
+        """
+        Get a new gamestate with starting config. Pips are drawn from a
+        random.Random seeded with seed, which is made up if None. Replays
+        store the seed in 64 bits, so it has to be an int from 0 to
+        2**64 - 1.
+        """
+        if seed is None:
+            seed = random.getrandbits(63)
+        elif not 0 <= seed < 2**64:
+            raise ValueError('seed must be from 0 to 2**64 - 1, got %d'
+                             % seed)
+        gamestate = {
+            'dims': [(blocksx, blocksy)],
+            'pip': [('replaced in Pip.recet')],
+            'last_pip': [(1,)],
+            'seed': [(seed,)],
+            'rng': [random.Random(seed)]
+        }
+        Snake.reset(gamestate, 1)
+        Snake.reset(gamestate, 2)
+        free_cells(gamestate)
+        Pip.reset(gamestate)
+        return gamestate
+
+    @staticmethod
+    def update(gamestate, s1dir, s2dir):
+        gamestate.pop('fields', None)
+        Snake.set_direction(gamestate, 1, s1dir)
+        Snake.set_direction(gamestate, 2, s2dir)
+        Snake.move(gamestate, 1)
+        Snake.move(gamestate, 2)
+        return GameStep.check_collisions(gamestate)
+
+    @staticmethod
+    def make_move(gamestate, s1dir, s2dir):
+        """Same as update, but also returns what unmake_move needs to put
+        gamestate back exactly as it was: (win, undo). This includes blocks
+        cut off the tails, the changes to the free cells and the state of
+        the random generator if the pip was relocated, so unmaking a move
+        does not change later pip draws either.
+        """
+        undo_dirs = (gamestate[(1, 'direction')],
+                     gamestate[(1, 'next_direction')],
+                     gamestate[(2, 'direction')],
+                     gamestate[(2, 'next_direction')])
+        pip = gamestate['pip'][0]
+        last_pip = gamestate['last_pip']
+        popped1 = []
+        popped2 = []
+        journal = []
+        free_cells(gamestate)
+        gamestate.pop('fields', None)
+        Snake.set_direction(gamestate, 1, s1dir)
+        Snake.set_direction(gamestate, 2, s2dir)
+        Snake.move(gamestate, 1, popped1, journal)
+        Snake.move(gamestate, 2, popped2, journal)
+        rng_state = None
+        if pip is None or pip in (gamestate[(1, 'body')][0],
+                                  gamestate[(2, 'body')][0]):
+            rng_state = game_rng(gamestate).getstate()
+        win = GameStep.check_collisions(gamestate)
+        return win, (undo_dirs, popped1, popped2, journal, pip, last_pip,
+                     rng_state)
+
+    @staticmethod
+    def unmake_move(gamestate, undo):
+        """Reverts the make_move that returned undo. Moves have to be unmade
+        in the reverse order they were made in.
+        """
+        (undo_dirs, popped1, popped2, journal, pip, last_pip,
+         rng_state) = undo
+        gamestate.pop('fields', None)
+        (gamestate[(1, 'direction')],
+         gamestate[(1, 'next_direction')],
+         gamestate[(2, 'direction')],
+         gamestate[(2, 'next_direction')]) = undo_dirs
+        for sid, popped in ((1, popped1), (2, popped2)):
+            body = gamestate[(sid, 'body')]
+            del body[0]
+            body.extend(reversed(popped))
+        gamestate['free'][0].undo(journal)
+        gamestate['pip'][0] = pip
+        gamestate['last_pip'] = last_pip
+        if rng_state is not None:
+            game_rng(gamestate).setstate(rng_state)
+
+    @staticmethod
+    def check_collisions(gamestate):
+        """check updated snake body queues for collision with pip or enemy
+        snake. If pip is found, this method relocates it. If collision, return
+        the winning snake. Otherwise, return None. Last snake to get the pip
+        gets priority in head to head collisions and simultaneous head-tail
+        collisions. If the board was too full for the pip last time, it is
+        placed again as soon as there is room.
+        """
+        pip = gamestate['pip'][0]
+        last_pip = gamestate['last_pip'][0][0]
+        s1_body = gamestate[(1, 'body')]
+        s2_body = gamestate[(2, 'body')]
+        if last_pip == 1:
+            if Snake.is_present(gamestate, 1, s2_body[0]):
+                return 1
+            if Snake.is_present(gamestate, 2, s1_body[0]):
+                return 2
+        else:
+            if Snake.is_present(gamestate, 2, s1_body[0]):
+                return 2
+            if Snake.is_present(gamestate, 1, s2_body[0]):
+                return 1
+
+        if s1_body[0] == pip:
+                Pip.relocate(gamestate)
+                gamestate['last_pip'] = [(1,)]
+        if s2_body[0] == pip:
+                Pip.relocate(gamestate)
+                gamestate['last_pip'] = [(2,)]
+        if pip is None:
+                Pip.relocate(gamestate)
+
+class Pip():
+    """Implements the pip"""
+
+    @staticmethod
+    def reset(gamestate):
+        """initializes position"""
+        Pip.relocate(gamestate)
+
+    @staticmethod
+    def location(gamestate):
+        return gamestate['pip'][0]
+
+    @staticmethod
+    def relocate(gamestate):
+        """Randomly places a pip at a location not occupied by either snake.
+        If the snakes cover the whole board, the pip is set to None.
+        """
+        gamestate['pip'][0] = free_cells(gamestate).sample(
+            game_rng(gamestate).randrange)
+
+class Snake():
+    """Implements the snake as a list of (x, y) blocks, head first"""
+
+    @staticmethod
+    def reset(gamestate, sid, init_len=10):
+        if sid == 1:
+            init_dir = 'right'
+            init_loc = (10, 10)
+        if sid == 2:
+            init_dir = 'left'
+            init_loc = (20, 20)
+
+        if init_dir == 'left':
+            body =      [(init_loc[0] + x, init_loc[1])
+                        for x in range(init_len)]
+        if init_dir == 'right':
+            body = [(init_loc[0] - x, init_loc[1])
+                        for x in range(init_len)]
+        if init_dir == 'up':
+            body = [(init_loc[0], init_loc[1] + x)
+                        for x in range(init_len)]
+        if init_dir == 'down':
+            body =      [(init_loc[0], init_loc[1] - x)
+                        for x in range(init_len)]
+
+        gamestate[(sid, 'direction')] = [(init_dir,)]
+        gamestate[(sid, 'next_direction')] = [(init_dir,)]
+        gamestate[(sid, 'body')] = body
+
+    @staticmethod
+    def is_present(gamestate, sid, loc):
+        """checks if location loc is on top of the snake"""
+        body = gamestate[(sid, 'body')]
+        if loc in body:
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def set_direction(gamestate, sid, direc):
+        code = DIR_CODES.get(direc)
+        if code is None:
+            return
+        if OPPOSITE[code] == DIR_CODES[Snake.get_direction(gamestate, sid)]:
+            return
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+
+    @staticmethod
+    def get_direction(gamestate, sid):
+        return gamestate[(sid, 'direction')][0][0]
+
+    @staticmethod
+    def move(gamestate, sid, popped=None, journal=None):
+        """Moves the head in the appropriate direction. Now only checks if
+        encountered pip and extends. Does not move pip or check for collisions.
+        If a list is passed as popped, the blocks removed from the tail are
+        appended to it, last block first, and journal is passed on to the
+        free cells (see FreeCells.occupy).
+        """
+        gamestate[(sid, 'direction')] = gamestate[(sid, 'next_direction')]
+        direc = gamestate[(sid, 'direction')][0][0]
+        body = gamestate[(sid, 'body')]
+        pip = gamestate['pip'][0]
+        grid = grid_of(gamestate['dims'][0])
+        nhead = grid.neighbor_locs[grid.cell(body[0])][DIR_CODES[direc]]
+
+        free = gamestate['free'][0] if 'free' in gamestate else None
+        #check if overlapping self, free cells can't be
+        if (free is None or not free.is_free(nhead)) and nhead in body:
+            #truncate tail
+            val = body.pop()
+            if popped is not None:
+                popped.append(val)
+            if free is not None:
+                free.release(val, journal)
+            while val != nhead:
+                val = body.pop()
+                if popped is not None:
+                    popped.append(val)
+                if free is not None:
+                    free.release(val, journal)
+
+        body.insert(0, nhead)
+        if free is not None:
+            free.occupy(nhead, journal)
+        if nhead == pip:
+            return
+        val = body.pop()
+        if popped is not None:
+            popped.append(val)
+        if free is not None:
+            free.release(val, journal)
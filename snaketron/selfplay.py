@@ -0,0 +1,152 @@
+"""Training data from snaketron games of an AI against itself, written to
+shards (see shards).
+
+    python -m snaketron.selfplay out --games 1000 [--workers n]
+        [--ai snaketron.AIs.ai2:SnakeTronAI2,lookahead=2] [--epsilon 0.05]
+
+Worker processes play the games headless on env.SnakeTronEnv, each writing
+its own shards, out/selfplay-<worker>-<n>.npy. Every position a game goes
+through is one record of record_dtype:
+
+    planes      env planes as snake 1 sees them, packed 8 cells a byte
+    moves       direction codes the two AIs chose there
+    played      the codes played, which differ where a random move was
+    outcome     winner of the game, 0 if it was still going at max_ticks
+    tick, seed  where in which game the position is
+
+A game's records are held until it ends, since that is when its outcome is
+known, and then appended to the shard. With epsilon, each snake plays a
+random move that often instead of its AI's, so that games from similar
+seeds go different ways. Positions are read back with shards.ShardReader:
+
+    for records in ShardReader('out'):
+        planes = decode_planes(records)     # (n, len(PLANES), 31, 31)
+        value = np.choose(records['outcome'], [0, 1, -1])   # snake 1's
+"""
+import argparse
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer
+import numpy as np
+from env import PLANES, SnakeTronEnv
+from grid import DIR_CODES
+from shards import ShardWriter
+from snaketron import engine
+import tournament
+
+AI = 'snaketron.AIs.ai2:SnakeTronAI2,lookahead=2'
+
+def record_dtype(dims=(engine.blocksx, engine.blocksy)):
+    packed = (len(PLANES)*dims[0]*dims[1] + 7)//8
+    return np.dtype([('planes', np.uint8, (packed,)),
+                     ('moves', np.int8, (2,)),
+                     ('played', np.int8, (2,)),
+                     ('outcome', np.int8),
+                     ('tick', np.int32),
+                     ('seed', np.int64)])
+
+def decode_planes(records, dims=(engine.blocksx, engine.blocksy)):
+    """(n, len(PLANES), height, width) uint8 planes of records"""
+    bx, by = dims
+    planes = np.unpackbits(records['planes'], axis=1,
+                           count=len(PLANES)*bx*by)
+    return planes.reshape(len(records), len(PLANES), by, bx)
+
+def play_games(seeds, spec, directory, prefix, max_ticks, epsilon,
+               shard_records, chunk):
+    """Runs in a worker process: plays a game from each of seeds between two
+    AIs built from spec and writes their positions to shards. Returns
+    (positions, {outcome: games}, seconds)."""
+    start = default_timer()
+    env = SnakeTronEnv(max_ticks=max_ticks)
+    writer = ShardWriter(directory, prefix, record_dtype(), shard_records,
+                         chunk)
+    outcomes = {0: 0, 1: 0, 2: 0}
+    ais = [None, tournament.make_ai(spec), tournament.make_ai(spec)]
+    try:
+        for seed in seeds:
+            random.seed(seed)
+            rng = random.Random(seed)
+            obs, info = env.reset(seed)
+            planes = []
+            moves = []
+            played = []
+            while True:
+                planes.append(np.packbits(obs[0]))
+                chosen = [DIR_CODES[engine.ai_move(ais[sid], env.gamestate,
+                                                   sid)] for sid in (1, 2)]
+                actions = [rng.randrange(4)
+                           if epsilon and rng.random() < epsilon else code
+                           for code in chosen]
+                moves.append(chosen)
+                played.append(actions)
+                obs, rewards, terminated, truncated, info = env.step(actions)
+                if terminated or truncated:
+                    break
+            outcome = info['winner'] or 0
+            outcomes[outcome] += 1
+            records = np.zeros(len(planes), dtype=writer.dtype)
+            records['planes'] = planes
+            records['moves'] = moves
+            records['played'] = played
+            records['outcome'] = outcome
+            records['tick'] = np.arange(len(planes))
+            records['seed'] = seed
+            writer.append(records)
+    finally:
+        writer.close()
+        for ai in ais[1:]:
+            tournament.close_ai(ai)
+    return writer.records, outcomes, default_timer() - start
+
+def run(directory, games, workers=1, seed=0, spec=AI, max_ticks=2000,
+        epsilon=0.05, shard_records=65536, chunk=1024):
+    """Plays games games in workers processes, writing their positions to
+    shards in directory. Returns (positions, {outcome: games}, seconds)."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(63) for g in range(games)]
+    start = default_timer()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    futures = [pool.submit(play_games, seeds[w::workers], spec, directory,
+                           'selfplay-%03d' % w, max_ticks, epsilon,
+                           shard_records, chunk)
+               for w in range(workers)]
+    positions = 0
+    outcomes = {0: 0, 1: 0, 2: 0}
+    for f in futures:
+        n, counts, took = f.result()
+        positions += n
+        for outcome in counts:
+            outcomes[outcome] += counts[outcome]
+    pool.shutdown()
+    return positions, outcomes, default_timer() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ai', default=AI, metavar='module:Class[,k=v...]',
+                        help='AI playing both snakes (default %s)' % AI)
+    parser.add_argument('--max-ticks', type=int, default=2000,
+                        help='games still running after this are draws')
+    parser.add_argument('--epsilon', type=float, default=0.05,
+                        help='share of random moves')
+    parser.add_argument('--shard-records', type=int, default=65536)
+    parser.add_argument('--chunk', type=int, default=1024,
+                        help='records written to a shard at a time')
+    args = parser.parse_args(argv)
+    positions, outcomes, took = run(args.directory, args.games,
+                                    args.workers, args.seed, args.ai,
+                                    args.max_ticks, args.epsilon,
+                                    args.shard_records, args.chunk)
+    print('%d games, %d positions in %.1f s (%.0f positions/s): snake 1 '
+          'won %d, snake 2 won %d, %d drawn'
+          % (args.games, positions, took, positions/took, outcomes[1],
+             outcomes[2], outcomes[0]))
+
+if __name__ == '__main__':
+    main()
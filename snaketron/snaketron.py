@@ -10,18 +10,21 @@ Also known as snaketron.
 import os
 import sys
 import pygame
-from collections import deque
 from pygame.locals import *
-from random import randint
+from snaketron.engine import (blocksx, blocksy, copy_gamestate, ai_move,
+                              GameStep, Pip, Snake)
+from snaketron.aiworker import AIWorker, async_time_share
+from snaketron.replay import Recorder
+from ticklog import TickLog, NO_LOG, numbered
+from dirtyrects import DirtyRects, BodyTrack
 pygame.init()
 
 LOSE = -1
 GOTPIP = 1
 block_size = 20
-blocksx = 31
-blocksy = 31
 screen_size = (blocksx*block_size, blocksy*block_size)
 backround = (0, 0, 0, 1)
+pip_color = pygame.Color(0, 0, 255, 1)
 
 def paint_block(screen, loc, color):
     """paints block at location (loc, 2tuple) a color (color, pygame.Color)"""
@@ -30,41 +33,65 @@ def paint_block(screen, loc, color):
     block = pygame.Rect((x0, y0), (block_size, block_size))
     pygame.draw.rect(screen, color, block)
 
-def copy_gamestate(gamestate):
-    return {k: gamestate[k][:] for k in gamestate}
-
 class SnakeTron():
     """Wrapper class for snaketron game. Contains the screen, the snakes and
     pip, screen display, and the interface for human players. When created, the
     SnakeTron object may be passed 0, 1, or 2 AI player objects. After every
     frame update, the AI objects update method will be called as follows:
 
-    update(field_dims, Snake own_snake, Snake enemy_snake, Pip pip, last_pip)
+    update(gamestate, snake_id)
 
     which must return one of four values: 'left', 'right', 'up', 'down'. Any
     other input will be ignored. The heading of the snake at the next frame
-    update will be set accordingly. AIs should not modify any of the objects
-    because that would be cheating.
+    update will be set accordingly. gamestate is a copy, so AIs are free to
+    modify it. AIs with a true anytime attribute are called as
+
+    update(gamestate, snake_id, deadline=deadline)
+
+    where deadline is the timeit.default_timer() time by which they should
+    have answered.
+
+    Every game is recorded as it is played (see snaketron.replay); recorder
+    holds the recording.
     """
 
-    def __init__(self, p1='human', p2='human'):
-        """Initializes 2 Snakes, 1 pip, and the field and screen.
+    def __init__(self, p1='human', p2='human', seed=None):
+        """Initializes 2 Snakes, 1 pip, and the field and screen. Pips are
+        drawn from a generator seeded with seed, a random one if None.
         """
         self.p1 = p1
         self.p2 = p2
         self.display = True
         self.screen = pygame.display.set_mode(screen_size)
-        self.gamestate = GameStep.reset()
+        self.gamestate = GameStep.reset(seed)
+        self.recorder = Recorder(self.gamestate)
         self.s1_dir = 'right'
         self.s2_dir = 'left'
+        self.dirty = DirtyRects(self.screen, block_size, backround)
+        self.tracks = {1: BodyTrack(), 2: BodyTrack()}
+        self.pip_shown = None
+        #ticks each AI missed when playing asynchronously
+        self.ai_misses = {1: [], 2: []}
         pygame.display.set_caption("SnakeTron")
 
-    def play(self, per=100):
+    def play(self, per=100, ticklog=None, async_ai=None):
         """Basically the main method that runs the game. per is time between
-        moves in ms. return 1 if snake 1 won, 2 if snake 2 won.
+        moves in ms. return 1 if snake 1 won, 2 if snake 2 won. If a TickLog
+        is given, the time every tick spends rendering, in the engine,
+        flipping the display and in each AI is recorded in it.
+
+        With async_ai 'process' or 'thread', AIs think in a worker of that
+        kind (see snaketron.aiworker) while the game goes on, and have until
+        the next tick to answer. A snake whose AI misses a tick keeps its
+        direction, and the tick is added to ai_misses.
         """
-        pygame.time.set_timer(pygame.USEREVENT, 100)
+        log = ticklog or NO_LOG
+        if ticklog is not None:
+            ticklog.per = per
+        pygame.time.set_timer(pygame.USEREVENT, per)
         pygame.display.update()
+        if async_ai:
+            return self.play_async(per, log, async_ai == 'process')
         while True:
             # events = pygame.event.get()
             event = pygame.event.poll()
@@ -72,18 +99,109 @@ class SnakeTron():
             if event.type == pygame.QUIT: sys.exit()
             if event.type == pygame.KEYDOWN: self.human_input(event.key)
             if event.type == pygame.USEREVENT:
-                self.screen.fill(backround)
-                Snake.paint(self.gamestate, 1, self.screen)
-                Snake.paint(self.gamestate, 2, self.screen)
-                Pip.paint(self.gamestate, self.screen)
+                log.start()
+                rects = self.render()
+                log.lap('render')
                 win = GameStep.update(self.gamestate, self.s1_dir, self.s2_dir)
-                pygame.display.update()
+                self.recorder.record(self.gamestate, win)
+                log.lap('engine')
+                pygame.display.update(rects)
+                log.lap('flip')
                 if win != None:
+                    log.end()
                     return win
                 if self.p1 != 'human':
-                    self.s1_dir = self.p1.update(copy_gamestate(self.gamestate), 1)
+                    self.s1_dir = ai_move(self.p1, self.gamestate, 1, per)
+                    log.lap('ai1')
                 if self.p2 != 'human':
-                    self.s2_dir = self.p2.update(copy_gamestate(self.gamestate), 2)
+                    self.s2_dir = ai_move(self.p2, self.gamestate, 2, per)
+                    log.lap('ai2')
+                log.end()
+
+    def play_async(self, per, log, processes):
+        """The loop of play with AIs in AIWorkers"""
+        workers = {}
+        for sid, p in ((1, self.p1), (2, self.p2)):
+            if p != 'human':
+                workers[sid] = AIWorker(p, processes)
+                self.ai_misses[sid] = workers[sid].misses
+        tick = 0
+        try:
+            while True:
+                event = pygame.event.poll()
+                if event.type == pygame.QUIT: sys.exit()
+                if event.type == pygame.KEYDOWN: self.human_input(event.key)
+                if event.type != pygame.USEREVENT:
+                    continue
+                log.start()
+                for sid, worker in workers.items():
+                    if worker.asked is None:
+                        continue
+                    direc = worker.answer()
+                    if direc is None:
+                        direc = Snake.get_direction(self.gamestate, sid)
+                    if sid == 1:
+                        self.s1_dir = direc
+                    else:
+                        self.s2_dir = direc
+                log.lap('answers')
+                rects = self.render()
+                log.lap('render')
+                win = GameStep.update(self.gamestate, self.s1_dir, self.s2_dir)
+                self.recorder.record(self.gamestate, win)
+                log.lap('engine')
+                pygame.display.update(rects)
+                log.lap('flip')
+                if win != None:
+                    log.end()
+                    return win
+                for sid, worker in workers.items():
+                    worker.ask(tick, self.gamestate, sid,
+                               per*async_time_share/1000.0)
+                    log.lap('ai%d' % sid)
+                log.end()
+                tick += 1
+        finally:
+            for worker in workers.values():
+                worker.close()
+
+    def render(self):
+        """Draws the current gamestate. The simulation itself lives in
+        snaketron.engine, this is the only place the game touches the screen.
+        Only the blocks that changed since the last render are repainted,
+        unless this is the first one or a tail got cut. Returns the rects of
+        the screen that changed.
+        """
+        gamestate = self.gamestate
+        moved = [self.tracks[sid].update(gamestate[(sid, 'body')])
+                 for sid in (1, 2)]
+        pip = gamestate['pip'][0]
+        if None in moved:
+            return self.render_all()
+        dirty = self.dirty
+        for old_head, freed in moved:
+            for loc in freed:
+                dirty.clear(loc)
+        if self.pip_shown is not None and self.pip_shown != pip:
+            dirty.clear(self.pip_shown)
+        for sid, (old_head, freed) in zip((1, 2), moved):
+            head_color, body_color = snake_colors(gamestate, sid)
+            dirty.paint(old_head, body_color)
+            dirty.paint(gamestate[(sid, 'body')][0], head_color)
+        if pip is not None:
+            dirty.paint(pip, pip_color)
+        self.pip_shown = pip
+        return dirty.flush()
+
+    def render_all(self):
+        """Draws the whole gamestate. Returns the screen's rect."""
+        self.screen.fill(backround)
+        paint_snake(self.gamestate, 1, self.screen)
+        paint_snake(self.gamestate, 2, self.screen)
+        paint_pip(self.gamestate, self.screen)
+        self.pip_shown = self.gamestate['pip'][0]
+        self.dirty.flush()
+        return [self.screen.get_rect()]
 
     def human_input(self, key):
         """Takes a pressed key and updates snake direction"""
@@ -106,205 +224,41 @@ class SnakeTron():
             elif key == K_DOWN:
                 self.s2_dir = 'down'
 
-# Full state of the game should be represented in a single dict
-class GameStep():
-    """
-    Compute one step of the game (or reset to step 1).
-    """
-
-    @staticmethod
-    def reset():
-        """
-        Get a new gamestate with starting config.
-        """
-        gamestate = {
-            'dims': [(blocksx, blocksy)],
-            'pip': [('replaced in Pip.recet')],
-            'last_pip': [(1,)]
-
-        }
-        Snake.reset(gamestate, 1)
-        Snake.reset(gamestate, 2)
-        Pip.reset(gamestate)
-        return gamestate
-
-    @staticmethod
-    def update(gamestate, s1dir, s2dir):
-        Snake.set_direction(gamestate, 1, s1dir)
-        Snake.set_direction(gamestate, 2, s2dir)
-        Snake.move(gamestate, 1)
-        Snake.move(gamestate, 2)
-        return GameStep.check_collisions(gamestate)
-
-    @staticmethod
-    def check_collisions(gamestate):
-        """check updated snake body queues for collision with pip or enemy
-        snake. If pip is found, this method relocates it. If collision, return
-        the winning snake. Otherwise, return None. Last snake to get the pip
-        gets priority in head to head collisions and simultaneous head-tail
-        collisions.
-        """
-        pip = gamestate['pip'][0]
-        last_pip = gamestate['last_pip'][0][0]
-        s1_body = gamestate[(1, 'body')]
-        s2_body = gamestate[(2, 'body')]
-        if last_pip == 1:
-            if Snake.is_present(gamestate, 1, s2_body[0]):
-                return 1
-            if Snake.is_present(gamestate, 2, s1_body[0]):
-                return 2
-        else:
-            if Snake.is_present(gamestate, 2, s1_body[0]):
-                return 2
-            if Snake.is_present(gamestate, 1, s2_body[0]):
-                return 1
-
-        if s1_body[0] == pip:
-                Pip.relocate(gamestate)
-                gamestate['last_pip'] = [(1,)]
-        if s2_body[0] == pip:
-                Pip.relocate(gamestate)
-                gamestate['last_pip'] = [(2,)]
-
-class Pip():
-    """Implements the pip"""
-
-    @staticmethod
-    def reset(gamestate):
-        """initializes color and position"""
-        Pip.relocate(gamestate)
+def paint_pip(gamestate, screen):
+    """paints pip on the screen, if there is room for one"""
+    if gamestate['pip'][0] is None:
+        return
+    paint_block(screen, gamestate['pip'][0], pip_color)
 
-    @staticmethod
-    def location(gamestate):
-        return gamestate['pip'][0]
+def paint_snake(gamestate, sid, screen, bgr=pygame.Color(0, 0, 0, 1)):
+    """Paint snake sid on the backround.
 
-    @staticmethod
-    def paint(gamestate, screen):
-        """paints pip on the screen"""
-        c = pygame.Color(0, 0, 255, 1)
-        paint_block(screen, gamestate['pip'][0], c)
-
-    @staticmethod
-    def relocate(gamestate):
-        """Randomly places a pip at a location not occupied by either snake
-        """
-        loc = (randint(0, blocksx-1), randint(0, blocksy-1))
-        while Snake.is_present(gamestate, 1, loc) or Snake.is_present(gamestate, 2, loc):
-            loc = (randint(0, blocksx-1), randint(0, blocksy-1))
-        gamestate['pip'][0] = loc
-
-class Snake():
-    """Implements the snake by drawing rectangles on canvas"""
-
-    @staticmethod
-    def reset(gamestate, sid, init_len=10):
-        if sid == 1:
-            init_dir = 'right'
-            init_loc = (10, 10)
-        if sid == 2:
-            init_dir = 'left'
-            init_loc = (20, 20)
-
-        if init_dir == 'left':
-            body =      [(init_loc[0] + x, init_loc[1])
-                        for x in range(init_len)]
-        if init_dir == 'right':
-            body = [(init_loc[0] - x, init_loc[1])
-                        for x in range(init_len)]
-        if init_dir == 'up':
-            body = [(init_loc[0], init_loc[1] + x)
-                        for x in range(init_len)]
-        if init_dir == 'down':
-            body =      [(init_loc[0], init_loc[1] - x)
-                        for x in range(init_len)]
-
-        gamestate[(sid, 'direction')] = init_dir
-        gamestate[(sid, 'next_direction')] = init_dir
-        gamestate[(sid, 'body')] = body
-
-
-
-    @staticmethod
-    def paint(gamestate, sid, screen, bgr=pygame.Color(0, 0, 0, 1)):
-        """Paint the snake object on the backround.
-
-        Inputs:
-        screen - pygame display object
-        bgr - background color, default black
-        """
-        body = gamestate[(sid, 'body')]
-        if gamestate['last_pip'][0][0] == sid:
-            head_color = pygame.Color(255, 255, 0)
-        else:
-            head_color = pygame.Color(255, 255, 255)
-        if sid == 1:
-            body_color=pygame.Color(255, 0, 0, 1)
-        if sid == 2:
-            body_color=pygame.Color(0, 255, 0, 1)
-
-        for i, block in enumerate(body):
-            if i == 0:
-                paint_block(screen, block, head_color)
-            else:
-                paint_block(screen, block, body_color)
+    Inputs:
+    screen - pygame display object
+    bgr - background color, default black
+    """
+    body = gamestate[(sid, 'body')]
+    head_color, body_color = snake_colors(gamestate, sid)
 
-    @staticmethod
-    def is_present(gamestate, sid, loc):
-        """checks if location loc is on top of the snake"""
-        body = gamestate[(sid, 'body')]
-        if loc in body:
-            return True
+    for i, block in enumerate(body):
+        if i == 0:
+            paint_block(screen, block, head_color)
         else:
-            return False
-
-    @staticmethod
-    def set_direction(gamestate, sid, direc):
-        if not direc in ['left', 'right', 'up', 'down']:
-            return
-        curr_direc = gamestate[(sid, 'direction')]
-        if (curr_direc == 'left' and direc == 'right'
-        or  curr_direc == 'right' and direc == 'left'
-        or  curr_direc == 'up' and direc == 'down'
-        or  curr_direc == 'down' and direc == 'up'):
-            return
-        gamestate[(sid, 'next_direction')] = [(direc,)]
+            paint_block(screen, block, body_color)
 
-    @staticmethod
-    def get_direction(gamestate, sid):
-        return gamestate[(sid, 'direction')][0][0]
-
-    @staticmethod
-    def move(gamestate, sid):
-        """Moves the head in the appropriate direction. Now only checks if
-        encountered pip and extends. Does not move pip or check for collisions.
-        """
-        gamestate[(sid, 'direction')] = gamestate[(sid, 'next_direction')]
-        direc = gamestate[(sid, 'direction')][0][0]
-        body = gamestate[(sid, 'body')]
-        pip = gamestate['pip'][0]
-        if direc == 'left':
-            nhead = (body[0][0] - 1, body[0][1])
-        if direc == 'right':
-            nhead = (body[0][0] + 1, body[0][1])
-        if direc == 'up':
-            nhead = (body[0][0], body[0][1] - 1)
-        if direc == 'down':
-            nhead = (body[0][0], body[0][1] + 1)
-
-        nhead = ((nhead[0] + blocksx)%blocksx, (nhead[1] + blocksy)%blocksy)
-
-        #check if overlapping self
-        if nhead in body:
-            #truncate tail
-            val = body.pop()
-            while val != nhead:
-                val = body.pop()
-
-        body.insert(0, nhead)
-        if nhead == pip:
-            return
-        body.pop()
 
+def snake_colors(gamestate, sid):
+    """(head color, body color) of snake sid. The head of the snake that had
+    the last pip is yellow."""
+    if gamestate['last_pip'][0][0] == sid:
+        head_color = pygame.Color(255, 255, 0)
+    else:
+        head_color = pygame.Color(255, 255, 255)
+    if sid == 1:
+        body_color=pygame.Color(255, 0, 0, 1)
+    if sid == 2:
+        body_color=pygame.Color(0, 255, 0, 1)
+    return head_color, body_color
 
 red_win_count = 0
 green_win_count = 0
@@ -330,10 +284,32 @@ def win_message(screen, winner):
     screen.blit(text2, textpos2)
     pygame.display.update()
 
-def play_ai(ai1, ai2='human'):
+def play_game(game, metrics=None, n=0, async_ai=None, replays=None):
+    """Plays game, timing its ticks if metrics is a path to save them to
+    (CSV, or JSON if it ends in .json), and saving its replay if replays is a
+    path. Returns the winner."""
+    if metrics is None:
+        winner = game.play(async_ai=async_ai)
+    else:
+        log = TickLog()
+        winner = game.play(ticklog=log, async_ai=async_ai)
+        log.report()
+        if async_ai:
+            print('missed ticks: %d by snake 1, %d by snake 2'
+                  % (len(game.ai_misses[1]), len(game.ai_misses[2])))
+        log.save(numbered(metrics, n))
+    if replays is not None:
+        game.recorder.save(numbered(replays, n))
+    return winner
+
+def play_ai(ai1, ai2='human', metrics=None, async_ai=None, replays=None):
+    """Plays ai1 against ai2 (a human by default) until the window is closed.
+    See SnakeTron.play for async_ai."""
+    n = 0
     while True:
         game = SnakeTron(ai1, ai2)
-        winner = game.play()
+        winner = play_game(game, metrics, n, async_ai, replays)
+        n += 1
         win_message(game.screen, winner)
         while True:
             event = pygame.event.poll()
@@ -341,10 +317,12 @@ def play_ai(ai1, ai2='human'):
                 break
             if event.type == pygame.QUIT: sys.exit()
 
-def play():
+def play(metrics=None, replays=None):
+    n = 0
     while True:
         game = SnakeTron()
-        winner = game.play()
+        winner = play_game(game, metrics, n, replays=replays)
+        n += 1
         win_message(game.screen, winner)
         while True:
             event = pygame.event.poll()
@@ -0,0 +1,160 @@
+"""Voronoi territory of snaketron positions, many at once with numpy.
+
+A cell belongs to the snake whose head reaches it first, going around both
+bodies; cells both heads reach on the same step belong to neither and stop
+both searches. counts runs the two breadth-first searches side by side for
+a whole batch of positions, one board row per uint64 word, so every step
+of the search is a few shifts, ands and ors over (rows, 2, positions)
+arrays. Boards can be at most 64 cells wide.
+
+    walls = games.occ.any(axis=1)         # (n, cells) of a batch.BatchGame
+    heads = head_cells(games)             # (n, 2)
+    cells = counts(walls, heads, games.dims)
+
+TerritoryEvaluator scores bitboard.BitState leaves of a search by the
+territory of one snake less the other's; SnakeTronAI2 takes it as its
+evaluator (see there). crosscheck compares counts against a plain
+breadth-first search.
+"""
+import numpy as np
+from grid import grid_of
+from snaketron import bitboard
+
+# widest board a row fits in one word of
+MAX_WIDTH = 64
+
+def _row_mask(width):
+    return np.uint64((1 << width) - 1)
+
+def _check_dims(dims):
+    if dims[0] > MAX_WIDTH:
+        raise ValueError('boards wider than %d cells are not supported: %r'
+                         % (MAX_WIDTH, dims))
+
+def pack_rows(cells, dims):
+    """(n, cells) bool array as (n, height) uint64 rows, bit x of row y for
+    cell x + y*width"""
+    _check_dims(dims)
+    bx, by = dims
+    n = len(cells)
+    padded = np.zeros((n, by, MAX_WIDTH), dtype=bool)
+    padded[:, :, :bx] = np.asarray(cells, dtype=bool).reshape(n, by, bx)
+    packed = np.packbits(padded, axis=2, bitorder='little')
+    return packed.view('<u8').reshape(n, by).astype(np.uint64)
+
+def head_cells(games):
+    """(n, 2) head cells of the snakes of a batch.BatchGame"""
+    rows = np.arange(games.n)[:, None]
+    return games.ring[rows, np.array([[0, 1]]), games.head]
+
+def counts(walls, heads, dims):
+    """(n, 2) number of cells each snake's head reaches first in each of n
+    positions. walls is (n, cells) bool with both bodies set, heads (n, 2)
+    the head cells of snakes 1 and 2."""
+    return count_rows(pack_rows(walls, dims), np.asarray(heads), dims)
+
+def count_rows(walls, heads, dims):
+    """counts, with walls already packed by pack_rows"""
+    _check_dims(dims)
+    bx, by = dims
+    n = len(walls)
+    full = _row_mask(bx)
+    one = np.uint64(1)
+    wrap = np.uint64(bx - 1)
+    heads = np.asarray(heads).T
+    # frontier and territory of each snake, (rows, 2, n): rows first, so
+    # that moving up and down is or-ing whole blocks of the array
+    frontier = np.zeros((by, 2, n), dtype=np.uint64)
+    frontier[heads // bx, np.array([[0], [1]]), np.arange(n)] = (
+        one << (heads % bx).astype(np.uint64))
+    owned = np.zeros_like(frontier)
+    claimed = np.ascontiguousarray((walls | ~full).T)[:, None, :]
+    while True:
+        step = ((frontier >> one) | ((frontier & one) << wrap)
+                | ((frontier << one) & full) | (frontier >> wrap))
+        step[:-1] |= frontier[1:]
+        step[-1] |= frontier[0]
+        step[1:] |= frontier[:-1]
+        step[0] |= frontier[-1]
+        step &= ~claimed
+        if not step.any():
+            break
+        both = step[:, :1] & step[:, 1:]
+        claimed |= step[:, :1] | step[:, 1:]
+        step &= ~both
+        owned |= step
+        frontier = step
+    return np.bitwise_count(owned).sum(axis=0, dtype=np.int64).T
+
+def state_rows(states):
+    """(walls, heads) of bitboard.BitStates for count_rows"""
+    dims = states[0].dims
+    cells = dims[0]*dims[1]
+    nbytes = (cells + 7)//8
+    data = b''.join((state.occ[1] | state.occ[2]).to_bytes(nbytes, 'little')
+                    for state in states)
+    occ = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(
+        len(states), nbytes), axis=1, bitorder='little')[:, :cells]
+    heads = np.array([(state.ring[1][state.head[1]],
+                       state.ring[2][state.head[2]]) for state in states],
+                     dtype=np.int64)
+    return pack_rows(occ, dims), heads
+
+class TerritoryEvaluator():
+    """Scores search leaves by territory: the cells a snake reaches first
+    less the cells its opponent does, times weight."""
+
+    def __init__(self, weight=1):
+        self.weight = weight
+        self.leaves = 0
+
+    def evaluate(self, states, snake_id):
+        """values for snake_id of a list of bitboard.BitStates, all on the
+        same board"""
+        if not states:
+            return []
+        walls, heads = state_rows(states)
+        cells = count_rows(walls, heads, states[0].dims)
+        self.leaves += len(states)
+        mine = cells[:, snake_id - 1]
+        theirs = cells[:, 2 - snake_id]
+        return (self.weight*(mine - theirs)).tolist()
+
+def reference_counts(state):
+    """counts of one BitState, one cell at a time"""
+    grid = grid_of(state.dims)
+    occ = state.occ[1] | state.occ[2]
+    owner = {}
+    frontier = [(state.head_cell(1), 0), (state.head_cell(2), 1)]
+    found = [0, 0]
+    while frontier:
+        reached = {}
+        for c, s in frontier:
+            for n in grid.neighbors[c]:
+                if (occ >> n) & 1 or n in owner:
+                    continue
+                if reached.get(n, s) != s:
+                    reached[n] = None
+                else:
+                    reached[n] = s
+        owner.update(reached)
+        frontier = [(c, s) for c, s in reached.items() if s is not None]
+        for c, s in frontier:
+            found[s] += 1
+    return found
+
+def crosscheck(gamestates):
+    """Compares counts, from both BitStates and bool walls, with
+    reference_counts on snaketron.engine gamestates. Returns the indices of
+    those they disagree on."""
+    states = [bitboard.from_gamestate(g) for g in gamestates]
+    dims = states[0].dims
+    walls, heads = state_rows(states)
+    cells = count_rows(walls, heads, dims)
+    occ = np.zeros((len(states), dims[0]*dims[1]), dtype=bool)
+    for i, state in enumerate(states):
+        occ[i, state.cells(1) + state.cells(2)] = True
+    from_walls = counts(occ, heads, dims)
+    return [i for i, state in enumerate(states)
+            if list(cells[i]) != reference_counts(state)
+            or list(from_walls[i]) != list(cells[i])]
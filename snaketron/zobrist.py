@@ -0,0 +1,211 @@
+"""Zobrist hashing and a transposition table for snaketron search.
+
+A position's key is the xor of random 64 bit numbers for every link of each
+snake's body, each snake's head cell, tail cell and direction, the pip cell
+(or the lack of one) and which snake had the last pip. A link is a block of
+the body together with the way to the next block towards the head, so the
+links of a body spell out its cells in order: bodies covering the same cells
+in a different order have different keys. Attach keys to a bitboard.BitState
+with attach and the state keeps state.key up to date as moves are made and
+unmade, so search code never has to rehash a position.
+"""
+import random
+from collections import defaultdict
+from grid import neighbor_table
+
+_keys = {}
+
+def keys_for(dims, seed=0):
+    """ZobristKeys for board size dims, built once per size and seed"""
+    try:
+        return _keys[(dims, seed)]
+    except KeyError:
+        keys = ZobristKeys(dims, seed)
+        _keys[(dims, seed)] = keys
+        return keys
+
+def attach(state, keys=None):
+    """Start tracking state.key on a BitState. Returns the key."""
+    if keys is None:
+        keys = keys_for(state.dims)
+    state.zobrist = keys
+    state.key = keys.hash(state)
+    return state.key
+
+class ZobristKeys():
+    """Random keys for every hashed feature of a board of size dims. Keys are
+    drawn from their own generator, so building them does not touch the
+    random module the game draws pips from.
+    """
+
+    def __init__(self, dims, seed=0):
+        rng = random.Random(seed)
+        ncells = dims[0]*dims[1]
+        def table(n):
+            return [rng.getrandbits(64) for i in range(n)]
+        self.dims = dims
+        self.neighbors = neighbor_table(dims)
+        # link keys are indexed by cell*4 + the direction code of the next
+        # block from it
+        self.link = [None, table(4*ncells), table(4*ncells)]
+        # the same keys by cell*ncells + next cell, for move_delta to look up
+        # without working out the direction
+        self.ncells = ncells
+        self.link_to = [None] + [
+            dict((c*ncells + n, links[4*c + d])
+                 for c in range(ncells)
+                 for d, n in enumerate(self.neighbors[c]))
+            for links in self.link[1:]]
+        self.head = [None, table(ncells), table(ncells)]
+        self.tail = [None, table(ncells), table(ncells)]
+        self.direction = [None, table(4), table(4)]
+        # and one for no pip at all, which bitboard.NO_PIP (-1) indexes
+        self.pip = table(ncells + 1)
+        self.last_pip = [0] + table(2)
+
+    def hash(self, state):
+        """full key of a BitState, computed from scratch"""
+        key = self.pip[state.pip] ^ self.last_pip[state.last_pip]
+        for sid in (1, 2):
+            cells = state.cells(sid)
+            for i in range(1, len(cells)):
+                key ^= self.link_key(sid, cells[i], cells[i - 1])
+            key ^= self.head[sid][cells[0]] ^ self.tail[sid][cells[-1]]
+            key ^= self.direction[sid][state.direction[sid]]
+        return key
+
+    def link_key(self, sid, cell, next_cell):
+        """key of the link from cell to next_cell, the block after it towards
+        the head of snake sid"""
+        return self.link_to[sid][cell*self.ncells + next_cell]
+
+    def move_delta(self, sid, ring, mask, old_head_at, old_tail_at, tail_at,
+                   new_head, old_dir, new_dir):
+        """xor to apply to a key when snake sid moves its head to new_head.
+        ring is its ring buffer (of length mask + 1) after the blocks cut off
+        its tail are dropped but before the new head is written: they are
+        the ones from ring index old_tail_at down to tail_at, exclusive. The
+        old head is at old_head_at."""
+        old_head = ring[old_head_at]
+        delta = (self.head[sid][old_head] ^ self.head[sid][new_head]
+                 ^ self.tail[sid][ring[old_tail_at]]
+                 ^ self.direction[sid][old_dir] ^ self.direction[sid][new_dir])
+        link_to = self.link_to[sid]
+        ncells = self.ncells
+        i = old_tail_at
+        while i != tail_at:
+            if i == old_head_at:
+                # the whole body is gone, the new head is all that is left
+                return delta ^ self.tail[sid][new_head]
+            next_at = (i - 1) & mask
+            delta ^= link_to[ring[i]*ncells + ring[next_at]]
+            i = next_at
+        # the new head is new_dir from the old one, no need to look it up
+        return (delta ^ self.tail[sid][ring[tail_at]]
+                ^ self.link[sid][4*old_head + new_dir])
+
+    def pip_delta(self, old_pip, new_pip, old_last_pip, new_last_pip):
+        """xor to apply to a key when the pip is taken and relocated"""
+        return (self.pip[old_pip] ^ self.pip[new_pip]
+                ^ self.last_pip[old_last_pip] ^ self.last_pip[new_last_pip])
+
+class TranspositionTable():
+    """Fixed size table of search results keyed by zobrist key.
+
+    Each key maps to one slot (key modulo size). A result is only reused for
+    the same remaining depth, since the search's scores depend on it. When
+    two positions want the same slot, the new one replaces the old one if
+    the old one was stored by an earlier search (see new_search) or searched
+    no deeper than the new one, so deep results from the current tick are
+    kept and stale ones age out. The table is meant to live as long as the
+    AI that owns it, so results carry over from tick to tick.
+
+    A result can come with the best move found for it, which best_move
+    hands out whatever depth it was searched to, so that a deeper search
+    of the same position can try that move first.
+    """
+
+    def __init__(self, size=2**16):
+        # round up to a power of two so the slot is key & mask
+        n = 1
+        while n < size:
+            n *= 2
+        self.size = n
+        self.mask = n - 1
+        self.keys = [None]*n
+        self.depths = [0]*n
+        self.values = [0]*n
+        self.nodes = [0]*n
+        self.moves = [None]*n
+        self.ages = [0]*n
+        self.age = 0
+        self.reset_stats()
+
+    def new_search(self):
+        """mark the start of a new search, making older results replaceable"""
+        self.age += 1
+
+    def clear(self):
+        """forget every stored result"""
+        n = self.size
+        self.keys = [None]*n
+        self.depths = [0]*n
+        self.values = [0]*n
+        self.nodes = [0]*n
+        self.moves = [None]*n
+        self.ages = [0]*n
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = defaultdict(int)
+        self.hits = defaultdict(int)
+        self.saved = defaultdict(int)
+        self.stores = 0
+        self.evictions = 0
+
+    def probe(self, key, depth):
+        """stored value for key searched to depth, or None"""
+        i = key & self.mask
+        self.probes[depth] += 1
+        if self.keys[i] == key and self.depths[i] == depth:
+            self.hits[depth] += 1
+            self.saved[depth] += self.nodes[i]
+            return self.values[i]
+        return None
+
+    def best_move(self, key):
+        """best move stored for key at any depth, or None"""
+        i = key & self.mask
+        if self.keys[i] == key:
+            return self.moves[i]
+        return None
+
+    def store(self, key, depth, value, nodes=0, move=None):
+        """store value for key searched to depth. nodes is the size of the
+        subtree the value came from, used to report how many nodes hits
+        save. move is the best move found, if any."""
+        i = key & self.mask
+        old = self.keys[i]
+        if (old is not None and old != key and self.ages[i] == self.age
+            and self.depths[i] > depth):
+            return
+        if old is not None and old != key:
+            self.evictions += 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.values[i] = value
+        self.nodes[i] = nodes
+        self.moves[i] = move
+        self.ages[i] = self.age
+        self.stores += 1
+
+    def stats(self):
+        """hit statistics since the last reset_stats, per remaining depth:
+        {depth: (probes, hits, hit rate, nodes saved)}"""
+        out = {}
+        for depth in sorted(self.probes):
+            probes = self.probes[depth]
+            hits = self.hits[depth]
+            out[depth] = (probes, hits, float(hits)/probes, self.saved[depth])
+        return out
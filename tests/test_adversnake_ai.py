@@ -0,0 +1,109 @@
+"""AdverSnakeAI2's alpha-beta search against a plain minimax, on positions
+with an obvious best move, and the make/unmake it searches with."""
+import random
+from collections import deque
+import pytest
+from adversnake import engine
+from adversnake.engine import GameStep, SnakeView, PipView
+from adversnake.AIs.ai1 import AdverSnakeAI1
+from adversnake.AIs.ai2 import AdverSnakeAI2, WIN, search_state
+from tests.test_make_unmake import walk, DIRS
+
+def same(a, b):
+    for k in a:
+        if k not in engine.ENGINE_KEYS and a[k] != b.get(k):
+            return False
+    free_a = engine.free_cells(a)
+    free_b = engine.free_cells(b)
+    return (free_a.cells == free_b.cells and free_a.count == free_b.count
+            and all(engine.body_cells(a, sid) == engine.body_cells(b, sid)
+                    for sid in (1, 2))
+            and engine.game_rng(a).getstate() == engine.game_rng(b).getstate())
+
+def test_make_unmake():
+    rng = random.Random(0)
+    for seed in range(20):
+        gamestate = engine.reset(seed, pips_total=30,
+                                 snake_len=rng.choice([3, 40]))
+        for t in range(60):
+            walk(engine, gamestate, same, rng, 3)
+            if engine.step(gamestate, rng.choice(DIRS),
+                           rng.choice(DIRS)) is not None:
+                break
+
+def ai_args(gamestate, sid):
+    return (gamestate['dims'][0], SnakeView(gamestate, sid),
+            SnakeView(gamestate, 3 - sid),
+            [PipView(loc) for loc in gamestate['pips']],
+            gamestate['last_pip'][0][0] == sid)
+
+def min_value(ai, state, move, depth, lookahead, score):
+    """AdverSnakeAI2._min_value without alpha-beta"""
+    worst = 2*WIN
+    for op_move in ai._ordered_moves(state, 2):
+        win, undo = GameStep.make_move(state, move, op_move)
+        if win is not None:
+            value = WIN - depth if win == 1 else depth - WIN
+        else:
+            gained = score + ai._gain(undo[-1])
+            if depth == lookahead:
+                value = gained + ai._evaluate(state)
+            else:
+                value = max([min_value(ai, state, m, depth + 1, lookahead,
+                                       gained)
+                             for m in ai._ordered_moves(state, 1)])
+        GameStep.unmake_move(state, undo)
+        worst = min(worst, value)
+    return worst
+
+def positions(n=12, every=9):
+    """gamestates from a game of AdverSnakeAI1 against itself, with a few
+    pips on the board"""
+    random.seed(0)
+    ai = AdverSnakeAI1()
+    gamestate = engine.reset(4, pips_disp=3, pips_total=100, snake_len=6)
+    out = []
+    for t in range(n*every):
+        if t % every == 0:
+            out.append(engine.copy_gamestate(gamestate))
+        m1 = engine.ai_move(ai, gamestate, 1)
+        m2 = engine.ai_move(ai, gamestate, 2)
+        engine.step(gamestate, m1, m2)
+    return out
+
+@pytest.mark.parametrize('lookahead', [1, 2])
+def test_alpha_beta(lookahead):
+    ai = AdverSnakeAI2(lookahead=lookahead)
+    for gamestate in positions():
+        for sid in (1, 2):
+            move = ai.update(*ai_args(gamestate, sid))
+            # the first of the best moves in the order they are searched
+            state = search_state(*ai_args(gamestate, sid))
+            moves = ai._ordered_moves(state, 1)
+            values = [min_value(ai, state, m, 1, lookahead, 0)
+                      for m in moves]
+            assert move == moves[values.index(max(values))]
+
+def position(body1, dir1, body2, dir2, pips):
+    gamestate = engine.reset(0, pips_disp=len(pips))
+    gamestate['pips'] = list(pips)
+    for sid, body, direc in ((1, body1, dir1), (2, body2, dir2)):
+        gamestate[(sid, 'body')] = deque(body)
+        gamestate[(sid, 'direction')] = [(direc,)]
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+    del gamestate['free']
+    del gamestate['cells']
+    return gamestate
+
+def test_takes_pip():
+    # snake 2 is on its way to the pip as well
+    gamestate = position([(5, 5), (4, 5), (3, 5)], 'right',
+                         [(9, 4), (10, 4), (11, 4)], 'left', [(5, 4)])
+    assert AdverSnakeAI2().update(*ai_args(gamestate, 1)) == 'up'
+
+def test_avoids_body():
+    # the pip lies straight ahead, past the other snake's body
+    body2 = [(6, 2 + y) for y in range(8)]
+    gamestate = position([(5, 5), (4, 5), (3, 5)], 'right', body2, 'up',
+                         [(8, 5)])
+    assert AdverSnakeAI2().update(*ai_args(gamestate, 1)) != 'right'
@@ -0,0 +1,95 @@
+"""adversnake.engine rules on positions with a known outcome."""
+from collections import deque
+import pytest
+from adversnake import engine
+
+def position(body1, dir1, body2, dir2, pips=((0, 0),), last_pip=1,
+             pips_remaining=10):
+    gamestate = engine.reset(0, pips_total=pips_remaining)
+    gamestate['pips'] = list(pips)
+    gamestate['last_pip'] = [(last_pip,)]
+    for sid, body, direc in ((1, body1, dir1), (2, body2, dir2)):
+        gamestate[(sid, 'body')] = deque(body)
+        gamestate[(sid, 'direction')] = [(direc,)]
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+    del gamestate['free']
+    del gamestate['cells']
+    return gamestate
+
+def bodies(gamestate):
+    return list(gamestate[(1, 'body')]), list(gamestate[(2, 'body')])
+
+# a line far away from everything else on the board
+OTHER = [(20 + x, 25) for x in range(5)]
+
+def test_move():
+    gamestate = position([(5, 5), (4, 5), (3, 5)], 'right', OTHER, 'left')
+    assert engine.step(gamestate, 'up', 'down') is None
+    assert bodies(gamestate) == ([(5, 4), (5, 5), (4, 5)],
+                                 [(20, 26)] + OTHER[:4])
+
+def test_pip():
+    gamestate = position([(5, 5), (4, 5), (3, 5)], 'right', OTHER, 'left',
+                         pips=[(6, 5)], last_pip=2)
+    engine.step(gamestate, 'right', 'left')
+    assert bodies(gamestate)[0] == [(6, 5), (5, 5), (4, 5), (3, 5)]
+    assert gamestate['last_pip'] == [(1,)]
+    assert gamestate['pips_remaining'] == [(9,)]
+    # a new pip is drawn, off the snakes
+    (pip,) = gamestate['pips']
+    assert pip not in gamestate[(1, 'body')] + gamestate[(2, 'body')]
+
+def test_last_pip():
+    # the last pip ends the game, and the longer snake wins
+    gamestate = position([(5, 5), (4, 5), (3, 5)], 'right', OTHER, 'left',
+                         pips=[(20, 24)], last_pip=1, pips_remaining=1)
+    assert engine.step(gamestate, 'right', 'up') == 2
+    assert gamestate['pips'] == []
+
+def test_self_hit():
+    body = [(6, 5), (5, 5), (5, 6), (6, 6), (7, 6), (7, 5), (7, 4), (8, 4)]
+    gamestate = position(body, 'right', OTHER, 'left')
+    engine.step(gamestate, 'right', 'left')
+    # the tail moves on, then the snake loses it from where its head is
+    assert bodies(gamestate)[0] == [(7, 5), (6, 5), (5, 5), (5, 6), (6, 6),
+                                    (7, 6)]
+
+def test_opponent_hit():
+    body1 = [(10, 9), (9, 9), (8, 9)]
+    body2 = [(12 - x, 10) for x in range(5)]
+    gamestate = position(body1, 'right', body2, 'right')
+    engine.step(gamestate, 'down', 'up')
+    # running into the other snake costs the whole tail
+    assert bodies(gamestate) == ([(10, 10)],
+                                 [(12, 9)] + body2[:4])
+
+@pytest.mark.parametrize('last_pip', [1, 2])
+def test_head_on(last_pip):
+    body1 = [(10 - x, 10) for x in range(4)]
+    body2 = [(12 + x, 10) for x in range(4)]
+    gamestate = position(body1, 'right', body2, 'left', last_pip=last_pip)
+    engine.step(gamestate, 'right', 'left')
+    # the snake that had the pip last goes on, the other keeps its head
+    len1, len2 = [len(b) for b in bodies(gamestate)]
+    assert (len1, len2) == ((4, 1) if last_pip == 1 else (1, 4))
+
+@pytest.mark.parametrize('head1, dir1, head2, dir2', [
+    ((10, 10), 'right', (11, 10), 'left'),
+    ((10, 10), 'down', (10, 11), 'up'),
+    # across the edge of the board
+    ((30, 5), 'right', (0, 5), 'left'),
+    ((5, 0), 'up', (5, 30), 'down')])
+def test_skip_over(head1, dir1, head2, dir2):
+    # heads facing each other swap places instead of meeting; the snake
+    # that did not have the pip last loses its tail
+    def tail(head, direc):
+        dx, dy = {'left': (1, 0), 'right': (-1, 0), 'up': (0, 1),
+                  'down': (0, -1)}[direc]
+        return [((head[0] + i*dx) % 31, (head[1] + i*dy) % 31)
+                for i in range(4)]
+    gamestate = position(tail(head1, dir1), dir1, tail(head2, dir2), dir2,
+                         last_pip=1)
+    engine.step(gamestate, dir1, dir2)
+    body1, body2 = bodies(gamestate)
+    assert (body1[0], body2[0]) == (head2, head1)
+    assert (len(body1), len(body2)) == (4, 1)
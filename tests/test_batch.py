@@ -0,0 +1,61 @@
+"""BatchGame against snaketron.engine, and on positions with a known
+outcome."""
+import numpy as np
+import pytest
+from snaketron import batch, bitboard, engine
+
+def position(body1, dir1, body2, dir2, last_pip=1):
+    gamestate = {'dims': [(engine.blocksx, engine.blocksy)],
+                 'pip': [(0, 0)], 'last_pip': [(last_pip,)]}
+    for sid, body, direc in ((1, body1, dir1), (2, body2, dir2)):
+        gamestate[(sid, 'body')] = body
+        gamestate[(sid, 'direction')] = [(direc,)]
+        gamestate[(sid, 'next_direction')] = [(direc,)]
+    return gamestate
+
+def step_both(gamestate, s1dir, s2dir):
+    """steps gamestate in a BatchGame and in the engine; returns the
+    batch's (winner, gamestate) after checking the engine agrees"""
+    games = batch.BatchGame(1, seed=0)
+    games.set_gamestate(0, gamestate)
+    winner = games.step(np.array([[bitboard.DIR_CODES[s1dir],
+                                    bitboard.DIR_CODES[s2dir]]]))[0]
+    after = games.gamestate(0)
+    expected = engine.copy_gamestate(gamestate)
+    assert (engine.step(expected, s1dir, s2dir) or 0) == winner
+    if not winner:
+        assert after == expected
+    return winner, after
+
+# a line far away from everything else on the board
+OTHER = [(20 + x, 25) for x in range(5)]
+
+def test_crosscheck():
+    assert batch.crosscheck(n=100, steps=200, seed=0) == []
+
+def test_self_cut():
+    # snake 1 curls round so its next move right lands on its own body
+    body = [(6, 5), (5, 5), (5, 6), (6, 6), (7, 6), (7, 5), (7, 4), (6, 4),
+            (5, 4), (4, 4)]
+    winner, after = step_both(position(body, 'right', OTHER, 'left'),
+                              'right', 'left')
+    assert winner == 0
+    # cut through the new head, then the tail moves on as usual
+    assert after[(1, 'body')] == [(7, 5), (6, 5), (5, 5), (5, 6), (6, 6)]
+
+@pytest.mark.parametrize('last_pip', [1, 2])
+def test_head_on(last_pip):
+    # both heads move onto (11, 10); the last snake to get the pip wins
+    body1 = [(10 - x, 10) for x in range(4)]
+    body2 = [(12 + x, 10) for x in range(4)]
+    winner, after = step_both(position(body1, 'right', body2, 'left',
+                                       last_pip), 'right', 'left')
+    assert winner == last_pip
+
+def test_into_body():
+    # snake 1 turns down into the side of snake 2
+    body1 = [(10, 9), (9, 9), (8, 9)]
+    body2 = [(12 - x, 10) for x in range(5)]
+    winner, after = step_both(position(body1, 'right', body2, 'right'),
+                              'down', 'up')
+    assert winner == 2
@@ -0,0 +1,42 @@
+"""snaketron.engine runs games without pygame, and the same seed and moves
+always give the same game."""
+import random
+import subprocess
+import sys
+from snaketron import engine
+from snaketron.AIs.ai1 import SnakeTronAI1
+
+def test_no_pygame():
+    code = ('import sys, snaketron.engine, snaketron.AIs.ai2, '
+            'snaketron.replay; print("pygame" in sys.modules)')
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.split()[-1] == b'False'
+
+def test_step():
+    gamestate = engine.reset(7)
+    head1 = gamestate[(1, 'body')][0]
+    length = len(gamestate[(2, 'body')])
+    assert engine.step(gamestate, 'up', 'up') is None
+    assert gamestate[(1, 'body')][:2] == [(head1[0], head1[1] - 1), head1]
+    assert gamestate[(1, 'direction')] == [('up',)]
+    assert len(gamestate[(2, 'body')]) == length
+
+def play(seed, ticks=300):
+    """pips of a game of SnakeTronAI1 against itself"""
+    random.seed(0)
+    ai = SnakeTronAI1()
+    gamestate = engine.reset(seed)
+    pips = [gamestate['pip'][0]]
+    for t in range(ticks):
+        s1dir = engine.ai_move(ai, gamestate, 1)
+        s2dir = engine.ai_move(ai, gamestate, 2)
+        if engine.step(gamestate, s1dir, s2dir) is not None:
+            break
+        pips.append(gamestate['pip'][0])
+    return pips
+
+def test_seeded():
+    pips = play(11)
+    assert len(set(pips)) > 3
+    assert play(11) == pips
+    assert play(12) != pips
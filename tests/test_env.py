@@ -0,0 +1,62 @@
+"""The environments' planes against observe over random games, and what
+reset and step hand out."""
+import random
+import numpy as np
+import pytest
+import env
+from grid import LEFT, RIGHT, UP
+
+def test_snaketron_crosscheck():
+    assert env.crosscheck(env.SnakeTronEnv(seed=1), 2000) == []
+
+def test_adversnake_crosscheck():
+    assert env.crosscheck(env.AdverSnakeEnv(seed=1), 2000) == []
+
+def test_planes():
+    e = env.SnakeTronEnv(seed=0)
+    obs, info = e.reset(5)
+    assert obs.shape == (2, len(env.PLANES), 31, 31) and obs.dtype == np.uint8
+    assert info == {'winner': None, 'tick': 0}
+    mine, theirs = obs
+    # snake 1 starts at (10, 10) heading right, 10 blocks long
+    assert mine[env.OWN_HEAD, 10, 10] == 1 == theirs[env.OPPONENT_HEAD, 10, 10]
+    assert mine[env.OWN_HEAD].sum() == 1
+    assert mine[env.OWN_BODY].sum() == 10 == theirs[env.OPPONENT_BODY].sum()
+    assert (mine[env.OWN_BODY] == theirs[env.OPPONENT_BODY]).all()
+    x, y = e.gamestate['pip'][0]
+    assert mine[env.PIPS, y, x] == 1 and mine[env.PIPS].sum() == 1
+    assert mine[env.LAST_PIP].all() and not theirs[env.LAST_PIP].any()
+    with pytest.raises(ValueError):
+        obs[0, 0, 0, 0] = 1
+
+def test_step():
+    e = env.SnakeTronEnv(seed=0, max_ticks=3)
+    obs, info = e.reset(5)
+    before = obs.copy()
+    after, rewards, terminated, truncated, info = e.step((UP, LEFT))
+    # the same view, changed in place
+    assert after is obs and not np.array_equal(before, obs)
+    assert obs[0, env.OWN_HEAD, 9, 10] == 1 and obs[0, env.OWN_HEAD].sum() == 1
+    # the tail left (1, 10)
+    assert obs[0, env.OWN_BODY, 10, 1] == 0 and obs[0, env.OWN_BODY].sum() == 10
+    assert (rewards, terminated, truncated) == ((0, 0), False, False)
+    assert info == {'winner': None, 'tick': 1}
+    e.step((RIGHT, -1))
+    obs, rewards, terminated, truncated, info = e.step((RIGHT, None))
+    assert (terminated, truncated, info['tick']) == (False, True, 3)
+    with pytest.raises(RuntimeError):
+        e.step((RIGHT, LEFT))
+
+@pytest.mark.parametrize('make', [env.SnakeTronEnv, env.AdverSnakeEnv])
+def test_rewards(make):
+    rng = random.Random(0)
+    e = make(seed=0)
+    for game in range(3):
+        e.reset()
+        terminated = False
+        while not terminated:
+            obs, rewards, terminated, truncated, info = e.step(
+                (rng.randrange(4), rng.randrange(4)))
+            if not terminated:
+                assert rewards == (0, 0) and info['winner'] is None
+        assert rewards == {1: (1, -1), 2: (-1, 1)}[info['winner']]
@@ -0,0 +1,72 @@
+"""FreeCells against a plain set, undoing its journal, and the engine's
+pips landing only on free cells."""
+import random
+from freecells import FreeCells
+from snaketron import batch, engine
+
+DIRS = ('left', 'right', 'up', 'down')
+
+def test_journal():
+    rng = random.Random(0)
+    dims = (7, 5)
+    counts = {}
+    free = FreeCells(dims)
+    for round in range(200):
+        before = free.copy()
+        before_cells = free.cells[:]
+        journal = []
+        for i in range(rng.randrange(1, 8)):
+            if counts and rng.random() < 0.5:
+                loc = rng.choice(sorted(counts))
+                free.release(loc, journal)
+                counts[loc] -= 1
+                if not counts[loc]:
+                    del counts[loc]
+            else:
+                loc = (rng.randrange(dims[0]), rng.randrange(dims[1]))
+                free.occupy(loc, journal)
+                counts[loc] = counts.get(loc, 0) + 1
+            assert len(free) == dims[0]*dims[1] - len(counts)
+            assert all(free.is_free(free.sample(rng.randrange))
+                       for s in range(3) if not free.full())
+        if rng.random() < 0.5:
+            free.undo(journal)
+            assert free == before and free.cells == before_cells
+            counts = {}
+            for c, n in enumerate(free.count):
+                if n:
+                    counts[(c % dims[0], c // dims[0])] = n
+
+def test_overlap():
+    free = FreeCells((3, 2), [(0, 0), (1, 0), (1, 0)])
+    assert len(free) == 4 and free.count_at((1, 0)) == 2
+    free.release((1, 0))
+    assert not free.is_free((1, 0))
+    free.release((1, 0))
+    assert free.is_free((1, 0)) and len(free) == 5
+
+def test_full_board():
+    free = FreeCells((2, 2), [(0, 0), (1, 0), (0, 1), (1, 1)])
+    assert free.full() and free.sample() is None
+    free.release((1, 1))
+    assert [free.sample() for i in range(5)] == [(1, 1)]*5
+
+def test_engine_pips():
+    rng = random.Random(0)
+    gamestate = engine.reset(0)
+    for t in range(2000):
+        free = engine.free_cells(gamestate)
+        bodies = set(gamestate[(1, 'body')] + gamestate[(2, 'body')])
+        assert len(free) == engine.blocksx*engine.blocksy - len(bodies)
+        pip = gamestate['pip'][0]
+        assert pip is not None and pip not in bodies
+        if engine.step(gamestate, rng.choice(DIRS),
+                       rng.choice(DIRS)) is not None:
+            gamestate = engine.reset(t)
+
+def test_full_engine():
+    # with the board covered there is no pip until the snakes make room
+    gamestate = batch.full_gamestate((engine.blocksx, engine.blocksy))
+    assert engine.free_cells(gamestate).full()
+    engine.Pip.relocate(gamestate)
+    assert gamestate['pip'][0] is None
@@ -0,0 +1,67 @@
+"""make_move followed by unmake_move puts a snaketron game back exactly, in
+the engine and on bitboards."""
+import random
+import pytest
+from snaketron import bitboard, engine
+from snaketron.AIs.ai2 import SnakeTronAI2
+from snaketron.replay import same_gamestate
+
+DIRS = ('left', 'right', 'up', 'down', None)
+
+def walk(module, gamestate, same, rng, depth):
+    """makes and unmakes every pair of rng's moves down to depth, checking
+    that each unmake restores the position; returns the positions seen"""
+    seen = 0
+    for i in range(3):
+        before = module.copy_gamestate(gamestate)
+        win, undo = module.GameStep.make_move(gamestate, rng.choice(DIRS),
+                                              rng.choice(DIRS))
+        seen += 1
+        if win is None and depth > 1:
+            seen += walk(module, gamestate, same, rng, depth - 1)
+        module.GameStep.unmake_move(gamestate, undo)
+        assert same(before, gamestate)
+    return seen
+
+def test_snaketron_engine():
+    rng = random.Random(0)
+    for seed in range(20):
+        gamestate = engine.reset(seed)
+        for t in range(60):
+            walk(engine, gamestate, same_gamestate, rng, 3)
+            if engine.step(gamestate, rng.choice(DIRS),
+                           rng.choice(DIRS)) is not None:
+                break
+
+def test_bitboard():
+    random.seed(0)
+    rng = random.Random(0)
+    for seed in range(20):
+        gamestate = engine.reset(seed)
+        state = bitboard.from_gamestate(gamestate)
+        for t in range(200):
+            before = bitboard.pack(state)
+            win, undo = bitboard.make_move(state, rng.choice(DIRS),
+                                           rng.choice(DIRS))
+            bitboard.unmake_move(state, undo)
+            assert bitboard.pack(state) == before
+            moves = (rng.choice(DIRS), rng.choice(DIRS))
+            win = bitboard.step(state, *moves)
+            assert engine.step(gamestate, *moves) == win
+            if win is not None:
+                break
+            # the two draw relocated pips differently
+            gamestate['pip'][0] = bitboard.to_gamestate(state)['pip'][0]
+            game = {k: v for k, v in gamestate.items()
+                    if k not in engine.ENGINE_KEYS and k != 'seed'}
+            assert bitboard.to_gamestate(state) == game
+
+@pytest.mark.parametrize('mode', ['count', 'minimax'])
+def test_search_unmakes(mode):
+    ai = SnakeTronAI2(mode=mode)
+    gamestate = engine.reset(5)
+    ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+    state = bitboard.from_gamestate(gamestate)
+    before = bitboard.pack(state)
+    ai._search(state, 1, 3)
+    assert bitboard.pack(state) == before
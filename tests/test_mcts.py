@@ -0,0 +1,54 @@
+"""SnakeTronAI3's tree statistics, reuse and determinism, and its moves on
+positions with an obvious bad one."""
+import random
+import pytest
+from snaketron import bitboard, engine
+from snaketron.AIs.ai3 import SnakeTronAI3
+from tests.test_batch import position
+
+@pytest.mark.parametrize('rollout', ['random', 'ai1'])
+def test_statistics(rollout):
+    ai = SnakeTronAI3(rollouts=200, rollout=rollout, seed=0)
+    gamestate = engine.reset(1)
+    before = random.getstate()
+    ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+    # the pips drawn in rollouts do not show in the game's random
+    assert random.getstate() == before
+    root = ai.root
+    assert root.visits == 200 == ai.decisions[-1][0]
+    for sid in (1, 2):
+        assert sum(root.n[sid]) == root.visits
+        assert all(0 <= root.w[sid][c] <= root.n[sid][c] for c in range(4))
+    assert sum(child.visits for child in root.children.values()) \
+        < root.visits
+
+def test_seeded():
+    gamestate = engine.reset(2)
+    runs = []
+    for i in range(2):
+        random.seed(0)
+        ai = SnakeTronAI3(rollouts=100, seed=3)
+        move = ai.update(engine.copy_gamestate(gamestate, full=False), 2)
+        runs.append((move, ai.root.n, ai.root.w))
+    assert runs[0] == runs[1]
+
+def test_reuse():
+    ai = SnakeTronAI3(rollouts=300, seed=0)
+    gamestate = engine.reset(3)
+    s1dir = ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+    s2dir = bitboard.DIRS[ai.root.moves[2][0]]
+    engine.step(gamestate, s1dir, s2dir)
+    ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+    assert ai.decisions[-1][3] > 0
+    fresh = SnakeTronAI3(rollouts=300, seed=0, reuse=False)
+    fresh.update(engine.copy_gamestate(gamestate, full=False), 1)
+    assert fresh.decisions[-1][3] == 0
+
+@pytest.mark.parametrize('rollout', ['random', 'ai1'])
+def test_avoids_body(rollout):
+    # going on right runs into the side of snake 2 and loses at once
+    body1 = [(10, 10), (9, 10), (8, 10)]
+    body2 = [(11, 6 + y) for y in range(10)]
+    gamestate = position(body1, 'right', body2, 'up')
+    ai = SnakeTronAI3(rollouts=300, rollout=rollout, seed=0)
+    assert ai.update(gamestate, 1) != 'right'
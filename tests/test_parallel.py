@@ -0,0 +1,53 @@
+"""SnakeTronAI2 picks the same moves with a worker pool as without."""
+import random
+import pytest
+from snaketron import engine, bitboard
+from snaketron.AIs.ai2 import SnakeTronAI2, pip_fields
+from benchmarks.snaketron_search import sample_positions
+
+@pytest.mark.parametrize('mode, lookahead, split_plies',
+                         [('count', 2, 1), ('count', 2, 2),
+                          ('minimax', 4, 1), ('minimax', 4, 2)])
+def test_parallel_moves(mode, lookahead, split_plies):
+    positions = sample_positions(n=8, every=7)
+    serial = SnakeTronAI2(lookahead=lookahead, mode=mode)
+    parallel = SnakeTronAI2(lookahead=lookahead, mode=mode, workers=2,
+                            split_plies=split_plies)
+    try:
+        for gamestate in positions:
+            for sid in (1, 2):
+                random.seed(0)
+                move = serial.update(engine.copy_gamestate(gamestate,
+                                                           full=False), sid)
+                random.seed(0)
+                assert parallel.update(engine.copy_gamestate(
+                    gamestate, full=False), sid) == move
+    finally:
+        parallel.close()
+
+def test_parallel_minimax_values():
+    """The best moves get the same minimax value from a two-ply split as
+    from the serial search, worse moves no more than their bound."""
+    serial = SnakeTronAI2(mode='minimax')
+    parallel = SnakeTronAI2(mode='minimax', workers=2, split_plies=2)
+    try:
+        for gamestate in sample_positions(n=4, every=7):
+            fields = pip_fields(engine.distance_fields(gamestate),
+                                gamestate['pip'][0])
+            serial.pip_fields = parallel.pip_fields = fields
+            for lookahead in (0, 3):
+                random.seed(0)
+                bound = serial._search(bitboard.from_gamestate(gamestate), 1,
+                                       lookahead)
+                random.seed(0)
+                exact = parallel._search(bitboard.from_gamestate(gamestate),
+                                         1, lookahead)
+                best = max(bound.values())
+                assert max(exact.values()) == best
+                for move in exact:
+                    if bound[move] == best:
+                        assert exact[move] == best
+                    else:
+                        assert exact[move] <= bound[move]
+    finally:
+        parallel.close()
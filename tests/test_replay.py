@@ -0,0 +1,69 @@
+"""Recordings load back and replay to the same game."""
+import random
+import pytest
+from snaketron import engine, replay
+from snaketron.AIs.ai1 import SnakeTronAI1
+from adversnake import engine as adversnake_engine
+from adversnake import replay as adversnake_replay
+from adversnake.AIs.ai1 import AdverSnakeAI1
+
+def record_game(seed, interval):
+    random.seed(seed)
+    ai = SnakeTronAI1()
+    gamestate = engine.reset(seed)
+    recorder = replay.Recorder(gamestate, interval)
+    states = [engine.copy_gamestate(gamestate)]
+    win = None
+    while win is None and recorder.ticks < 500:
+        s1dir = ai.update(engine.copy_gamestate(gamestate, full=False), 1)
+        s2dir = ai.update(engine.copy_gamestate(gamestate, full=False), 2)
+        win = engine.step(gamestate, s1dir, s2dir)
+        recorder.record(gamestate, win)
+        states.append(engine.copy_gamestate(gamestate))
+    return recorder, states
+
+@pytest.mark.parametrize('interval', [0, 16])
+def test_round_trip(interval):
+    recorder, states = record_game(3, interval)
+    loaded = replay.load(recorder.to_bytes())
+    assert (loaded.seed, loaded.ticks, loaded.winner) == (
+        3, recorder.ticks, recorder.winner)
+    assert loaded.check()
+    for tick in (0, 1, len(states)//2, len(states) - 1):
+        assert replay.same_gamestate(states[tick], loaded.seek(tick))
+
+@pytest.mark.parametrize('reset', [engine.reset, adversnake_engine.reset])
+def test_seed_range(reset):
+    reset(2**64 - 1)
+    for seed in (-1, 2**64):
+        with pytest.raises(ValueError):
+            reset(seed)
+
+def record_adversnake_game(seed, interval):
+    random.seed(seed)
+    ai = AdverSnakeAI1()
+    gamestate = adversnake_engine.reset(seed, pips_total=10, snake_len=3)
+    recorder = adversnake_replay.Recorder(gamestate, interval)
+    states = [adversnake_engine.copy_gamestate(gamestate)]
+    win = None
+    while win is None and recorder.ticks < 2000:
+        m1 = adversnake_engine.ai_move(ai, gamestate, 1)
+        m2 = adversnake_engine.ai_move(ai, gamestate, 2)
+        win = adversnake_engine.step(gamestate, m1, m2)
+        recorder.record(gamestate, win)
+        states.append(adversnake_engine.copy_gamestate(gamestate))
+    return recorder, states
+
+@pytest.mark.parametrize('interval', [0, 16])
+def test_adversnake_round_trip(interval):
+    recorder, states = record_adversnake_game(5, interval)
+    assert recorder.winner is not None
+    loaded = adversnake_replay.load(recorder.to_bytes())
+    assert (loaded.seed, loaded.ticks, loaded.winner, loaded.pips_total) == (
+        5, recorder.ticks, recorder.winner, 10)
+    if interval:
+        assert len(loaded.keyframes) == (recorder.ticks - 1)//interval
+    assert loaded.check()
+    for tick in (0, 1, 17, len(states)//2, len(states) - 1):
+        assert adversnake_replay.same_gamestate(states[tick],
+                                                loaded.seek(tick))
@@ -0,0 +1,55 @@
+"""Shards round trip, and self-play records replay to the positions they
+hold."""
+import numpy as np
+from env import SnakeTronEnv
+from shards import ShardWriter, ShardReader, shard_length
+from snaketron import selfplay
+
+DTYPE = np.dtype([('a', np.int32), ('b', np.float32, (2,))])
+
+def make_records(n):
+    records = np.zeros(n, dtype=DTYPE)
+    records['a'] = np.arange(n)
+    records['b'] = np.arange(2*n).reshape(n, 2)
+    return records
+
+def test_shards(tmp_path):
+    records = make_records(25)
+    writer = ShardWriter(str(tmp_path), 'test', DTYPE, shard_records=10,
+                         chunk=4)
+    writer.append(records[:7])
+    # a shard being written holds the chunks flushed so far
+    assert shard_length(writer.paths[0]) == 4
+    assert (np.load(writer.paths[0]) == records[:4]).all()
+    writer.append(records[7:])
+    paths = writer.close()
+    assert [shard_length(p) for p in paths] == [10, 10, 5]
+    reader = ShardReader(str(tmp_path), chunk=3)
+    assert len(reader) == 25
+    chunks = list(reader)
+    assert max(len(c) for c in chunks) == 3
+    assert not chunks[0].flags.writeable
+    assert (np.concatenate(chunks) == records).all()
+
+def test_selfplay(tmp_path):
+    seeds = [3, 4]
+    positions, outcomes, took = selfplay.play_games(
+        seeds, 'snaketron.AIs.ai1:SnakeTronAI1', str(tmp_path), 'sp', 60,
+        0.2, 50, 16)
+    records = np.concatenate(list(ShardReader(str(tmp_path))))
+    assert len(records) == positions
+    assert sum(outcomes.values()) == len(seeds)
+    # epsilon made some played moves differ from the chosen ones
+    assert (records['moves'] != records['played']).any()
+    env = SnakeTronEnv()
+    for seed in seeds:
+        game = records[records['seed'] == seed]
+        assert (game['tick'] == np.arange(len(game))).all()
+        assert len(set(game['outcome'])) == 1
+        # the played moves from the seed go through the recorded planes
+        obs, info = env.reset(seed)
+        for record in game:
+            assert (selfplay.decode_planes(record[None])[0] == obs[0]).all()
+            obs, rewards, terminated, truncated, info = env.step(
+                record['played'])
+        assert (info['winner'] or 0) == game['outcome'][0]
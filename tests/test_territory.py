@@ -0,0 +1,46 @@
+"""Territory counts against a plain breadth-first search, and on boards
+small enough to count by hand."""
+import numpy as np
+import pytest
+from snaketron import bitboard, territory
+from benchmarks.snaketron_search import sample_positions
+
+def test_crosscheck():
+    assert territory.crosscheck(sample_positions(n=50, every=3)) == []
+
+def ring_counts(width, walls, heads):
+    """counts on a board one row high, which wraps around into a ring"""
+    cells = np.zeros((1, width), dtype=bool)
+    cells[0, list(walls) + list(heads)] = True
+    return territory.counts(cells, np.array([heads]), (width, 1))[0].tolist()
+
+def test_contested():
+    # cell 1 is one step from both heads and belongs to neither; each head
+    # gets one cell the other way round
+    assert ring_counts(5, [], [0, 2]) == [1, 1]
+
+def test_split():
+    # the free cells are shared out from both ends and meet in the middle
+    assert ring_counts(8, [], [0, 1]) == [3, 3]
+    # a wall at 6 leaves snake 1 only cell 7
+    assert ring_counts(8, [6], [0, 1]) == [1, 4]
+
+def test_wide_board():
+    with pytest.raises(ValueError):
+        ring_counts(65, [], [0, 2])
+
+def test_evaluator():
+    # snake 1 is walled in by its own tail and snake 2's head
+    gamestate = {'dims': [(8, 1)], 'pip': [(3, 0)], 'last_pip': [(1,)],
+                 (1, 'body'): [(0, 0), (7, 0), (6, 0)],
+                 (1, 'direction'): [('right',)],
+                 (1, 'next_direction'): [('right',)],
+                 (2, 'body'): [(1, 0)],
+                 (2, 'direction'): [('right',)],
+                 (2, 'next_direction'): [('right',)]}
+    state = bitboard.from_gamestate(gamestate)
+    assert territory.reference_counts(state) == [0, 4]
+    evaluator = territory.TerritoryEvaluator(weight=2)
+    assert evaluator.evaluate([state, state], 1) == [-8, -8]
+    assert evaluator.evaluate([state], 2) == [8]
+    assert evaluator.leaves == 3
@@ -0,0 +1,76 @@
+"""Zobrist keys follow make/unmake, and SnakeTronAI2 finds the same values
+with a transposition table as without."""
+import random
+import pytest
+from snaketron import bitboard, engine, zobrist
+from snaketron.AIs.ai2 import SnakeTronAI2, pip_fields
+from benchmarks.snaketron_search import sample_positions
+
+DIRS = ('left', 'right', 'up', 'down', None)
+
+def test_keys():
+    random.seed(0)
+    rng = random.Random(0)
+    for seed in range(20):
+        state = bitboard.from_gamestate(engine.reset(seed))
+        zobrist.attach(state)
+        for t in range(200):
+            before = (bitboard.pack(state), state.key)
+            win, undo = bitboard.make_move(state, rng.choice(DIRS),
+                                           rng.choice(DIRS))
+            assert state.key == state.zobrist.hash(state)
+            if rng.random() < 0.3:
+                bitboard.unmake_move(state, undo)
+                assert (bitboard.pack(state), state.key) == before
+            elif win is not None:
+                break
+
+def test_body_order():
+    # the same cells walked the other way round are a different position
+    gamestate = engine.reset(3)
+    turned = engine.copy_gamestate(gamestate)
+    turned[(1, 'body')] = turned[(1, 'body')][::-1]
+    keys = zobrist.keys_for(gamestate['dims'][0])
+    key = keys.hash(bitboard.from_gamestate(gamestate))
+    assert keys.hash(bitboard.from_gamestate(turned)) != key
+    assert keys.hash(bitboard.from_gamestate(
+        engine.copy_gamestate(gamestate))) == key
+
+def search(ai, gamestate, sid, lookahead):
+    ai.pip_fields = pip_fields(engine.distance_fields(gamestate),
+                               gamestate['pip'][0])
+    state = bitboard.from_gamestate(gamestate)
+    if ai.tt is not None:
+        zobrist.attach(state)
+    random.seed(1)
+    return ai._search(state, sid, lookahead)
+
+@pytest.mark.parametrize('mode, lookahead', [('count', 3), ('minimax', 6)])
+def test_table_values(mode, lookahead):
+    plain = SnakeTronAI2(mode=mode)
+    # one table for every position, so results carry over between them
+    tabled = SnakeTronAI2(mode=mode, tt_size=2**16)
+    for gamestate in sample_positions(n=10, every=5):
+        for sid in (1, 2):
+            expected = search(plain, gamestate, sid, lookahead)
+            quality = search(tabled, gamestate, sid, lookahead)
+            if mode == 'count':
+                assert quality == expected
+            else:
+                # moves off the best get bounds, which the table can tighten
+                best = max(expected.values())
+                assert max(quality.values()) == best
+                assert ([m for m in quality if quality[m] == best]
+                        == [m for m in expected if expected[m] == best])
+    assert sum(hits for probes, hits, rate, saved
+               in tabled.tt.stats().values()) > 0
+
+def test_table_clear():
+    table = zobrist.TranspositionTable(16)
+    table.store(5, 2, 'value', 10, 'up')
+    assert table.probe(5, 2) == 'value'
+    assert table.probe(5, 3) is None
+    assert table.best_move(5) == 'up'
+    table.clear()
+    assert table.probe(5, 2) is None
+    assert table.best_move(5) is None
@@ -0,0 +1,147 @@
+"""Per tick timings of a game loop.
+
+A TickLog splits every tick of a game loop into phases and records how long
+each one took:
+
+    log = TickLog(per=100)
+    ...
+    log.start()
+    render()
+    log.lap('render')
+    update()
+    log.lap('engine')
+    log.end()
+
+Ticks whose phases add up to more than the per ms timer period are counted as
+overruns, they hold up the next tick. The timings can be saved as CSV (one row
+per tick) or JSON, and summary() gives percentiles per phase. Game loops take
+an optional TickLog and use NO_LOG otherwise, which times nothing.
+"""
+import csv
+import json
+import sys
+from timeit import default_timer
+
+PERCENTILES = (50, 90, 99)
+
+class TickLog():
+    """Timings in ms of the phases of every tick, in the order they were
+    first lapped.
+    """
+
+    def __init__(self, per=100):
+        self.per = per
+        self.phases = []
+        self.ticks = []
+        self.overruns = 0
+        self._tick = None
+        self._last = None
+
+    def start(self):
+        """starts timing a tick"""
+        self._tick = {}
+        self._last = default_timer()
+
+    def lap(self, phase):
+        """charges the time since the last start or lap to phase"""
+        now = default_timer()
+        if phase not in self.phases:
+            self.phases.append(phase)
+        self._tick[phase] = (self._tick.get(phase, 0.0)
+                             + (now - self._last)*1000)
+        self._last = now
+
+    def end(self):
+        """finishes the tick started last"""
+        if self._tick is None:
+            return
+        if sum(self._tick.values()) > self.per:
+            self.overruns += 1
+        self.ticks.append(self._tick)
+        self._tick = None
+
+    def column(self, phase):
+        """ms spent in phase in every tick that went through it"""
+        return [t[phase] for t in self.ticks if phase in t]
+
+    def totals(self):
+        return [sum(t.values()) for t in self.ticks]
+
+    def summary(self):
+        """{phase: {'mean', 'p50', 'p90', 'p99', 'max'}} in ms, including a
+        'total' phase for whole ticks, plus 'ticks' and 'overruns' counts"""
+        out = {'ticks': len(self.ticks), 'overruns': self.overruns}
+        for phase in self.phases + ['total']:
+            if phase == 'total':
+                values = sorted(self.totals())
+            else:
+                values = sorted(self.column(phase))
+            if not values:
+                continue
+            stats = {'mean': sum(values)/len(values), 'max': values[-1]}
+            for p in PERCENTILES:
+                stats['p%d' % p] = values[min(len(values) - 1,
+                                              len(values)*p//100)]
+            out[phase] = stats
+        return out
+
+    def report(self, out=sys.stdout):
+        """prints the summary as a table"""
+        summary = self.summary()
+        out.write('%d ticks, %d over the %d ms timer\n'
+                  % (summary['ticks'], summary['overruns'], self.per))
+        out.write('%-8s' % 'ms' + ''.join('%9s' % c for c in
+                  ['mean'] + ['p%d' % p for p in PERCENTILES] + ['max'])
+                  + '\n')
+        for phase in self.phases + ['total']:
+            if phase not in summary:
+                continue
+            stats = summary[phase]
+            out.write('%-8s' % phase + ''.join('%9.2f' % stats[c] for c in
+                      ['mean'] + ['p%d' % p for p in PERCENTILES] + ['max'])
+                      + '\n')
+
+    def save_csv(self, path):
+        """one row per tick, one column per phase, empty if the tick skipped
+        the phase"""
+        with open(path, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(['tick'] + self.phases + ['total'])
+            for i, tick in enumerate(self.ticks):
+                writer.writerow([i] + ['%.4f' % tick[p] if p in tick else ''
+                                       for p in self.phases]
+                                + ['%.4f' % sum(tick.values())])
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'per': self.per, 'phases': self.phases,
+                       'ticks': self.ticks, 'summary': self.summary()},
+                      f, indent=1)
+
+    def save(self, path):
+        """saves as CSV or JSON depending on the extension of path"""
+        if path.endswith('.json'):
+            self.save_json(path)
+        else:
+            self.save_csv(path)
+
+class NullTickLog():
+    """Stands in for a TickLog when nothing should be timed"""
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end(self):
+        pass
+
+NO_LOG = NullTickLog()
+
+def numbered(path, n):
+    """path with n inserted before the extension, for one file per game"""
+    stem, dot, ext = path.rpartition('.')
+    if not dot or '/' in ext:
+        return '%s-%d' % (path, n)
+    return '%s-%d.%s' % (stem, n, ext)
@@ -0,0 +1,259 @@
+"""Headless round-robin tournament between AIs.
+
+Every pair of AIs plays a number of games, switching sides every game, in
+a pool of worker processes. Nothing is rendered. At the end the win rate of
+every AI in every pairing is printed with a 95% confidence interval, along
+with game lengths and how long each AI took per move.
+
+AIs are given as module:Class, optionally followed by constructor keyword
+arguments:
+
+    python -m tournament snaketron.AIs.ai1:SnakeTronAI1 \\
+        snaketron.AIs.ai2:SnakeTronAI2 \\
+        snaketron.AIs.ai2:SnakeTronAI2,mode=minimax --games 100
+
+All AIs in a tournament must play the same game, which is taken from the
+package their module is in (snaketron or adversnake).
+"""
+import argparse
+import ast
+import importlib
+import json
+import math
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer
+
+GAMES = ('snaketron', 'adversnake')
+REPLAY_EXTENSIONS = {'snaketron': 'strp', 'adversnake': 'asrp'}
+
+def parse_spec(spec):
+    """'module:Class,key=value,...' -> (module, class name, kwargs)"""
+    parts = spec.split(',')
+    module, _, name = parts[0].partition(':')
+    if not name:
+        raise ValueError('AI must be given as module:Class, got ' + spec)
+    kwargs = {}
+    for part in parts[1:]:
+        key, _, value = part.partition('=')
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return module, name, kwargs
+
+def game_of(spec):
+    package = parse_spec(spec)[0].split('.')[0]
+    if package not in GAMES:
+        raise ValueError('cannot tell which game %s plays' % spec)
+    return package
+
+def make_ai(spec):
+    module, name, kwargs = parse_spec(spec)
+    return getattr(importlib.import_module(module), name)(**kwargs)
+
+def close_ai(ai):
+    if hasattr(ai, 'close'):
+        ai.close()
+
+def timed(latencies, f, *args, **kwargs):
+    """calls f, appending the seconds it took to latencies"""
+    start = default_timer()
+    out = f(*args, **kwargs)
+    latencies.append(default_timer() - start)
+    return out
+
+def play_snaketron(ai1, ai2, per, max_ticks, seed=None, replay=None):
+    """One headless snaketron game with pips drawn from seed. Returns
+    (winner or None, ticks, snake 1 latencies, snake 2 latencies). If replay
+    is a path, the game's replay is saved there."""
+    from snaketron import engine
+    from snaketron.replay import Recorder
+    gamestate = engine.reset(seed)
+    recorder = Recorder(gamestate)
+    s1dir, s2dir = 'right', 'left'
+    lat1 = []
+    lat2 = []
+    try:
+        for tick in range(max_ticks):
+            win = engine.step(gamestate, s1dir, s2dir)
+            recorder.record(gamestate, win)
+            if win is not None:
+                return win, tick + 1, lat1, lat2
+            s1dir = timed(lat1, engine.ai_move, ai1, gamestate, 1, per)
+            s2dir = timed(lat2, engine.ai_move, ai2, gamestate, 2, per)
+        return None, max_ticks, lat1, lat2
+    finally:
+        if replay is not None:
+            recorder.save(replay)
+
+def play_adversnake(ai1, ai2, per, max_ticks, seed=None, replay=None):
+    """One headless adversnake game with pips drawn from seed. Returns
+    (winner or None, ticks, snake 1 latencies, snake 2 latencies). If replay
+    is a path, the game's replay is saved there."""
+    from adversnake import engine
+    from adversnake.replay import Recorder
+    gamestate = engine.reset(seed, snake_len=3)
+    recorder = Recorder(gamestate)
+    m1, m2 = 'right', 'left'
+    lat1 = []
+    lat2 = []
+    try:
+        for tick in range(max_ticks):
+            win = engine.step(gamestate, m1, m2)
+            recorder.record(gamestate, win)
+            if win is not None:
+                return win, tick + 1, lat1, lat2
+            m1 = timed(lat1, engine.ai_move, ai1, gamestate, 1, per)
+            m2 = timed(lat2, engine.ai_move, ai2, gamestate, 2, per)
+        return None, max_ticks, lat1, lat2
+    finally:
+        if replay is not None:
+            recorder.save(replay)
+
+def play_game(game, spec_a, spec_b, a_first, seed, per, max_ticks,
+              replay=None):
+    """Runs in a worker process: one game between fresh AIs built from
+    spec_a and spec_b, a playing snake 1 if a_first, saving its replay to
+    the path replay if given. Returns (winner, ticks, a latencies,
+    b latencies) with winner 'a', 'b' or None."""
+    random.seed(seed)
+    ai_a = make_ai(spec_a)
+    ai_b = make_ai(spec_b)
+    play = play_snaketron if game == 'snaketron' else play_adversnake
+    try:
+        if a_first:
+            win, ticks, lat_a, lat_b = play(ai_a, ai_b, per, max_ticks,
+                                            seed, replay)
+        else:
+            win, ticks, lat_b, lat_a = play(ai_b, ai_a, per, max_ticks,
+                                            seed, replay)
+    finally:
+        close_ai(ai_a)
+        close_ai(ai_b)
+    if win is None:
+        winner = None
+    elif (win == 1) == a_first:
+        winner = 'a'
+    else:
+        winner = 'b'
+    return winner, ticks, lat_a, lat_b
+
+def wilson(score, n, z=1.96):
+    """95% Wilson score interval of a rate of score out of n"""
+    if n == 0:
+        return 0.0, 1.0
+    p = float(score)/n
+    center = (p + z*z/(2*n))/(1 + z*z/n)
+    half = z*math.sqrt(p*(1 - p)/n + z*z/(4*n*n))/(1 + z*z/n)
+    return max(0.0, center - half), min(1.0, center + half)
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q*len(values)))]
+
+def latency_summary(latencies):
+    """latency stats in ms"""
+    return {'moves': len(latencies),
+            'mean': 1000*sum(latencies)/len(latencies) if latencies else 0.0,
+            'p50': 1000*percentile(latencies, 0.5),
+            'p99': 1000*percentile(latencies, 0.99),
+            'max': 1000*max(latencies) if latencies else 0.0}
+
+def run(specs, games=20, workers=None, seed=0, per=100, max_ticks=5000,
+        replays=None):
+    """Plays games games between every pair of specs. Returns a list with a
+    result dict per pairing. With replays a directory, the replay of game g
+    between specs a and b is saved there as a-b-g.strp (snaketron) or
+    a-b-g.asrp (adversnake)."""
+    game = game_of(specs[0])
+    for spec in specs[1:]:
+        if game_of(spec) != game:
+            raise ValueError('%s and %s play different games'
+                             % (specs[0], spec))
+    pairings = [(a, b) for a in range(len(specs))
+                for b in range(a + 1, len(specs))]
+    pool = ProcessPoolExecutor(max_workers=workers)
+    futures = []
+    for a, b in pairings:
+        paths = [None]*games
+        if replays is not None:
+            paths = [os.path.join(replays, '%d-%d-%d.%s'
+                                  % (a, b, g, REPLAY_EXTENSIONS[game]))
+                     for g in range(games)]
+        futures.append([pool.submit(play_game, game, specs[a], specs[b],
+                                    g % 2 == 0, seed + g, per, max_ticks,
+                                    paths[g])
+                        for g in range(games)])
+    results = []
+    for (a, b), pairing in zip(pairings, futures):
+        outcomes = [f.result() for f in pairing]
+        wins = sum(1 for o in outcomes if o[0] == 'a')
+        losses = sum(1 for o in outcomes if o[0] == 'b')
+        draws = games - wins - losses
+        score = wins + 0.5*draws
+        ticks = [o[1] for o in outcomes]
+        low, high = wilson(score, games)
+        results.append({
+            'a': specs[a], 'b': specs[b], 'games': games,
+            'wins': wins, 'losses': losses, 'draws': draws,
+            'win_rate': score/games, 'ci95': (low, high),
+            'ticks': {'mean': float(sum(ticks))/len(ticks),
+                      'min': min(ticks), 'max': max(ticks)},
+            'latency_a': latency_summary(sum([o[2] for o in outcomes], [])),
+            'latency_b': latency_summary(sum([o[3] for o in outcomes], [])),
+        })
+    pool.shutdown()
+    return results
+
+def report(results, out=sys.stdout):
+    for r in results:
+        out.write('%s vs %s\n' % (r['a'], r['b']))
+        out.write('  %d games: %d won, %d lost, %d drawn, win rate %.3f '
+                  '(95%% CI %.3f-%.3f)\n'
+                  % (r['games'], r['wins'], r['losses'], r['draws'],
+                     r['win_rate'], r['ci95'][0], r['ci95'][1]))
+        out.write('  game length: mean %.1f, min %d, max %d ticks\n'
+                  % (r['ticks']['mean'], r['ticks']['min'],
+                     r['ticks']['max']))
+        for side in ('a', 'b'):
+            lat = r['latency_' + side]
+            out.write('  %s ms per move: mean %.2f, p50 %.2f, p99 %.2f, '
+                      'max %.2f over %d moves\n'
+                      % (r[side], lat['mean'], lat['p50'], lat['p99'],
+                         lat['max'], lat['moves']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('ais', nargs='+', metavar='module:Class[,k=v...]')
+    parser.add_argument('--games', type=int, default=20,
+                        help='games per pairing (default 20)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default one per cpu)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--per', type=int, default=100,
+                        help='tick length in ms, sets anytime AI deadlines')
+    parser.add_argument('--max-ticks', type=int, default=5000,
+                        help='games still running after this are draws')
+    parser.add_argument('--json', help='also write the results here')
+    parser.add_argument('--replays', metavar='DIR',
+                        help='save replays of every game here, '
+                        'named a-b-game after the AIs\' positions')
+    args = parser.parse_args(argv)
+    if len(args.ais) < 2:
+        parser.error('need at least two AIs')
+    if args.replays:
+        os.makedirs(args.replays, exist_ok=True)
+    results = run(args.ais, args.games, args.workers, args.seed, args.per,
+                  args.max_ticks, args.replays)
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()